@@ -1,7 +1,9 @@
 
 from django.contrib import admin
-from . import models
-from .models_new import VoyageLogNew, LogEntryNew, WeatherConditionNew, CrewMemberNew, IncidentNew, VoyagePhoto
+from django.shortcuts import redirect
+
+from . import exports, models
+from .models_new import VoyageLogNew, LogEntryNew, WeatherConditionNew, CrewMemberNew, IncidentNew, VoyagePhoto, PdfJob
 
 @admin.register(models.CrewMember)
 class CrewAdmin(admin.ModelAdmin):
@@ -202,6 +204,9 @@ class VoyageLogNewAdmin(admin.ModelAdmin):
     list_filter = ('statut', 'date_debut', 'skipper')
     search_fields = ('sujet_voyage', 'bateau', 'skipper', 'port_depart', 'port_arrivee')
     date_hierarchy = 'date_debut'
+    # photos_count est lu dans VoyageStats
+    list_select_related = ('stats',)
+    actions = ['export_book']
     
     inlines = [VoyagePhotoInline, LogEntryNewInline, CrewMemberNewInline, WeatherConditionNewInline]
     
@@ -216,6 +221,14 @@ class VoyageLogNewAdmin(admin.ModelAdmin):
             'fields': ('statut',)
         }),
     )
+    
+    @admin.action(description="Exporter le livre de bord relié (PDF)")
+    def export_book(self, request, queryset):
+        years = sorted({voyage.date_debut.year for voyage in queryset.only('date_debut')})
+        title = f"Livre de bord {years[0]}" if len(years) == 1 else "Livre de bord"
+        # construit par le worker (run_worker) : page d'attente, puis téléchargement
+        _, job = exports.request_book(list(queryset.values_list('pk', flat=True)), title)
+        return redirect('pdf_job_download', pk=job.pk)
 
 @admin.register(VoyagePhoto)
 class VoyagePhotoAdmin(admin.ModelAdmin):
@@ -274,3 +287,10 @@ class IncidentNewAdmin(admin.ModelAdmin):
     def description_short(self, obj):
         return obj.description[:50] + '...' if len(obj.description) > 50 else obj.description
     description_short.short_description = 'Description'
+
+@admin.register(PdfJob)
+class PdfJobAdmin(admin.ModelAdmin):
+    list_display = ('voyage', 'kind', 'version', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('kind', 'voyage', 'version', 'params', 'file', 'error', 'attempts', 'created_at', 'started_at', 'finished_at')
+    list_select_related = ('voyage',)
@@ -1,6 +1,9 @@
 
-from rest_framework import serializers, viewsets
-from .models import CrewMember, LogbookEntry, MaintenanceRecord, Checklist, ChecklistItem, MediaAsset
+from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .models import CrewMember, LogbookEntry, MaintenanceRecord, Checklist, ChecklistItem, MediaAsset, VoyageEvent
+from . import spatial, tracks
 
 class CrewMemberSerializer(serializers.ModelSerializer):
     class Meta:
@@ -41,10 +44,61 @@ class CrewMemberViewSet(viewsets.ModelViewSet):
     queryset = CrewMember.objects.all()
     serializer_class = CrewMemberSerializer
 
+def _round(value, digits):
+    return round(value, digits) if value is not None else None
+
 class LogbookEntryViewSet(viewsets.ModelViewSet):
     queryset = LogbookEntry.objects.all().prefetch_related('crew', 'media_assets')
     serializer_class = LogbookEntrySerializer
 
+    @action(detail=True)
+    def track(self, request, pk=None):
+        """GET /api/voyages/{id}/track/?zoom=10 (ou ?tolerance=0.1 en NM) : trace GeoJSON simplifiée."""
+        voyage = self.get_object()
+        try:
+            feature = tracks.track_feature_from_request('events', voyage.pk, request.query_params)
+        except ValueError:
+            return Response({'detail': 'Paramètre zoom/tolerance invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(feature)
+
+    @action(detail=True)
+    def segments(self, request, pk=None):
+        """GET /api/voyages/{id}/segments/ : segments entre événements consécutifs
+        (distance, durée, vitesse, cap), calculés par la base en une requête."""
+        voyage = self.get_object()
+        rows = (
+            VoyageEvent.objects.filter(voyage=voyage)
+            .with_segments()
+            .order_by('timestamp', 'id')
+            .values(
+                'id', 'timestamp', 'latitude', 'longitude',
+                'segment_nm', 'segment_hours', 'segment_speed_kn', 'segment_bearing_deg',
+            )
+        )
+        return Response([
+            {
+                'id': row['id'],
+                'timestamp': row['timestamp'],
+                'latitude': row['latitude'],
+                'longitude': row['longitude'],
+                'distance_nm': _round(row['segment_nm'], 3),
+                'elapsed_hours': _round(row['segment_hours'], 4),
+                'speed_kn': _round(row['segment_speed_kn'], 2),
+                'bearing_deg': _round(row['segment_bearing_deg'], 1),
+            }
+            for row in rows.iterator(chunk_size=2000)
+        ])
+
+    @action(detail=False)
+    def near(self, request):
+        """GET /api/voyages/near/?lat=-17.5&lng=-149.8&radius=2 (NM) ou ?bbox=min_lng,min_lat,max_lng,max_lat :
+        voyages dont un événement est passé dans la zone."""
+        try:
+            result = spatial.search_from_request('events', request.query_params)
+        except ValueError:
+            return Response({'detail': 'Paramètres lat/lng/radius ou bbox invalides'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
 class MaintenanceRecordViewSet(viewsets.ModelViewSet):
     queryset = MaintenanceRecord.objects.all()
     serializer_class = MaintenanceRecordSerializer
@@ -82,6 +136,17 @@ class VoyageEventSerializer(serializers.ModelSerializer):
         model = VoyageEvent
         fields = '__all__'
 
+class VoyageEventPointSerializer(serializers.ModelSerializer):
+    """One position of a bulk upload; computed segment fields are not accepted."""
+    class Meta:
+        model = VoyageEvent
+        fields = ['timestamp', 'latitude', 'longitude', 'description', 'weather', 'notes']
+        extra_kwargs = {'description': {'required': False, 'allow_blank': True}}
+
+class VoyageEventBulkSerializer(serializers.Serializer):
+    voyage = serializers.PrimaryKeyRelatedField(queryset=LogbookEntry.objects.all())
+    events = VoyageEventPointSerializer(many=True, allow_empty=False)
+
 class VoyageEventViewSet(viewsets.ModelViewSet):
     queryset = VoyageEvent.objects.all().select_related('voyage')
     serializer_class = VoyageEventSerializer
@@ -93,3 +158,23 @@ class VoyageEventViewSet(viewsets.ModelViewSet):
         if voyage_id:
             return qs.filter(voyage_id=voyage_id).order_by('timestamp')
         return qs.order_by('-timestamp')
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """POST /api/events/bulk/ {"voyage": id, "events": [{timestamp, latitude, longitude, ...}, ...]}
+
+        Creates all positions in one pass (see VoyageEvent.bulk_add) and
+        returns the updated voyage totals.
+        """
+        serializer = VoyageEventBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        voyage = serializer.validated_data['voyage']
+        created = VoyageEvent.bulk_add(voyage, serializer.validated_data['events'])
+        voyage.refresh_from_db(fields=['distance_nm', 'duration_hours', 'avg_speed_kn'])
+        return Response({
+            'voyage': voyage.pk,
+            'created': len(created),
+            'distance_nm': voyage.distance_nm,
+            'duration_hours': voyage.duration_hours,
+            'avg_speed_kn': voyage.avg_speed_kn,
+        }, status=status.HTTP_201_CREATED)
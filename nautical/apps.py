@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class NauticalConfig(AppConfig):
+    name = 'nautical'
+
+    def ready(self):
+        # Connecte les signaux (caches, compteurs, statistiques)
+        from . import signals  # noqa: F401
@@ -0,0 +1,175 @@
+"""
+Livre de bord relié : plusieurs voyages (ceux d'une année, ou une sélection
+de l'administration) dans un seul PDF, précédés d'une table des matières,
+pages numérotées d'un bout à l'autre.
+
+La mise en page ReportLab (mono-thread) est le gros du coût : chaque voyage
+est mis en page dans un processus séparé (ProcessPoolExecutor) par
+reports.voyage_complete, dans un PDF complet (fichier temporaire). Le
+processus principal met en page la table des matières puis assemble les
+fichiers avec pypdf (PdfWriter.append) : pieds de page fusionnés depuis un
+calque d'une page par page du livre (merge_page), signets du document.
+Les pages sont recopiées telles quelles, images et transparences comprises.
+
+Utilisé par `manage.py export_logbook_book` et le worker des exports PDF
+(action d'administration des livres de bord, voir nautical.exports).
+"""
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import django
+from django.db import connections
+from django.utils import timezone
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+from . import pdf, reports
+
+# Partie du livre : un voyage, son PDF et son nombre de pages
+Part = namedtuple('Part', ['voyage', 'path', 'pages'])
+
+TOC_COLUMNS = [
+    pdf.Column('Voyage', 62*mm, None),
+    pdf.Column('Dates', 38*mm, None),
+    pdf.Column('Trajet', 50*mm, None),
+    pdf.Column('Entrées', 16*mm, None, 'RIGHT'),
+    pdf.Column('Page', 14*mm, None, 'RIGHT'),
+]
+
+
+def _init_worker():
+    # « spawn » (macOS) : Django n'est pas encore chargé dans ce processus
+    django.setup()
+    # « fork » : ne pas partager la connexion à la base du processus parent
+    connections.close_all()
+
+
+def render_part(voyage_id, path):
+    """Livre complet d'un voyage, sans pied de page, écrit dans `path` ;
+    retourne son nombre de pages. Exécutée dans un processus du pool."""
+    return reports.voyage_complete(voyage_id, str(path), footer=False)
+
+
+def render_parts(voyages, directory, workers=None):
+    """Met en page les voyages en parallèle dans `directory` ; retourne les
+    Part dans l'ordre."""
+    paths = [Path(directory) / f"voyage-{voyage.pk}.pdf" for voyage in voyages]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pages = list(pool.map(render_part, [voyage.pk for voyage in voyages], paths))
+    return [Part(voyage, path, count) for voyage, path, count in zip(voyages, paths, pages)]
+
+
+def render_toc(title, parts, first_pages, output):
+    """Écrit la table des matières dans `output` (`first_pages` : première
+    page de chaque partie dans le livre) ; retourne son nombre de pages."""
+    styles = pdf.stylesheet()
+    rows = [[column.title for column in TOC_COLUMNS]]
+    for part, first_page in zip(parts, first_pages):
+        voyage = part.voyage
+        dates = voyage.date_debut.strftime('%d/%m/%Y')
+        if voyage.date_fin:
+            dates += f" → {voyage.date_fin.strftime('%d/%m/%Y')}"
+        rows.append([
+            Paragraph(escape(voyage.sujet_voyage or voyage.bateau), styles['Small']),
+            dates,
+            Paragraph(escape(f"{voyage.port_depart} → {voyage.port_arrivee or 'En cours'}"), styles['Small']),
+            voyage.statistics.entries_count,
+            first_page,
+        ])
+    table = Table(rows, colWidths=[column.width for column in TOC_COLUMNS], repeatRows=1)
+    table.setStyle(pdf.report_table_style(tuple(
+        (i, column.align) for i, column in enumerate(TOC_COLUMNS) if column.align != 'LEFT'
+    )))
+    story = [
+        Paragraph(f"📚 {escape(title)}", styles['VoyageTitle']),
+        Paragraph(
+            f"{len(parts)} voyages — {sum(part.pages for part in parts)} pages — "
+            f"généré le {timezone.localdate().strftime('%d/%m/%Y')}",
+            styles['Note'],
+        ),
+        Spacer(1, 6*mm),
+        table,
+    ]
+    doc = SimpleDocTemplate(
+        output, pagesize=A4, leftMargin=10*mm, rightMargin=10*mm, topMargin=10*mm, bottomMargin=15*mm,
+    )
+    doc.build(story)
+    return doc.page
+
+
+def _table_of_contents(title, parts):
+    """(PDF de la table des matières, son nombre de pages, première page de
+    chaque partie) : la table est mise en page jusqu'à ce que son nombre de
+    pages ne change plus."""
+    pages = 0
+    while True:
+        offset = pages + 1
+        first_pages = []
+        for part in parts:
+            first_pages.append(offset)
+            offset += part.pages
+        toc = BytesIO()
+        count = render_toc(title, parts, first_pages, toc)
+        if count == pages:
+            return toc, pages, first_pages
+        pages = count
+
+
+def _draw_footer(canv, label, number, total):
+    canv.saveState()
+    canv.setFont("Helvetica", 7)
+    canv.setFillColor(colors.grey)
+    width, _ = canv._pagesize
+    canv.drawString(10*mm, 8*mm, label)
+    canv.drawRightString(width - 10*mm, 8*mm, f"Page {number}/{total}")
+    canv.restoreState()
+
+
+def _footer_layer(labels):
+    """PDF d'une page par page du livre, avec seulement son pied de page."""
+    output = BytesIO()
+    canv = canvas.Canvas(output, pagesize=A4)
+    for number, label in enumerate(labels, 1):
+        _draw_footer(canv, label, number, len(labels))
+        canv.showPage()
+    canv.save()
+    output.seek(0)
+    return output
+
+
+def build_book(voyages, output, title, workers=None):
+    """Écrit dans `output` le livre relié des voyages (triés par date).
+
+    Retourne le nombre de pages."""
+    voyages = list(voyages.select_related('stats').order_by('date_debut', 'pk'))
+    if not voyages:
+        raise ValueError("Aucun voyage à relier")
+    with tempfile.TemporaryDirectory(prefix='livre-de-bord-') as directory:
+        parts = render_parts(voyages, directory, workers)
+        toc, toc_pages, _ = _table_of_contents(title, parts)
+        sections = [("Table des matières", title, toc, toc_pages)] + [
+            (f"{part.voyage.bateau} — {part.voyage.sujet_voyage}", f"{title} — {part.voyage.sujet_voyage}",
+             str(part.path), part.pages)
+            for part in parts
+        ]
+        writer = PdfWriter()
+        labels = []
+        for outline, footer, source, pages in sections:
+            first = len(writer.pages)
+            writer.append(source, import_outline=False)
+            writer.add_outline_item(outline, first)
+            labels += [footer] * pages
+        for page, layer in zip(writer.pages, PdfReader(_footer_layer(labels)).pages):
+            page.merge_page(layer)
+            page.compress_content_streams()
+        writer.add_metadata({'/Title': title})
+        writer.write(output)
+    return len(labels)
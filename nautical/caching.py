@@ -0,0 +1,132 @@
+"""
+Cache versionné des pages des livres de bord.
+
+Chaque livre de bord a un numéro de version, incrémenté par les signaux
+post_save/post_delete du voyage et de ses objets rattachés (entrées,
+météo, équipage, incidents, photos) ; la liste des voyages a une version
+globale, incrémentée à chaque écriture de n'importe quel voyage.
+
+Les clés de cache (pages de liste, fragments du détail) incluent ces
+versions : après une écriture, les anciennes clés ne sont plus jamais lues
+et expirent d'elles-mêmes. Les durées de vie peuvent donc se compter en
+heures sans jamais servir de contenu périmé.
+
+Les versions changent au commit de la transaction qui a écrit. Elles sont
+conservées dans le cache par défaut, sans expiration. Ce
+cache est partagé par tous les processus (settings.CACHES : Redis ou
+fichiers) : une écriture faite par nmea_listener, import_track ou un autre
+processus serveur invalide aussi les pages servies ici.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse
+
+from .models_new import VoyageStats
+
+LIST_CACHE_TIMEOUT = 6 * 3600
+DETAIL_CACHE_TIMEOUT = 6 * 3600
+
+# En-têtes de la réponse rejoués depuis le cache
+_CACHED_HEADERS = ('Content-Disposition',)
+
+
+def _version_key(name):
+    return f"cache_version:{name}"
+
+
+def _get_version(name):
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        # Départ horodaté plutôt qu'à 1 : si la version est évincée du cache,
+        # elle ne retombe jamais sur une valeur déjà utilisée
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, 0)
+    return version
+
+
+def _bump(name):
+    try:
+        cache.incr(_version_key(name))
+    except ValueError:
+        cache.set(_version_key(name), time.time_ns(), None)
+
+
+def list_version():
+    return _get_version('voyage_list')
+
+
+def voyage_version(voyage_id):
+    return _get_version(f'voyage:{voyage_id}')
+
+
+def bump_list():
+    transaction.on_commit(lambda: _bump('voyage_list'))
+
+
+def bump_voyage(voyage_id):
+    """Invalide les pages d'un voyage et la liste des voyages.
+
+    Incrémente aussi la version du contenu enregistrée en base
+    (VoyageStats.content_version), partagée par tous les processus : clé des
+    exports PDF construits par le worker (nautical.exports).
+
+    Les versions changent après le commit de la transaction en cours (tout
+    de suite hors transaction) : une page ou un PDF construit pendant la
+    transaction, avec les données d'avant, ne peut pas être enregistré
+    sous la nouvelle version.
+    """
+    def bump():
+        if voyage_id is not None:
+            _bump(f'voyage:{voyage_id}')
+            VoyageStats.objects.filter(voyage_id=voyage_id).update(content_version=F('content_version') + 1)
+        _bump('voyage_list')
+    transaction.on_commit(bump)
+
+
+def list_scope(request, *args, **kwargs):
+    return f"list.{list_version()}"
+
+
+def voyage_scope(request, pk, *args, **kwargs):
+    return f"voyage.{pk}.{voyage_version(pk)}"
+
+
+def cache_versioned_page(timeout, scope):
+    """Comme `cache_page`, avec une clé qui inclut `scope(request, *args, **kwargs)`
+    (les versions dont dépend la page).
+
+    Seules les réponses 200 aux GET/HEAD sont mises en cache, jamais celles
+    qui posent un cookie ni celles affichées avec des messages en attente.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+                return view(request, *args, **kwargs)
+            digest = hashlib.md5(
+                f"{request.get_full_path()}|{scope(request, *args, **kwargs)}".encode()
+            ).hexdigest()
+            key = f"versioned_page:{digest}"
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type, headers = cached
+                response = HttpResponse(content, content_type=content_type)
+                for name, value in headers:
+                    response[name] = value
+                return response
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                headers = [(name, response[name]) for name in _CACHED_HEADERS if response.has_header(name)]
+                cache.set(key, (response.content, response['Content-Type'], headers), timeout)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,59 @@
+"""
+Compteurs globaux du site (page d'accueil, tableau de bord).
+
+Un COUNT(*) sur SQLite parcourt toute la table : le nombre de lignes des
+tables affichées est conservé dans SiteCounter, ajusté avec F() par les
+signaux post_save (création) et post_delete. La lecture d'une ligne de
+SiteCounter par clé primaire est immédiate : pas de cache, tous les processus
+voient la valeur validée en base.
+Les écritures en masse (bulk_create) appellent `increment` elles-mêmes.
+
+`manage.py reconcile_site_counters` (à planifier chaque nuit) recompte les
+tables et corrige les dérives.
+"""
+from django.db import models, transaction
+
+from .models import CrewMember, LogbookEntry, MaintenanceRecord
+from .models_new import IncidentNew, LogEntryNew, SiteCounter, VoyageLogNew
+
+COUNTED_MODELS = {
+    'logbook_entries': LogbookEntry,
+    'crew_members': CrewMember,
+    'maintenance_records': MaintenanceRecord,
+    'voyages': VoyageLogNew,
+    'log_entries': LogEntryNew,
+    'incidents': IncidentNew,
+}
+
+COUNTER_NAMES = {model: name for name, model in COUNTED_MODELS.items()}
+
+
+def get_many(*names):
+    """{nom: valeur} : la table SiteCounter, sinon un COUNT(*) (première
+    lecture d'un compteur, enregistré pour les suivantes)."""
+    values = dict(SiteCounter.objects.filter(name__in=names).values_list('name', 'value'))
+    for name in names:
+        if name not in values:
+            counter, _ = SiteCounter.objects.get_or_create(
+                name=name, defaults={'value': COUNTED_MODELS[name].objects.count()},
+            )
+            values[name] = counter.value
+    return values
+
+
+def get(name):
+    return get_many(name)[name]
+
+
+def increment(name, delta=1):
+    """Ajuste un compteur avec F()."""
+    with transaction.atomic():
+        updated = SiteCounter.objects.filter(name=name).update(value=models.F('value') + delta)
+        if not updated:
+            # compteur jamais lu : le COUNT(*) inclut déjà l'écriture en cours
+            SiteCounter.objects.get_or_create(name=name, defaults={'value': COUNTED_MODELS[name].objects.count()})
+
+
+def actual_counts():
+    """{nom: COUNT(*)} pour tous les compteurs."""
+    return {name: model.objects.count() for name, model in COUNTED_MODELS.items()}
@@ -0,0 +1,347 @@
+"""
+Livre de bord page par page, à l'image du carnet papier (Livre_de_Bord.pdf) :
+une page par jour, en-tête du voyage, journal horaire, météo du jour,
+équipage à bord et incidents.
+
+Le fond de page (cadres, grilles, intitulés) est dessiné une seule fois dans
+un « form XObject » ReportLab (`beginForm`/`doForm`) et chaque page n'y
+ajoute que les données de sa journée : le fond n'est écrit qu'une fois dans
+le fichier, quel que soit le nombre de pages.
+
+Seuls les jours qui ont des données (entrées, bulletins, incidents) ont une
+page ; une journée dont les entrées ne tiennent pas sur une page continue
+sur les suivantes (même fond, sections du bas laissées vides).
+"""
+import heapq
+from collections import namedtuple
+from itertools import groupby
+
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from . import pdf
+from .models_new import VoyageLogNew
+
+BACKGROUND = 'fond-page-journaliere'
+ENTRY_CHUNK_SIZE = 500
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+LEFT = 36
+RIGHT = PAGE_WIDTH - 36
+GREEN = colors.Color(0.573, 0.816, 0.314)
+LIGHT_GREEN = colors.Color(0.89, 0.95, 0.82)
+LINE = colors.Color(0.55, 0.55, 0.55)
+FONT, BOLD = 'Helvetica', 'Helvetica-Bold'
+
+# En-tête : (intitulé, largeur)
+HEADER_TOP, HEADER_HEIGHT = 806, 22
+HEADER_BOXES = [('DATE', 150), ('BATEAU — SKIPPER', 190), ('TRAJET', RIGHT - LEFT - 340)]
+
+# Journal : (intitulé, largeur) ; la dernière colonne prend le reste
+LOG_TOP, LOG_HEADER_HEIGHT, LOG_ROW_HEIGHT, LOG_ROWS = 778, 16, 12, 28
+LOG_COLUMNS = [
+    ('Heure', 30), ('Log', 34), ('Cap', 28), ('Vent', 46), ('Allure / voilure', 66),
+    ('Mer', 44), ('Baro', 32), ('Position', 82), ('Événements', RIGHT - LEFT - 362),
+]
+LOG_BOTTOM = LOG_TOP - LOG_HEADER_HEIGHT - LOG_ROWS * LOG_ROW_HEIGHT
+
+# Météo : une ligne par période, une colonne par élément
+WEATHER_TOP = LOG_BOTTOM - 10
+WEATHER_TITLE_HEIGHT, WEATHER_HEADER_HEIGHT, WEATHER_ROW_HEIGHT = 13, 11, 13
+WEATHER_LABEL_WIDTH = 58
+WEATHER_COLUMNS = [('Vent', 'vent'), ('Mer', 'mer'), ('Houle', 'houle'), ('Temps', 'temps'), ('Visibilité', 'visibilite')]
+WEATHER_ROWS = [('Jour', 'prev_jour_'), ('Nuit', 'prev_nuit_'), ('Tendance', 'tend_')]
+WEATHER_GRID_BOTTOM = (
+    WEATHER_TOP - WEATHER_TITLE_HEIGHT - WEATHER_HEADER_HEIGHT - len(WEATHER_ROWS) * WEATHER_ROW_HEIGHT
+)
+SITUATION_HEIGHT, TIDES_HEIGHT = 34, 15
+WEATHER_BOTTOM = WEATHER_GRID_BOTTOM - SITUATION_HEIGHT - TIDES_HEIGHT
+
+# Équipage (à gauche) et incidents (à droite)
+BOTTOM_TOP = WEATHER_BOTTOM - 10
+BOTTOM_ROW_HEIGHT, BOTTOM_ROWS = 11, 22
+CREW_WIDTH = 190
+BOTTOM_BOTTOM = BOTTOM_TOP - 13 - BOTTOM_ROWS * BOTTOM_ROW_HEIGHT
+
+# Données d'une journée
+Day = namedtuple('Day', ['date', 'entries', 'bulletins', 'incidents'])
+
+
+def fit(text, font, size, width):
+    """`text` sur une ligne, tronqué (…) pour tenir dans `width`."""
+    text = ' '.join(str(text or '').split())
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + '…', font, size) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+# --- Fond de page -----------------------------------------------------------
+
+def draw_background(canv):
+    """Cadres, grilles et intitulés communs à toutes les pages."""
+    canv.saveState()
+    canv.setLineWidth(0.5)
+    canv.setStrokeColor(LINE)
+
+    canv.setFont(BOLD, 9)
+    canv.setFillColor(GREEN)
+    canv.drawString(LEFT, HEADER_TOP + HEADER_HEIGHT + 6, "LIVRE DE BORD")
+
+    # En-tête
+    x = LEFT
+    for label, width in HEADER_BOXES:
+        canv.rect(x, HEADER_TOP, width, HEADER_HEIGHT)
+        _label(canv, label, x + 3, HEADER_TOP + HEADER_HEIGHT - 7)
+        x += width
+
+    # Journal horaire
+    _section(canv, LOG_TOP, LOG_BOTTOM, LOG_HEADER_HEIGHT, LOG_COLUMNS, LOG_ROWS, LOG_ROW_HEIGHT)
+
+    # Météo
+    title_bottom = WEATHER_TOP - WEATHER_TITLE_HEIGHT
+    canv.setFillColor(GREEN)
+    canv.rect(LEFT, title_bottom, RIGHT - LEFT, WEATHER_TITLE_HEIGHT, fill=1)
+    canv.setFillColor(colors.white)
+    canv.setFont(BOLD, 8)
+    canv.drawString(LEFT + 3, title_bottom + 4, "MÉTÉO")
+    header_bottom = title_bottom - WEATHER_HEADER_HEIGHT
+    canv.setFillColor(LIGHT_GREEN)
+    canv.rect(LEFT, header_bottom, RIGHT - LEFT, WEATHER_HEADER_HEIGHT, fill=1)
+    column_width = (RIGHT - LEFT - WEATHER_LABEL_WIDTH) / len(WEATHER_COLUMNS)
+    for i, (label, _) in enumerate(WEATHER_COLUMNS):
+        _label(canv, label, LEFT + WEATHER_LABEL_WIDTH + i * column_width + 3, header_bottom + 3)
+    for i, (label, _) in enumerate(WEATHER_ROWS):
+        row_top = header_bottom - i * WEATHER_ROW_HEIGHT
+        canv.line(LEFT, row_top - WEATHER_ROW_HEIGHT, RIGHT, row_top - WEATHER_ROW_HEIGHT)
+        _label(canv, label, LEFT + 3, row_top - WEATHER_ROW_HEIGHT + 4, size=7)
+    for i in range(len(WEATHER_COLUMNS)):
+        x = LEFT + WEATHER_LABEL_WIDTH + i * column_width
+        canv.line(x, header_bottom + WEATHER_HEADER_HEIGHT, x, WEATHER_GRID_BOTTOM)
+    canv.rect(LEFT, WEATHER_GRID_BOTTOM - SITUATION_HEIGHT, RIGHT - LEFT, SITUATION_HEIGHT)
+    _label(canv, "Situation générale", LEFT + 3, WEATHER_GRID_BOTTOM - 8)
+    canv.rect(LEFT, WEATHER_BOTTOM, RIGHT - LEFT, TIDES_HEIGHT)
+    _label(canv, "Marées", LEFT + 3, WEATHER_BOTTOM + 5)
+    canv.rect(LEFT, WEATHER_BOTTOM, RIGHT - LEFT, WEATHER_TOP - WEATHER_BOTTOM)
+
+    # Équipage et incidents
+    _section(canv, BOTTOM_TOP, BOTTOM_BOTTOM, 13, [('ÉQUIPAGE À BORD', 120), ('Rôle', CREW_WIDTH - 120)],
+             BOTTOM_ROWS, BOTTOM_ROW_HEIGHT, left=LEFT, right=LEFT + CREW_WIDTH)
+    _section(canv, BOTTOM_TOP, BOTTOM_BOTTOM, 13, [('INCIDENTS', RIGHT - LEFT - CREW_WIDTH - 10)],
+             BOTTOM_ROWS, BOTTOM_ROW_HEIGHT, left=LEFT + CREW_WIDTH + 10, right=RIGHT)
+    canv.restoreState()
+
+
+def _label(canv, text, x, y, size=6):
+    canv.setFillColor(colors.black)
+    canv.setFont(BOLD, size)
+    canv.drawString(x, y, text)
+
+
+def _section(canv, top, bottom, header_height, columns, rows, row_height, left=LEFT, right=RIGHT):
+    """Tableau ligné : en-tête vert, `rows` lignes, séparateurs de colonnes."""
+    header_bottom = top - header_height
+    canv.setFillColor(GREEN)
+    canv.rect(left, header_bottom, right - left, header_height, fill=1)
+    canv.setFillColor(colors.white)
+    canv.setFont(BOLD, 6.5)
+    x = left
+    for label, width in columns:
+        canv.drawString(x + 2, header_bottom + 4, label)
+        x += width
+    for i in range(1, rows):
+        y = header_bottom - i * row_height
+        canv.line(left, y, right, y)
+    x = left
+    for _, width in columns[:-1]:
+        x += width
+        canv.line(x, top, x, bottom)
+    canv.rect(left, bottom, right - left, top - bottom)
+
+
+# --- Données d'une journée --------------------------------------------------
+
+def _days(voyage):
+    """Journées du voyage (Day) dans l'ordre : entrées lues par lots, bulletins
+    et incidents (peu nombreux) regroupés par jour à l'avance."""
+    bulletins, incidents = {}, {}
+    for bulletin in voyage.conditions_meteo.order_by('datetime'):
+        bulletins.setdefault(timezone.localtime(bulletin.datetime).date(), []).append(bulletin)
+    for incident in voyage.incidents.order_by('datetime'):
+        incidents.setdefault(timezone.localtime(incident.datetime).date(), []).append(incident)
+
+    # index (voyage, timestamp) : même ordre que (date, heure), sans tri
+    entries = voyage.entries.order_by('timestamp', 'id').iterator(chunk_size=ENTRY_CHUNK_SIZE)
+    # (jour, entrées) : jours avec entrées, puis jours avec seulement bulletins ou incidents
+    by_day = ((day, list(group)) for day, group in groupby(entries, key=lambda entry: entry.date))
+    other_days = ((day, []) for day in sorted(set(bulletins) | set(incidents)))
+    empty = True
+    for day, group in groupby(heapq.merge(by_day, other_days, key=lambda item: item[0]), key=lambda item: item[0]):
+        empty = False
+        day_entries = [entry for _, items in group for entry in items]
+        yield Day(day, day_entries, bulletins.get(day, []), incidents.get(day, []))
+    if empty:
+        # voyage sans données : une page vierge au premier jour
+        yield Day(voyage.date_debut, [], [], [])
+
+
+def _crew_on(crew, day):
+    return [
+        member for member in crew
+        if (member.date_embarquement is None or member.date_embarquement <= day)
+        and (member.date_debarquement is None or member.date_debarquement >= day)
+    ]
+
+
+# --- Données dessinées sur le fond ------------------------------------------
+
+def _entry_lines(entry, width):
+    """Lignes du journal d'une entrée : les cellules sur la première ligne,
+    les événements sur autant de lignes que nécessaire."""
+    events = simpleSplit(' '.join((entry.evenements or '').split()), FONT, 7, width - 4) or ['']
+    allure = ' / '.join(part for part in (entry.allure, entry.voilure) if part)
+    first = [
+        entry.heure.strftime('%H:%M'),
+        f"{entry.log_nautique:.1f}" if entry.log_nautique is not None else '',
+        f"{entry.cap_compas}°" if entry.cap_compas is not None else '',
+        f"{entry.vent_force} {entry.vent_direction}".strip(),
+        allure,
+        entry.etat_mer,
+        f"{entry.barometre:.0f}" if entry.barometre is not None else '',
+        entry.position,
+        events[0],
+    ]
+    return [first] + [[''] * (len(LOG_COLUMNS) - 1) + [line] for line in events[1:]]
+
+
+def _draw_header(canv, voyage, day, continued):
+    y = HEADER_TOP + 5
+    values = [
+        day.strftime('%d/%m/%Y') + (' (suite)' if continued else ''),
+        f"{voyage.bateau} — {voyage.skipper}",
+        f"{voyage.port_depart} → {voyage.port_arrivee or 'En cours'}",
+    ]
+    canv.setFont(FONT, 10)
+    x = LEFT
+    for value, (_, width) in zip(values, HEADER_BOXES):
+        canv.drawString(x + 3, y, fit(value, FONT, 10, width - 6))
+        x += width
+
+
+def _draw_log_rows(canv, rows):
+    canv.setFont(FONT, 7)
+    for i, row in enumerate(rows):
+        y = LOG_TOP - LOG_HEADER_HEIGHT - (i + 1) * LOG_ROW_HEIGHT + 3.5
+        x = LEFT
+        for value, (_, width) in zip(row, LOG_COLUMNS):
+            if value:
+                canv.drawString(x + 2, y, fit(value, FONT, 7, width - 4))
+            x += width
+
+
+def _draw_weather(canv, bulletins):
+    if not bulletins:
+        return
+    bulletin = bulletins[-1]
+    canv.setFont(FONT, 7)
+    canv.setFillColor(colors.white)
+    source = f"{bulletin.type_bulletin or 'Bulletin'} de {timezone.localtime(bulletin.datetime).strftime('%H:%M')}"
+    if len(bulletins) > 1:
+        source += f" (+{len(bulletins) - 1} autre{'s' if len(bulletins) > 2 else ''})"
+    canv.drawRightString(RIGHT - 3, WEATHER_TOP - WEATHER_TITLE_HEIGHT + 4, source)
+    canv.setFillColor(colors.black)
+    column_width = (RIGHT - LEFT - WEATHER_LABEL_WIDTH) / len(WEATHER_COLUMNS)
+    header_bottom = WEATHER_TOP - WEATHER_TITLE_HEIGHT - WEATHER_HEADER_HEIGHT
+    for row, (_, prefix) in enumerate(WEATHER_ROWS):
+        y = header_bottom - (row + 1) * WEATHER_ROW_HEIGHT + 4
+        for column, (_, field) in enumerate(WEATHER_COLUMNS):
+            value = getattr(bulletin, prefix + field)
+            if value:
+                x = LEFT + WEATHER_LABEL_WIDTH + column * column_width
+                canv.drawString(x + 3, y, fit(value, FONT, 7, column_width - 6))
+    lines = simpleSplit(' '.join(bulletin.situation_generale.split()), FONT, 7, RIGHT - LEFT - 80)
+    for i, line in enumerate(lines[:3]):
+        canv.drawString(LEFT + 75, WEATHER_GRID_BOTTOM - 9 - i * 8.5, line)
+    if bulletin.marees:
+        canv.drawString(LEFT + 75, WEATHER_BOTTOM + 5, fit(bulletin.marees, FONT, 7, RIGHT - LEFT - 80))
+
+
+def _draw_crew(canv, crew):
+    canv.setFont(FONT, 7)
+    shown = crew[:BOTTOM_ROWS] if len(crew) <= BOTTOM_ROWS else crew[:BOTTOM_ROWS - 1]
+    for i, member in enumerate(shown):
+        y = BOTTOM_TOP - 13 - (i + 1) * BOTTOM_ROW_HEIGHT + 3
+        canv.drawString(LEFT + 2, y, fit(member.full_name, FONT, 7, 116))
+        canv.drawString(LEFT + 122, y, fit(member.get_role_display(), FONT, 7, CREW_WIDTH - 124))
+    if len(shown) < len(crew):
+        canv.drawString(LEFT + 2, BOTTOM_BOTTOM + 3, f"… +{len(crew) - len(shown)} équipiers")
+
+
+def _draw_incidents(canv, incidents):
+    left = LEFT + CREW_WIDTH + 10
+    width = RIGHT - left - 4
+    lines = []
+    for incident in incidents:
+        text = (
+            f"{timezone.localtime(incident.datetime).strftime('%H:%M')} {incident.get_gravite_display()} — "
+            f"{incident.get_type_incident_display()} : {' '.join(incident.description.split())}"
+        )
+        if incident.actions_prises:
+            text += f" Actions : {' '.join(incident.actions_prises.split())}"
+        lines += simpleSplit(text, FONT, 7, width)
+    if len(lines) > BOTTOM_ROWS:
+        lines = lines[:BOTTOM_ROWS - 1] + ['…']
+    canv.setFont(FONT, 7)
+    for i, line in enumerate(lines):
+        canv.drawString(left + 2, BOTTOM_TOP - 13 - (i + 1) * BOTTOM_ROW_HEIGHT + 3, line)
+
+
+def _draw_footer(canv, label, number):
+    canv.setFont(FONT, 7)
+    canv.setFillColor(colors.grey)
+    canv.drawString(LEFT, 24, label)
+    canv.drawRightString(RIGHT, 24, f"Page {number}")
+    canv.setFillColor(colors.black)
+
+
+# --- Document ---------------------------------------------------------------
+
+def voyage_day_pages(voyage_id, output, reuse_background=True):
+    """Écrit le livre de bord page par page d'un voyage dans `output`.
+
+    `reuse_background=False` redessine le fond sur chaque page (comparaison,
+    voir `manage.py bench_day_pages`). Retourne le nombre de pages."""
+    voyage = VoyageLogNew.objects.get(pk=voyage_id)
+    crew = list(voyage.equipage.all())
+    canv = pdf.CompactCanvas(output, pagesize=A4)
+    canv.setTitle(f"Livre de bord - {voyage.bateau} - {voyage.sujet_voyage}")
+    if reuse_background:
+        canv.beginForm(BACKGROUND)
+        draw_background(canv)
+        canv.endForm()
+    label = f"{voyage.bateau} — {voyage.sujet_voyage}"
+    number = 0
+
+    for day in _days(voyage):
+        rows = [row for entry in day.entries for row in _entry_lines(entry, LOG_COLUMNS[-1][1])]
+        chunks = [rows[i:i + LOG_ROWS] for i in range(0, len(rows), LOG_ROWS)] or [[]]
+        for page, chunk in enumerate(chunks):
+            number += 1
+            if reuse_background:
+                canv.doForm(BACKGROUND)
+            else:
+                draw_background(canv)
+            _draw_header(canv, voyage, day.date, continued=page > 0)
+            _draw_log_rows(canv, chunk)
+            if page == 0:
+                _draw_weather(canv, day.bulletins)
+                _draw_crew(canv, _crew_on(crew, day.date))
+                _draw_incidents(canv, day.incidents)
+            _draw_footer(canv, label, number)
+            canv.showPage()
+    canv.save()
+    return number
@@ -0,0 +1,52 @@
+"""
+Fonctions SQL géodésiques pour les requêtes (SQLite).
+
+Les fonctions HAVERSINE_NM et BEARING_DEG sont enregistrées sur chaque
+connexion SQLite (signal `connection_created`, voir nautical.signals) et
+appellent `nautical.geo` : les valeurs calculées en base sont celles du
+code Python. Elles servent d'arguments aux expressions ci-dessous, par
+exemple sur les positions précédentes obtenues avec LAG() dans
+`VoyageEvent.objects.with_segments()`.
+"""
+from django.db.models import FloatField, Func
+
+from . import geo
+
+
+def _null_safe(function):
+    def wrapper(*args):
+        if any(arg is None for arg in args):
+            return None
+        return function(*args)
+    return wrapper
+
+
+def register_sqlite_functions(connection):
+    """Enregistre les fonctions géodésiques sur une connexion SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    raw = connection.connection
+    raw.create_function('HAVERSINE_NM', 4, _null_safe(geo.haversine_nm), deterministic=True)
+    raw.create_function('BEARING_DEG', 4, _null_safe(geo.bearing_deg), deterministic=True)
+
+
+class HaversineNM(Func):
+    """Distance orthodromique (NM) entre (lat1, lng1) et (lat2, lng2)."""
+    function = 'HAVERSINE_NM'
+    arity = 4
+    output_field = FloatField()
+
+
+class BearingDeg(Func):
+    """Cap vrai initial (0-360°) de (lat1, lng1) vers (lat2, lng2)."""
+    function = 'BEARING_DEG'
+    arity = 4
+    output_field = FloatField()
+
+
+class JulianDay(Func):
+    """Date/heure en jours juliens (fonction native SQLite) : la différence
+    de deux JulianDay x 24 donne des heures écoulées."""
+    function = 'JULIANDAY'
+    arity = 1
+    output_field = FloatField()
@@ -0,0 +1,217 @@
+"""
+Exports PDF construits en arrière-plan.
+
+Une requête d'export ne construit jamais le PDF : elle cherche sur disque le
+fichier de la version courante du contenu du voyage
+(VoyageStats.content_version, incrémentée à chaque écriture du voyage ou
+d'un objet rattaché). S'il existe, il est servi tel quel ; sinon une tâche
+PdfJob est créée (une seule par version) et le worker (`manage.py
+run_worker`) la construit.
+
+Fichiers : MEDIA_ROOT/pdf/voyage-<id>/<type>-v<version>-r<LAYOUT_VERSION>.pdf,
+écrits sous un nom temporaire puis renommés (jamais de fichier à moitié écrit
+servi). Les versions précédentes sont supprimées après chaque construction.
+
+Livres reliés de plusieurs voyages (action de l'administration) : même
+file de tâches, fichiers MEDIA_ROOT/pdf/books/book-v<version>-r<...>.pdf,
+la version résumant celles des voyages reliés ; supprimés après BOOK_MAX_AGE.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from . import books, day_pages, reports
+from .models_new import PdfJob, VoyageLogNew, VoyageStats
+
+ARTIFACT_DIR = 'pdf'
+# À incrémenter quand la mise en page d'un rapport change : les fichiers
+# déjà construits ne correspondent plus
+LAYOUT_VERSION = 1
+MAX_ATTEMPTS = 3
+# Une tâche « en cours » depuis plus longtemps a perdu son worker
+STALE_AFTER = timedelta(minutes=15)
+
+BOOK_KIND = 'book'
+BOOK_MAX_AGE = timedelta(days=7)
+
+# Type d'export -> fonction (voyage_id, fichier de sortie)
+RENDERERS = {
+    'voyage': reports.voyage_summary,
+    'complete': reports.voyage_complete,
+    'daily': day_pages.voyage_day_pages,
+}
+
+
+def voyage_dir(voyage_id):
+    return Path(settings.MEDIA_ROOT) / ARTIFACT_DIR / f"voyage-{voyage_id}"
+
+
+def artifact_path(kind, voyage_id, version):
+    return voyage_dir(voyage_id) / f"{kind}-v{version}-r{LAYOUT_VERSION}.pdf"
+
+
+def book_dir():
+    return Path(settings.MEDIA_ROOT) / ARTIFACT_DIR / 'books'
+
+
+def job_path(job):
+    """Fichier produit par une tâche."""
+    if job.kind == BOOK_KIND:
+        return book_dir() / f"{BOOK_KIND}-v{job.version}-r{LAYOUT_VERSION}.pdf"
+    return artifact_path(job.kind, job.voyage_id, job.version)
+
+
+def content_version(voyage_id):
+    stats, _ = VoyageStats.get_or_rebuild(voyage_id)
+    return stats.content_version
+
+
+def request_pdf(kind, voyage_id):
+    """(chemin, None) si le PDF de la version courante est prêt, sinon
+    (None, tâche) : la tâche est créée si besoin, relancée après un échec."""
+    version = content_version(voyage_id)
+    path = artifact_path(kind, voyage_id, version)
+    if path.exists():
+        return path, None
+    return None, _enqueue(kind, voyage_id, version)
+
+
+def book_version(voyage_ids):
+    """Version d'un livre relié : résumé des versions du contenu des voyages."""
+    versions = ','.join(f"{pk}:{content_version(pk)}" for pk in sorted(voyage_ids))
+    return int(hashlib.sha256(versions.encode()).hexdigest()[:15], 16)
+
+
+def request_book(voyage_ids, title):
+    """(chemin, tâche) du livre relié des voyages `voyage_ids` : chemin None
+    tant que le worker ne l'a pas construit."""
+    version = book_version(voyage_ids)
+    job = _enqueue(BOOK_KIND, None, version, {'voyages': sorted(voyage_ids), 'title': title})
+    return job_file(job)
+
+
+def job_file(job):
+    """(chemin, tâche) : chemin None si le fichier de la tâche n'est pas prêt
+    (tâche relancée après un échec ou si son fichier a disparu)."""
+    path = job_path(job)
+    if job.status == 'done' and path.exists():
+        return path, job
+    return None, _retry(job)
+
+
+def _enqueue(kind, voyage_id, version, params=None):
+    try:
+        with transaction.atomic():
+            job, _ = PdfJob.objects.get_or_create(
+                kind=kind, voyage_id=voyage_id, version=version, defaults={'params': params or {}},
+            )
+    except IntegrityError:
+        # créée entre-temps par une requête concurrente
+        job = PdfJob.objects.get(kind=kind, voyage_id=voyage_id, version=version)
+    return _retry(job)
+
+
+def _retry(job):
+    if job.status == 'failed' and job.attempts < MAX_ATTEMPTS:
+        PdfJob.objects.filter(pk=job.pk, status='failed').update(status='pending')
+        job.status = 'pending'
+    elif job.status == 'done' and not job_path(job).exists():
+        # fichier supprimé à la main (ou livre expiré) : le reconstruire
+        PdfJob.objects.filter(pk=job.pk, status='done').update(status='pending', file='')
+        job.status = 'pending'
+    return job
+
+
+# --- Worker -------------------------------------------------------------------
+
+def requeue_stale_jobs():
+    """Remet en attente les tâches dont le worker s'est arrêté en cours de route."""
+    return PdfJob.objects.filter(
+        status='running', started_at__lt=timezone.now() - STALE_AFTER,
+    ).update(status='pending')
+
+
+def claim_next_job():
+    """La plus ancienne tâche en attente, réservée pour ce worker (ou None)."""
+    while True:
+        job = PdfJob.objects.filter(status='pending').order_by('created_at', 'id').first()
+        if job is None:
+            return None
+        claimed = PdfJob.objects.filter(pk=job.pk, status='pending').update(
+            status='running', started_at=timezone.now(), attempts=models.F('attempts') + 1,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def build(job):
+    """Construit le PDF d'une tâche réservée ; retourne True en cas de succès."""
+    path = job_path(job)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}-", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            if job.kind == BOOK_KIND:
+                voyages = VoyageLogNew.objects.filter(pk__in=job.params['voyages'])
+                books.build_book(voyages, output, job.params['title'])
+            else:
+                RENDERERS[job.kind](job.voyage_id, output)
+        os.replace(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        PdfJob.objects.filter(pk=job.pk).update(
+            status='failed', error=traceback.format_exc(), finished_at=timezone.now(),
+        )
+        return False
+    PdfJob.objects.filter(pk=job.pk).update(
+        status='done', file=str(path.relative_to(settings.MEDIA_ROOT)), error='', finished_at=timezone.now(),
+    )
+    if job.kind == BOOK_KIND:
+        prune_books()
+    else:
+        prune(job.kind, job.voyage_id, keep=path)
+    return True
+
+
+def prune(kind, voyage_id, keep):
+    """Supprime les fichiers des versions précédentes d'un export."""
+    for old in voyage_dir(voyage_id).glob(f"{kind}-v*.pdf"):
+        if old != keep:
+            old.unlink(missing_ok=True)
+
+
+def prune_books():
+    """Supprime les livres reliés construits il y a plus de BOOK_MAX_AGE."""
+    limit = time.time() - BOOK_MAX_AGE.total_seconds()
+    for old in book_dir().glob(f"{BOOK_KIND}-v*.pdf"):
+        if old.stat().st_mtime < limit:
+            old.unlink(missing_ok=True)
+
+
+def run_pending(limit=None):
+    """Construit les tâches en attente ; retourne (réussies, échouées)."""
+    done = failed = 0
+    requeue_stale_jobs()
+    while limit is None or done + failed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        if build(job):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def delete_artifacts(voyage_id):
+    shutil.rmtree(voyage_dir(voyage_id), ignore_errors=True)
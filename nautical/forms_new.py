@@ -125,7 +125,7 @@ class LogEntryNewForm(forms.ModelForm):
         # Pré-remplir la date et l'heure actuelles pour les nouvelles entrées
         if not self.instance.pk:
             from django.utils import timezone
-            now = timezone.now()
+            now = timezone.localtime()
             self.fields['date'].initial = now.date()
             self.fields['heure'].initial = now.time()
 
@@ -146,7 +146,7 @@ class QuickLogEntryNewForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         if not self.instance.pk:
             from django.utils import timezone
-            now = timezone.now()
+            now = timezone.localtime()
             self.fields['heure'].initial = now.time()
 
 
@@ -0,0 +1,462 @@
+"""
+Calculs géodésiques partagés : distance orthodromique (haversine), cap initial,
+durées et vitesses entre positions successives.
+
+Deux API :
+- scalaire (`haversine_nm`, `bearing_deg`, ...) pour un segment isolé,
+  utilisée par les `save()` des modèles ;
+- vectorisée NumPy (`segment_distances_nm`, `track_segments`, ...) pour une
+  trace complète, sans aller-retour Decimal/float par point.
+"""
+import math
+import re
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+# Rayon moyen de la Terre et conversion en milles nautiques (1 NM = 1852 m)
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_NM = 1852.0
+EARTH_RADIUS_NM = EARTH_RADIUS_M / METERS_PER_NM
+
+CENT = Decimal('0.01')
+
+
+def quantize_2(value):
+    """Arrondit un float (ou Decimal) à 2 décimales (Decimal) pour le stockage
+    en base : arrondi décimal ROUND_HALF_UP de sa représentation (1.005 ->
+    1.01, -1.005 -> -1.01), comme les calculs d'origine des modèles.
+
+    `to_cents` et `round_cents` (NumPy) suivent la même règle : les sommes de
+    segments stockés et recalculés restent identiques. Retourne None si la
+    valeur est None ou NaN.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, Decimal):
+        value = float(value)
+        if math.isnan(value):
+            return None
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_cents(value):
+    """Convertit une valeur (float ou Decimal) en centièmes entiers, arrondi comme `quantize_2`."""
+    value = quantize_2(value)
+    if value is None:
+        return None
+    return int(value.scaleb(2))
+
+
+def from_cents(cents):
+    """Convertit des centièmes entiers en Decimal à 2 décimales."""
+    return Decimal(int(cents)).scaleb(-2)
+
+
+# =============================================================================
+# API SCALAIRE
+# =============================================================================
+
+def haversine_nm(lat1, lon1, lat2, lon2):
+    """Distance orthodromique en milles nautiques entre deux positions (degrés).
+
+    Accepte des float ou des Decimal.
+    """
+    rlat1 = math.radians(float(lat1))
+    rlat2 = math.radians(float(lat2))
+    dlat = rlat2 - rlat1
+    dlon = math.radians(float(lon2)) - math.radians(float(lon1))
+    a = math.sin(dlat / 2) ** 2 + math.cos(rlat1) * math.cos(rlat2) * math.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_NM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def bearing_deg(lat1, lon1, lat2, lon2):
+    """Cap vrai initial (0-360°) pour aller de la position 1 à la position 2."""
+    rlat1 = math.radians(float(lat1))
+    rlat2 = math.radians(float(lat2))
+    dlon = math.radians(float(lon2)) - math.radians(float(lon1))
+    x = math.sin(dlon) * math.cos(rlat2)
+    y = math.cos(rlat1) * math.sin(rlat2) - math.sin(rlat1) * math.cos(rlat2) * math.cos(dlon)
+    return (math.degrees(math.atan2(x, y)) + 360.0) % 360.0
+
+
+# Rose des vents à 16 aires, en notation française (O = ouest)
+COMPASS_POINTS = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSO', 'SO', 'OSO', 'O', 'ONO', 'NO', 'NNO']
+
+
+def compass_point(degrees):
+    """Aire de vent (16 aires) la plus proche d'une direction en degrés : 200 -> 'SSO'."""
+    return COMPASS_POINTS[int((float(degrees) % 360) / 22.5 + 0.5) % 16]
+
+
+def angle_difference(a, b):
+    """Écart angulaire absolu (0-180°) entre deux directions."""
+    return abs((float(a) - float(b) + 180) % 360 - 180)
+
+
+def hours_between(start, end):
+    """Nombre d'heures (float) entre deux datetimes."""
+    return (end - start).total_seconds() / 3600.0
+
+
+def format_position(lat, lng):
+    """Position lisible au format du livre de bord : 17°35.20'S / 149°36.10'W."""
+    def fmt(value, positive, negative, width):
+        value = float(value)
+        hemisphere = positive if value >= 0 else negative
+        minutes = round(abs(value) * 60, 2)
+        degrees, minutes = divmod(minutes, 60)
+        return f"{int(degrees):0{width}d}°{minutes:05.2f}'{hemisphere}"
+    return f"{fmt(lat, 'N', 'S', 2)} / {fmt(lng, 'E', 'W', 3)}"
+
+
+_POSITION_TOKEN = re.compile(r"\d+(?:[.,]\d+)?|(?<![A-Z])[NSEWO](?![A-Z])|-")
+_HEMISPHERE_WORDS = {'NORD': 'N', 'SUD': 'S', 'EST': 'E', 'OUEST': 'W'}
+
+
+def _sexagesimal(numbers):
+    """Degrés décimaux à partir de [degrés], [degrés, minutes] ou [degrés, minutes, secondes]."""
+    if not 1 <= len(numbers) <= 3:
+        return None
+    if any(value >= 60 for value in numbers[1:]):
+        return None
+    if len(numbers) > 1 and numbers[0] != int(numbers[0]):
+        return None
+    return sum(value / 60 ** i for i, value in enumerate(numbers))
+
+
+def parse_position(text):
+    """Lit une position saisie à la main ; retourne (latitude, longitude) en
+    degrés décimaux signés, ou None si le texte n'est pas reconnu.
+
+    Formes acceptées (séparateurs °, ', ", espaces, / ou virgule indifférents) :
+    - minutes décimales : 17°35.2'S / 149°36.1'W
+    - degrés, minutes, secondes : 17°35'12"S 149°36'06"W
+    - hémisphère en préfixe : S 17°35.2' W 149°36.1'
+    - degrés décimaux : -17.5867, -149.6017 ou 17.5867S 149.6017W
+    O (ouest) est accepté pour W, ainsi que NORD/SUD/EST/OUEST en toutes
+    lettres ; la latitude peut venir en second si les hémisphères sont indiqués.
+    """
+    if not text:
+        return None
+    normalized = text.upper().replace('−', '-').replace('º', '°')
+    normalized = re.sub(r"\b(NORD|SUD|EST|OUEST)\b", lambda m: _HEMISPHERE_WORDS[m.group(1)], normalized)
+    # une virgule suivie d'un espace ou d'un signe sépare latitude et longitude
+    normalized = re.sub(r",(?=\s|-|$)", ' ', normalized)
+    tokens = _POSITION_TOKEN.findall(normalized)
+    letters = [t for t in tokens if t in ('N', 'S', 'E', 'W', 'O')]
+
+    parts = []  # [(hémisphère ou None, signe, [nombres])]
+    if letters:
+        if len(letters) != 2:
+            return None
+        prefix = tokens[0] in letters
+        current = None
+        for token in tokens:
+            if token == '-':
+                continue
+            if token in letters:
+                if prefix:
+                    current = (token, 1, [])
+                    parts.append(current)
+                else:
+                    if current is None:
+                        return None
+                    parts[-1] = (token, 1, current[2])
+                    current = None
+            else:
+                if current is None:
+                    current = (None, 1, [])
+                    parts.append(current)
+                current[2].append(float(token.replace(',', '.')))
+        if len(parts) != 2 or any(hemisphere is None for hemisphere, _, _ in parts):
+            return None
+    else:
+        sign = 1
+        numbers = []
+        signs = []
+        for token in tokens:
+            if token == '-':
+                sign = -1
+                continue
+            signs.append(sign)
+            numbers.append(float(token.replace(',', '.')))
+            sign = 1
+        if len(numbers) not in (2, 4, 6):
+            return None
+        half = len(numbers) // 2
+        parts = [(None, signs[0], numbers[:half]), (None, signs[half], numbers[half:])]
+
+    latitude = longitude = None
+    for index, (hemisphere, sign, numbers) in enumerate(parts):
+        value = _sexagesimal(numbers)
+        if value is None:
+            return None
+        if hemisphere in ('S', 'W', 'O'):
+            sign = -1
+        is_latitude = hemisphere in ('N', 'S') if hemisphere else index == 0
+        if is_latitude:
+            latitude = sign * value
+        else:
+            longitude = sign * value
+    if latitude is None or longitude is None or abs(latitude) > 90 or abs(longitude) > 180:
+        return None
+    return latitude, longitude
+
+
+def speed_kn(distance_nm, hours):
+    """Vitesse moyenne en nœuds, ou None si la durée est nulle ou inconnue."""
+    if distance_nm is None or not hours or float(hours) <= 0:
+        return None
+    return float(distance_nm) / float(hours)
+
+
+# =============================================================================
+# GEOHASH
+# =============================================================================
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # cellules d'environ 5 m x 5 m
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    """Geohash d'une position (degrés), ou '' si la position est incomplète."""
+    if lat is None or lng is None:
+        return ''
+    lat, lng = float(lat), float(lng)
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # les bits pairs codent la longitude
+    while len(chars) < precision:
+        rng, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """(hauteur, largeur) en degrés d'une cellule geohash de `precision` caractères."""
+    lat_bits = 5 * precision // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def geohash_cells(min_lat, min_lng, max_lat, max_lng, max_cells=32):
+    """Préfixes geohash couvrant une emprise, au niveau le plus fin tel que
+    leur nombre ne dépasse pas `max_cells`. Chaque préfixe se traduit par un
+    parcours d'intervalle sur l'index de la colonne geohash.
+
+    Une emprise qui traverse l'antiméridien (min_lng > max_lng) est découpée en deux.
+    """
+    if min_lng > max_lng:
+        return sorted(
+            set(geohash_cells(min_lat, min_lng, max_lat, 180.0, max_cells // 2))
+            | set(geohash_cells(min_lat, -180.0, max_lat, max_lng, max_cells // 2))
+        )
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        lat_max_index = int(180.0 / height) - 1
+        lng_max_index = int(360.0 / width) - 1
+        i0 = max(0, int(math.floor((min_lat + 90.0) / height)))
+        i1 = min(lat_max_index, int(math.floor((max_lat + 90.0) / height)))
+        j0 = max(0, int(math.floor((min_lng + 180.0) / width)))
+        j1 = min(lng_max_index, int(math.floor((max_lng + 180.0) / width)))
+        if (i1 - i0 + 1) * (j1 - j0 + 1) <= max_cells:
+            return sorted({
+                geohash_encode((i + 0.5) * height - 90.0, (j + 0.5) * width - 180.0, precision)
+                for i in range(i0, i1 + 1)
+                for j in range(j0, j1 + 1)
+            })
+    return ['']
+
+
+def bbox_around(lat, lng, radius_nm):
+    """Emprise (min_lat, min_lng, max_lat, max_lng) contenant le cercle de rayon `radius_nm`.
+
+    Si le cercle contient un pôle, toutes les longitudes (-180..180) sont
+    couvertes ; sinon l'écart de longitude est celui du point le plus à
+    l'est du cercle, asin(sin r / cos lat).
+    """
+    lat = min(90.0, max(-90.0, float(lat)))
+    lng = float(lng)
+    angle = radius_nm / EARTH_RADIUS_NM
+    dlat = math.degrees(angle)
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    cos_lat = math.cos(math.radians(lat))
+    if angle >= math.pi / 2 or math.sin(angle) >= cos_lat:
+        return min_lat, -180.0, max_lat, 180.0
+    dlng = math.degrees(math.asin(math.sin(angle) / cos_lat))
+    min_lng, max_lng = lng - dlng, lng + dlng
+    if min_lng < -180.0:
+        min_lng += 360.0
+    if max_lng > 180.0:
+        max_lng -= 360.0
+    return min_lat, min_lng, max_lat, max_lng
+
+
+# =============================================================================
+# API VECTORISÉE (NumPy)
+# =============================================================================
+
+TrackSegments = namedtuple('TrackSegments', [
+    'distance_nm',   # (n-1,) distance de chaque segment, NaN si position manquante
+    'cumulative_nm', # (n,) distance cumulée depuis le premier point
+    'elapsed_hours', # (n-1,) durée de chaque segment
+    'speed_kn',      # (n-1,) vitesse moyenne de chaque segment, NaN si durée nulle
+    'bearing_deg',   # (n-1,) cap vrai initial de chaque segment
+])
+
+
+def as_float_array(values):
+    """Convertit une séquence (Decimal, float, None) en tableau float64, None -> NaN."""
+    if isinstance(values, np.ndarray):
+        return values.astype(float, copy=False)
+    return np.fromiter(
+        (math.nan if v is None else float(v) for v in values),
+        dtype=float,
+    )
+
+
+def as_epoch_seconds(timestamps):
+    """Convertit une séquence de datetimes en secondes depuis l'epoch (float64)."""
+    if isinstance(timestamps, np.ndarray):
+        return timestamps.astype(float, copy=False)
+    return np.fromiter((t.timestamp() for t in timestamps), dtype=float)
+
+
+def segment_distances_nm(lats, lngs):
+    """Distances (NM) entre points consécutifs d'une trace : tableau de taille n-1."""
+    lat = np.radians(as_float_array(lats))
+    lng = np.radians(as_float_array(lngs))
+    if lat.size < 2:
+        return np.empty(0)
+    dlat = np.diff(lat)
+    dlon = np.diff(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_NM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def distances_from_nm(lat, lng, lats, lngs):
+    """Distances (NM) d'une position à chacun des points `lats`/`lngs`."""
+    lat2 = np.radians(as_float_array(lats))
+    lng2 = np.radians(as_float_array(lngs))
+    lat1 = math.radians(float(lat))
+    dlat = lat2 - lat1
+    dlon = lng2 - math.radians(float(lng))
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_NM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def cumulative_distances_nm(lats, lngs):
+    """Distance cumulée (NM) à chaque point, les segments sans position comptant 0."""
+    segments = segment_distances_nm(lats, lngs)
+    return np.concatenate(([0.0], np.nancumsum(segments)))
+
+
+def segment_bearings_deg(lats, lngs):
+    """Cap vrai initial (0-360°) de chaque segment : tableau de taille n-1."""
+    lat = np.radians(as_float_array(lats))
+    lng = np.radians(as_float_array(lngs))
+    if lat.size < 2:
+        return np.empty(0)
+    dlon = np.diff(lng)
+    x = np.sin(dlon) * np.cos(lat[1:])
+    y = np.cos(lat[:-1]) * np.sin(lat[1:]) - np.sin(lat[:-1]) * np.cos(lat[1:]) * np.cos(dlon)
+    return (np.degrees(np.arctan2(x, y)) + 360.0) % 360.0
+
+
+def segment_hours(timestamps):
+    """Durée (heures) de chaque segment : tableau de taille n-1."""
+    seconds = as_epoch_seconds(timestamps)
+    return np.diff(seconds) / 3600.0
+
+
+def round_cents(values):
+    """Version vectorisée de `to_cents` : centièmes entiers (int64), NaN -> 0.
+
+    Le calcul flottant (arrondi de |x|·100 au plus proche, demi vers
+    l'extérieur) ne peut différer de l'arrondi décimal qu'à un demi-centième
+    près : ces rares valeurs passent par `to_cents`."""
+    values = as_float_array(values)
+    scaled = np.abs(values) * 100
+    with np.errstate(invalid='ignore'):
+        cents = np.where(np.isnan(values), 0, np.sign(values) * np.floor(scaled + 0.5)).astype(np.int64)
+        ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in ties:
+        cents[i] = to_cents(values[i])
+    return cents
+
+
+def segment_speeds_kn(distances_nm, hours):
+    """Vitesse (nœuds) de chaque segment, NaN lorsque la durée est nulle."""
+    distances_nm = as_float_array(distances_nm)
+    hours = as_float_array(hours)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(hours > 0, distances_nm / hours, np.nan)
+
+
+def simplify_indices(lats, lngs, tolerance_nm):
+    """Douglas-Peucker : indices des points conservés pour une tolérance en NM.
+
+    Les distances sont calculées dans une projection équirectangulaire locale
+    (suffisante à l'échelle d'une trace), de façon itérative et vectorisée
+    segment par segment. Le premier et le dernier point sont toujours gardés.
+    """
+    lat = as_float_array(lats)
+    lng = as_float_array(lngs)
+    n = lat.size
+    if n <= 2 or not tolerance_nm or tolerance_nm <= 0:
+        return np.arange(n)
+    y = lat * 60.0
+    x = lng * 60.0 * math.cos(math.radians(float(np.mean(lat))))
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        px = x[start + 1:end] - x[start]
+        py = y[start + 1:end] - y[start]
+        norm = math.hypot(dx, dy)
+        if norm == 0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(dx * py - dy * px) / norm
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance_nm:
+            k = start + 1 + i
+            keep[k] = True
+            stack.append((start, k))
+            stack.append((k, end))
+    return np.flatnonzero(keep)
+
+
+def track_segments(lats, lngs, timestamps):
+    """Calcule en une passe toutes les grandeurs d'une trace ordonnée par date."""
+    distances = segment_distances_nm(lats, lngs)
+    hours = segment_hours(timestamps)
+    return TrackSegments(
+        distance_nm=distances,
+        cumulative_nm=np.concatenate(([0.0], np.nancumsum(distances))),
+        elapsed_hours=hours,
+        speed_kn=segment_speeds_kn(distances, hours),
+        bearing_deg=segment_bearings_deg(lats, lngs),
+    )
@@ -0,0 +1,242 @@
+"""
+Journal automatique des instruments de bord (flux NMEA 0183).
+
+- `InstrumentState` : dernières valeurs connues (position, cap, loch, vent,
+  sonde, baromètre), mises à jour phrase par phrase, en mémoire.
+- `AutoLogger` : décide quand une entrée de log est due, à intervalle
+  régulier ou sur changement significatif (vent, cap, baromètre), et produit
+  les valeurs de l'entrée.
+- `write_readings` : écrit un lot d'entrées dans le voyage en cours, en une
+  transaction (bulk_create).
+
+Utilisé par `manage.py nmea_listener` : la base n'est touchée qu'au rythme
+des lots d'entrées, jamais à celui des capteurs.
+"""
+import bisect
+import math
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import geo, nmea, signals
+from .models_new import BEAUFORT_KNOTS, LogEntryNew, VoyageLogNew
+
+# Au-delà de ce délai (secondes) sans nouvelle phrase, une valeur est périmée
+STALE_AFTER_SECONDS = 120
+
+AUTO_LOG_EVENT = "Relevé automatique des instruments"
+
+
+class InstrumentState:
+    """Dernières valeurs reçues des instruments.
+
+    Le vent réel est pris des phrases MWV « T » quand la centrale en émet,
+    sinon calculé à partir du vent apparent et de la vitesse du bateau.
+    """
+
+    FIELDS = (
+        'latitude', 'longitude', 'sog_kn', 'cog_deg', 'heading_true_deg', 'heading_mag_deg',
+        'stw_kn', 'log_total_nm', 'depth_m', 'pressure_hpa', 'air_temp_c', 'tws_kn', 'twd_deg',
+    )
+
+    def __init__(self, stale_after=STALE_AFTER_SECONDS):
+        self.stale_after = stale_after
+        self.gps_time = None
+        self.values = {}
+        self.seen_at = {}
+        self.sentences = 0
+        self._true_wind = False
+
+    def _set(self, name, value, seen):
+        if value is not None:
+            self.values[name] = value
+            self.seen_at[name] = seen
+
+    def get(self, name):
+        """Valeur courante, ou None si jamais reçue ou périmée."""
+        seen = self.seen_at.get(name)
+        if seen is None or time.monotonic() - seen > self.stale_after:
+            return None
+        return self.values[name]
+
+    def clock(self):
+        """Heure de référence : celle du GPS tant qu'il émet, sinon l'horloge système."""
+        if self.gps_time is not None and self.get('latitude') is not None:
+            return self.gps_time
+        return timezone.now()
+
+    def heading(self):
+        """Cap du bateau : vrai, sinon magnétique, sinon route fond."""
+        for name in ('heading_true_deg', 'heading_mag_deg', 'cog_deg'):
+            value = self.get(name)
+            if value is not None:
+                return value
+        return None
+
+    def feed(self, line):
+        """Intègre une ligne NMEA ; retourne True si elle a été reconnue."""
+        parsed = nmea.parse_sentence(line)
+        if parsed is None:
+            return False
+        kind, values = parsed
+        seen = time.monotonic()
+        self.sentences += 1
+        if kind == 'RMC':
+            self.gps_time = values['timestamp']
+        elif kind == 'GGA' and self.gps_time is not None:
+            self.gps_time = nmea.date_fix_time(self.gps_time, values['time'])
+        if kind == 'MWV':
+            self._feed_wind(values, seen)
+            return True
+        if kind == 'VLW':
+            self._set('log_total_nm', values['log_total_nm'], seen)
+            return True
+        for name, value in values.items():
+            if name in self.FIELDS:
+                self._set(name, value, seen)
+        return True
+
+    def _feed_wind(self, values, seen):
+        angle = values['wind_angle_deg']
+        speed = values['wind_speed_kn']
+        if values['wind_reference'] == 'T':
+            self._true_wind = True
+        elif self._true_wind:
+            return
+        else:
+            # Vent apparent -> vent réel : on retire la vitesse du bateau (axe de l'étrave)
+            boat = self.get('stw_kn')
+            if boat is None:
+                boat = self.get('sog_kn') or 0.0
+            x = speed * math.cos(math.radians(angle)) - boat
+            y = speed * math.sin(math.radians(angle))
+            speed = math.hypot(x, y)
+            angle = math.degrees(math.atan2(y, x))
+        heading = self.heading()
+        self._set('tws_kn', speed, seen)
+        if heading is not None:
+            self._set('twd_deg', (heading + angle) % 360, seen)
+
+
+def _beaufort(knots):
+    return bisect.bisect_right(BEAUFORT_KNOTS, knots)
+
+
+class AutoLogger:
+    """Décide des entrées à écrire d'après l'état des instruments.
+
+    Une entrée est due toutes les `interval` secondes (heure GPS), ou plus
+    tôt sur changement significatif depuis la dernière entrée, mais jamais
+    moins de `min_interval` secondes après elle.
+    """
+
+    def __init__(self, interval=3600, min_interval=300, heading_change=30, wind_change=2, pressure_change=2):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.heading_change = heading_change
+        self.wind_change = wind_change
+        self.pressure_change = pressure_change
+        self.last = None
+
+    def _changes(self, reading):
+        last = self.last
+        changes = []
+        if reading['_heading'] is not None and last['_heading'] is not None:
+            if geo.angle_difference(reading['_heading'], last['_heading']) >= self.heading_change:
+                changes.append(f"changement de cap ({last['_heading']:.0f}° → {reading['_heading']:.0f}°)")
+        if reading['_beaufort'] is not None and last['_beaufort'] is not None:
+            if abs(reading['_beaufort'] - last['_beaufort']) >= self.wind_change:
+                changes.append(f"vent force {last['_beaufort']} → {reading['_beaufort']}")
+        if reading['barometre'] is not None and last['barometre'] is not None:
+            if abs(reading['barometre'] - last['barometre']) >= self.pressure_change:
+                changes.append(f"baromètre {last['barometre']} → {reading['barometre']} hPa")
+        return changes
+
+    def check(self, state):
+        """Valeurs d'une nouvelle entrée si elle est due, sinon None."""
+        reading = self.reading(state)
+        if reading is None:
+            return None
+        if self.last is None:
+            reason = "démarrage"
+        else:
+            elapsed = (reading['_at'] - self.last['_at']).total_seconds()
+            if elapsed >= self.interval or elapsed < 0:
+                # intervalle écoulé, ou horloge revenue en arrière (GPS réinitialisé)
+                reason = None
+            elif elapsed >= self.min_interval:
+                changes = self._changes(reading)
+                if not changes:
+                    return None
+                reason = ', '.join(changes)
+            else:
+                return None
+        self.last = reading
+        if reason:
+            reading['evenements'] = f"{AUTO_LOG_EVENT} ({reason})"
+        return reading
+
+    @staticmethod
+    def reading(state):
+        """Valeurs LogEntryNew de l'état courant (None sans aucune donnée utile)."""
+        latitude, longitude = state.get('latitude'), state.get('longitude')
+        heading = state.heading()
+        tws, twd = state.get('tws_kn'), state.get('twd_deg')
+        log_nm, depth, pressure = state.get('log_total_nm'), state.get('depth_m'), state.get('pressure_hpa')
+        if all(v is None for v in (latitude, heading, tws, log_nm, depth, pressure)):
+            return None
+        at = state.clock()
+        local = timezone.localtime(at)
+        beaufort = _beaufort(tws) if tws is not None else None
+        positioned = latitude is not None and longitude is not None
+        compass = state.get('heading_mag_deg')
+        if compass is None:
+            compass = heading
+        return {
+            '_at': at,
+            '_heading': heading,
+            '_beaufort': beaufort,
+            'date': local.date(),
+            'heure': local.time().replace(microsecond=0),
+            'evenements': AUTO_LOG_EVENT,
+            'position': geo.format_position(latitude, longitude) if positioned else '',
+            'origine_position': 'gps' if positioned else '',
+            'latitude': Decimal(f"{latitude:.7f}") if positioned else None,
+            'longitude': Decimal(f"{longitude:.7f}") if positioned else None,
+            'cap_compas': int(round(compass)) % 360 if compass is not None else None,
+            'log_nautique': Decimal(f"{log_nm:.2f}") if log_nm is not None else None,
+            'vent_force': f"{beaufort} Bft ({tws:.0f} kn)" if beaufort is not None else '',
+            'vent_direction': geo.compass_point(twd) if twd is not None else '',
+            'sonde': Decimal(f"{depth:.1f}") if depth is not None else None,
+            'barometre': Decimal(f"{pressure:.1f}") if pressure is not None else None,
+        }
+
+
+def current_voyage_id():
+    """Voyage « en cours » le plus récent, ou None."""
+    return (
+        VoyageLogNew.objects.filter(statut='en_cours')
+        .order_by('-date_debut', '-pk').values_list('pk', flat=True).first()
+    )
+
+
+def write_readings(voyage_id, readings):
+    """Écrit un lot de relevés (dicts de `AutoLogger.check`) dans un voyage.
+
+    bulk_create ne déclenche pas les signaux : les données dérivées sont mises
+    à jour par `signals.after_bulk_entries`, de façon incrémentale (le coût
+    d'un lot ne dépend pas de la taille du voyage). Retourne les entrées créées.
+    """
+    entries = []
+    for reading in readings:
+        entry = LogEntryNew(voyage_id=voyage_id, **{k: v for k, v in reading.items() if not k.startswith('_')})
+        entry.update_geohash()
+        entry.update_timestamp()
+        entries.append(entry)
+    timestamps = [entry.timestamp for entry in entries]
+    with transaction.atomic():
+        LogEntryNew.objects.bulk_create(entries)
+        signals.after_bulk_entries(voyage_id, [entry.pk for entry in entries], (min(timestamps), max(timestamps)))
+    return entries
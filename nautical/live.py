@@ -0,0 +1,87 @@
+"""
+Flux Server-Sent Events du mode live d'un livre de bord.
+
+Le flux pousse les entrées de log créées ou modifiées (événement `entry`,
+JSON compact de `LogEntryNew.to_live_json()`) et les suppressions
+(événement `delete`). Chaque événement porte l'identifiant de la ligne
+`LogEntryChange` correspondante : à la reconnexion, le navigateur renvoie
+l'en-tête Last-Event-ID et le flux reprend exactement après.
+
+Le flux n'est servi que sous ASGI (sailing_logbook/asgi.py) : c'est un
+générateur asynchrone, une connexion ouverte n'occupe pas de thread. Sous
+WSGI (PythonAnywhere, runserver), chaque flux ouvert bloquerait un worker
+pendant LIVE_STREAM_SECONDS : la vue répond 204 et la page live synchronise
+toutes les LIVE_SYNC_POLL_SECONDS secondes par `?cursor=` sur l'API des
+entrées (même journal LogEntryChange).
+
+Le journal est relu toutes les LIVE_POLL_SECONDS secondes (requête sur
+l'index (voyage, id)) ; un commentaire de maintien est envoyé après
+LIVE_HEARTBEAT_SECONDS secondes de silence. Le flux se ferme après
+LIVE_STREAM_SECONDS secondes et EventSource se reconnecte de lui-même.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+from .models_new import LogEntryChange
+
+LIVE_POLL_SECONDS = 2
+LIVE_HEARTBEAT_SECONDS = 15
+LIVE_STREAM_SECONDS = 300
+LIVE_RETRY_MS = 3000
+LIVE_BATCH_SIZE = 200
+# Synchronisation par curseur de la page live quand le flux n'est pas servi
+LIVE_SYNC_POLL_SECONDS = 15
+
+
+def stream_available(request):
+    """Le flux SSE n'est servi qu'aux requêtes ASGI."""
+    return isinstance(request, ASGIRequest)
+
+
+def parse_cursor(request):
+    """Curseur de reprise : en-tête Last-Event-ID, sinon `?cursor=` ; None si absent."""
+    value = request.headers.get('Last-Event-ID') or request.GET.get('cursor')
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def format_event(change, entry):
+    """Message SSE d'une modification (entry=None : suppression ou entrée disparue)."""
+    if entry is None:
+        event, data = 'delete', {'id': change.entry_id}
+    else:
+        event, data = 'entry', entry.to_live_json()
+    return f"id: {change.id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _poll(voyage_id, cursor):
+    """(nouveau curseur, messages SSE, lot complet ?) depuis `cursor`."""
+    changes = LogEntryChange.since(voyage_id, cursor, limit=LIVE_BATCH_SIZE)
+    if changes:
+        cursor = changes[-1][0].id
+    return cursor, [format_event(change, entry) for change, entry in changes], len(changes) == LIVE_BATCH_SIZE
+
+
+async def stream_async(voyage_id, cursor):
+    """Générateur asynchrone du flux (ASGI)."""
+    yield f"retry: {LIVE_RETRY_MS}\n\n"
+    if cursor is None:
+        cursor = await sync_to_async(LogEntryChange.latest_id)(voyage_id)
+    loop = asyncio.get_running_loop()
+    started = last_sent = loop.time()
+    while loop.time() - started < LIVE_STREAM_SECONDS:
+        cursor, messages, more = await sync_to_async(_poll)(voyage_id, cursor)
+        now = loop.time()
+        if messages:
+            yield ''.join(messages)
+            last_sent = now
+        elif now - last_sent >= LIVE_HEARTBEAT_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = now
+        if not more:
+            await asyncio.sleep(LIVE_POLL_SECONDS)
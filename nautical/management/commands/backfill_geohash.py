@@ -0,0 +1,52 @@
+"""
+Calcule la colonne geohash des positions existantes (VoyageEvent, LogEntryNew).
+
+Usage :
+    python manage.py backfill_geohash [--source events|log] [--batch-size 2000] [--all]
+
+Parcours par clé primaire croissante et écriture par lots (bulk_update) ;
+sans --all, seules les lignes positionnées dont le geohash est vide sont traitées,
+la commande peut donc être relancée après une interruption.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from nautical import geo, spatial
+
+
+class Command(BaseCommand):
+    help = "Renseigne le geohash des positions existantes (par lots)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=spatial.SOURCES, action='append',
+                            help="events : VoyageEvent ; log : LogEntryNew (défaut : les deux)")
+        parser.add_argument('--batch-size', type=int, default=2000, help='Taille des lots bulk_update')
+        parser.add_argument('--all', action='store_true', help='Recalcule aussi les geohash déjà renseignés')
+
+    def handle(self, *args, **options):
+        for kind in options['source'] or spatial.SOURCES:
+            model = spatial.model_for(kind)
+            qs = model.objects.all()
+            if not options['all']:
+                qs = qs.filter(geohash='', latitude__isnull=False, longitude__isnull=False)
+            updated = 0
+            last_pk = 0
+            while True:
+                rows = list(
+                    qs.filter(pk__gt=last_pk).order_by('pk')
+                    .only('pk', 'latitude', 'longitude', 'geohash')[:options['batch_size']]
+                )
+                if not rows:
+                    break
+                changed = []
+                for row in rows:
+                    value = geo.geohash_encode(row.latitude, row.longitude)
+                    if value != row.geohash:
+                        row.geohash = value
+                        changed.append(row)
+                with transaction.atomic():
+                    model.objects.bulk_update(changed, ['geohash'])
+                updated += len(changed)
+                last_pk = rows[-1].pk
+                self.stdout.write(f"{model._meta.verbose_name_plural} : {updated} geohash mis à jour (jusqu'à #{last_pk})")
+            self.stdout.write(self.style.SUCCESS(f"{model._meta.verbose_name_plural} : {updated} geohash mis à jour"))
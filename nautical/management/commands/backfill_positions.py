@@ -0,0 +1,67 @@
+"""
+Renseigne latitude/longitude des entrées de log à partir du texte `position`.
+
+Usage :
+    python manage.py backfill_positions [--batch-size 1000] [--after PK] [--dry-run]
+
+Seules les entrées avec un texte de position et sans coordonnées sont lues,
+par clé primaire croissante et par lots (bulk_update) : une exécution
+interrompue peut être relancée telle quelle, ou reprise avec --after au
+dernier identifiant affiché. Les données dérivées des voyages modifiés
+(statistiques, agrégats, traces, journal des modifications) sont mises à jour
+à la fin par signals.after_bulk_entries (bulk_update ne déclenche pas les
+signaux).
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from nautical import signals
+from nautical.models_new import LogEntryNew
+
+
+class Command(BaseCommand):
+    help = "Convertit le texte de position des entrées de log en coordonnées (par lots)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Taille des lots bulk_update')
+        parser.add_argument('--after', type=int, default=0, help="Reprendre après cet identifiant d'entrée")
+        parser.add_argument('--dry-run', action='store_true', help="N'écrit rien, liste les positions non reconnues")
+
+    def handle(self, *args, **options):
+        qs = LogEntryNew.objects.exclude(position='').filter(
+            Q(latitude__isnull=True) | Q(longitude__isnull=True)
+        )
+        last_pk = options['after']
+        parsed = unparsed = 0
+        voyages = {}
+        while True:
+            rows = list(
+                qs.filter(pk__gt=last_pk).order_by('pk')
+                .only('pk', 'voyage_id', 'position', 'latitude', 'longitude', 'geohash')[:options['batch_size']]
+            )
+            if not rows:
+                break
+            changed = []
+            for entry in rows:
+                if entry.update_coordinates():
+                    entry.update_geohash()
+                    changed.append(entry)
+                    voyages.setdefault(entry.voyage_id, []).append(entry.pk)
+                else:
+                    unparsed += 1
+                    if options['dry_run']:
+                        self.stdout.write(f"  #{entry.pk} non reconnue : {entry.position!r}")
+            if changed and not options['dry_run']:
+                with transaction.atomic():
+                    LogEntryNew.objects.bulk_update(changed, ['latitude', 'longitude', 'geohash'])
+            parsed += len(changed)
+            last_pk = rows[-1].pk
+            self.stdout.write(f"{parsed} positions converties, {unparsed} non reconnues (jusqu'à #{last_pk})")
+
+        if not options['dry_run']:
+            for voyage_id, ids in sorted(voyages.items()):
+                signals.after_bulk_entries(voyage_id, ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"{parsed} positions converties sur {len(voyages)} voyages, {unparsed} non reconnues"
+        ))
@@ -0,0 +1,96 @@
+"""
+Benchmark du livre de bord complet (reports.voyage_complete) : pages par
+seconde et pic de mémoire selon le nombre d'entrées.
+
+Pour chaque taille, un voyage synthétique est rendu deux fois dans un
+fichier temporaire : une fois chronométrée, une fois sous tracemalloc (pic
+des allocations Python pendant le rendu, plus lent). Le pic doit rester à
+peu près constant quand le nombre d'entrées augmente.
+
+Les données synthétiques sont créées dans une transaction annulée à la fin :
+la base n'est pas modifiée.
+
+Usage :
+    python manage.py bench_complete_logbook [--entries 1000 5000 20000]
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from nautical import reports
+from nautical.models_new import LogEntryNew, VoyageLogNew, VoyageStats
+
+
+class _Rollback(Exception):
+    pass
+
+
+EVENTS = [
+    "Quart de nuit, RAS",
+    "Prise de ris dans la grand-voile, vent en hausse, mer formée sur l'arrière du travers",
+    "Grain sous le vent, affalé le génois, moteur 10 minutes puis reprise à la voile",
+    "Point GPS",
+]
+
+
+class Command(BaseCommand):
+    help = "Mesure les pages par seconde et le pic mémoire du livre de bord complet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, nargs='+', default=[1000, 5000, 20000],
+                            help="Nombres d'entrées du voyage synthétique")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"  {'entrées':>8} {'pages':>6} {'durée':>9} {'pages/s':>8} {'pic mémoire':>12}")
+        for count in options['entries']:
+            try:
+                with transaction.atomic():
+                    voyage = self._populate(count)
+                    pages, seconds = self._render(voyage, traced=False)
+                    _, peak = self._render(voyage, traced=True)
+                    raise _Rollback
+            except _Rollback:
+                pass
+            self.stdout.write(
+                f"  {count:>8} {pages:>6} {seconds:7.2f} s {pages / seconds:8.1f} {peak / 2**20:9.1f} Mo"
+            )
+        self.stdout.write(self.style.SUCCESS("Données synthétiques supprimées (transaction annulée)"))
+
+    def _populate(self, count):
+        voyage = VoyageLogNew.objects.create(port_depart='Papeete', port_arrivee='Papeete', sujet_voyage='Tour du monde')
+        start = datetime(2030, 1, 1)
+        entries = []
+        for i in range(count):
+            at = start + timedelta(minutes=30 * i)
+            entry = LogEntryNew(voyage=voyage, date=at.date(), heure=at.time(), evenements=EVENTS[i % len(EVENTS)],
+                                allure='largue', vent_force='F5', vent_direction='SE', barometre=1012,
+                                position=f"{i % 90}°{i % 60:02d}'S / {i % 180}°{i % 60:02d}'W")
+            entry.update_timestamp()
+            entries.append(entry)
+        LogEntryNew.objects.bulk_create(entries, batch_size=1000)
+        # bulk_create ne déclenche pas les signaux
+        VoyageStats.rebuild(voyage.pk)
+        return voyage
+
+    def _render(self, voyage, traced):
+        """(pages, secondes) sans traçage, (pages, pic en octets) avec."""
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                if traced:
+                    tracemalloc.start()
+                started = time.perf_counter()
+                pages = reports.voyage_complete(voyage.pk, output)
+                elapsed = time.perf_counter() - started
+                if traced:
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    return pages, peak
+            return pages, elapsed
+        finally:
+            os.unlink(path)
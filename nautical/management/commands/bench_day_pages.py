@@ -0,0 +1,101 @@
+"""
+Benchmark du livre de bord page par page (nautical.day_pages) : durée et
+taille du fichier avec le fond de page partagé (form XObject dessiné une
+fois) et en redessinant le fond sur chaque page.
+
+Les données synthétiques sont créées dans une transaction annulée à la fin :
+la base n'est pas modifiée.
+
+Usage :
+    python manage.py bench_day_pages [--days 60] [--entries-per-day 24]
+"""
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from nautical import day_pages
+from nautical.models_new import (
+    CrewMemberNew, IncidentNew, LogEntryNew, VoyageLogNew, VoyageStats, WeatherConditionNew,
+)
+
+from .bench_complete_logbook import EVENTS
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare durée et taille du livre de bord page par page, fond partagé ou redessiné"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=60, help="Jours de mer du voyage synthétique")
+        parser.add_argument('--entries-per-day', type=int, default=24)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                voyage = self._populate(options['days'], options['entries_per_day'])
+                results = [(label, *self._render(voyage, reuse)) for label, reuse in
+                           (("fond partagé", True), ("fond redessiné", False))]
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(f"  {'':<15} {'pages':>6} {'durée':>9} {'taille':>10}")
+        for label, pages, seconds, size in results:
+            self.stdout.write(f"  {label:<15} {pages:>6} {seconds:7.2f} s {size / 1024:7.0f} Ko")
+        self.stdout.write(self.style.SUCCESS("Données synthétiques supprimées (transaction annulée)"))
+
+    def _populate(self, days, per_day):
+        voyage = VoyageLogNew.objects.create(
+            port_depart='Papeete', port_arrivee='Nuku Hiva', sujet_voyage='Marquises', skipper='Benchmark', bateau='Benchmark',
+        )
+        start = datetime(2030, 1, 1)
+        entries, bulletins, incidents = [], [], []
+        for day in range(days):
+            noon = timezone.make_aware(start + timedelta(days=day, hours=6))
+            for i in range(per_day):
+                at = start + timedelta(days=day, minutes=24 * 60 * i // per_day)
+                entry = LogEntryNew(voyage=voyage, date=at.date(), heure=at.time(), evenements=EVENTS[i % len(EVENTS)],
+                                    log_nautique=day * 120 + i * 5, cap_compas=45, allure='largue', voilure='GV 1 ris, génois',
+                                    vent_force='F5', vent_direction='SE', etat_mer='agitée', barometre=1012,
+                                    position=f"{i % 90}°{i % 60:02d}'S / {i % 180}°{i % 60:02d}'W")
+                entry.update_timestamp()
+                entries.append(entry)
+            bulletins.append(WeatherConditionNew(
+                voyage=voyage, datetime=noon, type_bulletin='Météo-France',
+                situation_generale="Anticyclone de Kermadec centré au sud, alizé de secteur est établi sur l'archipel.",
+                prev_jour_vent='SE 4 à 5', prev_jour_mer='agitée', prev_jour_houle='S 2 m', prev_jour_temps='grains',
+                prev_jour_visibilite='bonne', prev_nuit_vent='SE 4', tend_vent='faiblissant', marees='PM 06:12, BM 12:25',
+            ))
+            if day % 5 == 0:
+                incidents.append(IncidentNew(voyage=voyage, datetime=noon, type_incident='materiel',
+                                             description="Ragage de l'écoute de génois sur le balcon avant",
+                                             actions_prises="Écoute retournée, fourreau posé"))
+        LogEntryNew.objects.bulk_create(entries, batch_size=1000)
+        WeatherConditionNew.objects.bulk_create(bulletins)
+        IncidentNew.objects.bulk_create(incidents)
+        CrewMemberNew.objects.bulk_create([
+            CrewMemberNew(voyage=voyage, nom=f"Équipier {i}", prenom='Benchmark', role='skipper' if i == 0 else 'equipier')
+            for i in range(4)
+        ])
+        # bulk_create ne déclenche pas les signaux
+        VoyageStats.rebuild(voyage.pk)
+        return voyage
+
+    def _render(self, voyage, reuse_background):
+        """(pages, secondes, taille en octets)"""
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                started = time.perf_counter()
+                pages = day_pages.voyage_day_pages(voyage.pk, output, reuse_background=reuse_background)
+                elapsed = time.perf_counter() - started
+            return pages, elapsed, os.path.getsize(path)
+        finally:
+            os.unlink(path)
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark des calculs géodésiques sur une trace synthétique.
+
+Compare, par point, l'ancien calcul inline (float(Decimal) + closure + Decimal(str()))
+avec l'API scalaire et l'API vectorisée de `nautical.geo`.
+
+Usage : python manage.py bench_geo --points 100000
+"""
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.management.base import BaseCommand
+
+from nautical import geo
+
+
+def _legacy_segment_nm(prev_lat, prev_lng, lat, lng):
+    # Copie du calcul historique de VoyageEvent.save / recalculate_from_events
+    def to_rad(x):
+        return math.radians(float(x))
+    rlat1 = to_rad(prev_lat)
+    rlon1 = to_rad(prev_lng)
+    rlat2 = to_rad(lat)
+    rlon2 = to_rad(lng)
+    dlat = rlat2 - rlat1
+    dlon = rlon2 - rlon1
+    a = math.sin(dlat/2)**2 + math.cos(rlat1) * math.cos(rlat2) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    nm = 6371000.0 * c / 1852.0
+    return Decimal(str(nm)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût par point des calculs de distance sur une trace synthétique"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=100000, help='Nombre de points de la trace (défaut : 100000)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        n = options['points']
+        rng = random.Random(options['seed'])
+
+        # Trace synthétique : marche aléatoire au départ de Papeete, un point toutes les 10 s
+        lat, lng = -17.535, -149.569
+        start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        lats, lngs, stamps = [], [], []
+        for i in range(n):
+            lat += rng.uniform(-0.0005, 0.0005)
+            lng += rng.uniform(-0.0005, 0.0005)
+            lats.append(Decimal(f"{lat:.6f}"))
+            lngs.append(Decimal(f"{lng:.6f}"))
+            stamps.append(start + timedelta(seconds=10 * i))
+
+        self.stdout.write(f"Trace synthétique : {n} points\n")
+
+        t0 = time.perf_counter()
+        legacy_total = Decimal('0')
+        for i in range(1, n):
+            legacy_total += _legacy_segment_nm(lats[i-1], lngs[i-1], lats[i], lngs[i])
+        legacy = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        scalar_total = 0.0
+        for i in range(1, n):
+            scalar_total += geo.haversine_nm(lats[i-1], lngs[i-1], lats[i], lngs[i])
+        scalar = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        segments = geo.track_segments(lats, lngs, stamps)
+        batched = time.perf_counter() - t0
+        batched_total = float(segments.cumulative_nm[-1])
+
+        # Coût du calcul seul, une fois les colonnes déjà converties en float64
+        lat_arr = geo.as_float_array(lats)
+        lng_arr = geo.as_float_array(lngs)
+        t0 = time.perf_counter()
+        geo.cumulative_distances_nm(lat_arr, lng_arr)
+        kernel = time.perf_counter() - t0
+
+        for label, elapsed, total in (
+            ('inline historique', legacy, float(legacy_total)),
+            ('geo scalaire', scalar, scalar_total),
+            ('geo vectorisé (conversion incluse)', batched, batched_total),
+            ('geo vectorisé (float64 seul)', kernel, batched_total),
+        ):
+            per_point_us = elapsed / max(n - 1, 1) * 1e6
+            self.stdout.write(f"{label:<38} {elapsed * 1000:9.1f} ms  {per_point_us:8.3f} µs/point  total {total:.2f} NM")
+
+        self.stdout.write(self.style.SUCCESS(f"Gain vectorisé vs historique : x{legacy / batched:.0f}"))
@@ -0,0 +1,130 @@
+"""
+Benchmark du temps jusqu'au premier octet (TTFB) des exports PDF :
+chronologie, inventaire des consommables, livre de bord d'un voyage.
+
+« À froid » vide les caches de nautical.pdf avant chaque requête (logo
+relu par svg2rlg, feuille de styles et styles de tableaux reconstruits :
+le travail que refaisait chaque export avant le moteur commun) ; « à
+chaud » les réutilise, comme un processus serveur après sa première requête.
+
+Le livre de bord d'un voyage est construit par le worker (nautical.exports) :
+la première requête (202) est suivie d'une passe du worker, puis les mesures
+portent sur le fichier servi depuis le disque.
+
+Les données synthétiques sont créées dans une transaction annulée à la fin :
+la base n'est pas modifiée.
+
+Usage :
+    python manage.py bench_pdf_exports [--rows 300] [--repeat 5] [--logo chemin/logo.svg]
+"""
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from nautical import exports, pdf
+from nautical.models import Chronology, Consumable
+from nautical.models_new import LogEntryNew, VoyageLogNew, VoyageStats
+
+
+class _Rollback(Exception):
+    pass
+
+
+def ttfb(client, url):
+    """Secondes jusqu'au premier octet du corps de la réponse."""
+    started = time.perf_counter()
+    response = client.get(url)
+    if response.status_code != 200:
+        raise CommandError(f"{url} : HTTP {response.status_code}")
+    if response.streaming:
+        next(iter(response.streaming_content))
+    else:
+        response.content
+    return time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = "Mesure le TTFB des exports PDF, caches du moteur PDF froids puis chauds"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=300, help='Lignes par export (chronologie, consommables, entrées)')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--logo', help=f"Logo SVG à utiliser (défaut : {pdf.LOGO_PATH})")
+
+    def handle(self, *args, **options):
+        if options['logo']:
+            pdf.LOGO_PATH = Path(options['logo'])
+        if not pdf.LOGO_PATH.exists():
+            self.stdout.write(self.style.WARNING(f"Pas de logo ({pdf.LOGO_PATH}) : l'export des consommables s'en passe"))
+        if 'testserver' not in settings.ALLOWED_HOSTS and '*' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        try:
+            with transaction.atomic():
+                voyage = self._populate(options['rows'])
+                try:
+                    self._measure(voyage, options['repeat'])
+                finally:
+                    exports.delete_artifacts(voyage.pk)
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Données synthétiques supprimées (transaction annulée)"))
+
+    def _populate(self, rows):
+        Chronology.objects.bulk_create([
+            Chronology(date=date(2030, 1, 1) + timedelta(days=i), description=f"Benchmark {i} " * 4,
+                       action_realisee="Contrôle et graissage")
+            for i in range(rows)
+        ])
+        Consumable.objects.bulk_create([
+            Consumable(name=f"Benchmark {i}", reference=f"REF-{i}", quantity=i % 7, remark="Coffre avant")
+            for i in range(rows)
+        ])
+        voyage = VoyageLogNew.objects.create(port_depart='Papeete', port_arrivee='Moorea', sujet_voyage='Benchmark PDF')
+        start = datetime(2030, 1, 1)
+        entries = []
+        for i in range(rows):
+            at = start + timedelta(minutes=30 * i)
+            entry = LogEntryNew(voyage=voyage, date=at.date(), heure=at.time(), evenements=f"Benchmark {i}",
+                                allure='largue', vent_force='F4', position="17°32'S / 149°34'W")
+            entry.update_timestamp()
+            entries.append(entry)
+        LogEntryNew.objects.bulk_create(entries)
+        # bulk_create ne déclenche pas les signaux
+        VoyageStats.rebuild(voyage.pk)
+        self.stdout.write(f"{rows} lignes par export créées")
+        return voyage
+
+    def _time(self, client, url, repeat, cold):
+        durations = []
+        for i in range(repeat):
+            if cold:
+                pdf.clear_caches()
+            # paramètre unique : jamais servi par le cache de pages versionné
+            separator = '&' if '?' in url else '?'
+            durations.append(ttfb(client, f"{url}{separator}bench={time.perf_counter_ns()}"))
+        return statistics.median(durations) * 1000
+
+    def _measure(self, voyage, repeat):
+        client = Client()
+        urls = [
+            ('Chronologie', reverse('chronology_list') + '?export=pdf'),
+            ('Consommables', reverse('consumable_export_pdf')),
+            ('Livre de bord', reverse('export_voyage_pdf', args=[voyage.pk])),
+        ]
+        self.stdout.write(f"\nTTFB médian sur {repeat} exécutions :")
+        self.stdout.write(f"  {'export':<15} {'à froid':>10} {'à chaud':>10}")
+        for label, url in urls:
+            if client.get(url).status_code == 202:
+                exports.run_pending()
+            ttfb(client, url)  # chargement des modules, connexion
+            cold_ms = self._time(client, url, repeat, cold=True)
+            warm_ms = self._time(client, url, repeat, cold=False)
+            self.stdout.write(f"  {label:<15} {cold_ms:8.1f} ms {warm_ms:8.1f} ms")
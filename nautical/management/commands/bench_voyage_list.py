@@ -0,0 +1,139 @@
+"""
+Benchmark de la liste des livres de bord : compteurs par COUNT() joints
+(ancienne requête) contre compteurs dénormalisés de VoyageStats.
+
+Les données synthétiques (par défaut 100 voyages x 2000 entrées) sont créées
+dans une transaction annulée à la fin : la base n'est pas modifiée.
+
+Usage : python manage.py bench_voyage_list [--voyages 100] [--entries 2000] [--repeat 5]
+"""
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from nautical.models_new import (
+    CrewMemberNew, IncidentNew, LogEntryNew, VoyageLogNew, VoyageStats, WeatherConditionNew,
+)
+from nautical.views_new import VoyageLogListView
+
+PAGE_SIZE = VoyageLogListView.paginate_by
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _before(voyage_ids):
+    # Copie de l'ancienne requête : quatre Count() sur quatre jointures
+    # (entrées x équipage x météo x incidents par voyage), plus un COUNT() de
+    # photos par voyage affiché
+    voyages = list(
+        VoyageLogNew.objects.filter(pk__in=voyage_ids).annotate(
+            total_entries=Count('entries'),
+            crew_count=Count('equipage'),
+            weather_count=Count('conditions_meteo'),
+            incidents_count=Count('incidents'),
+        )[:PAGE_SIZE]
+    )
+    for voyage in voyages:
+        voyage.photos.filter(type_photo='gallery').count()
+    return voyages
+
+
+def _after(voyage_ids):
+    voyages = list(VoyageLogNew.objects.filter(pk__in=voyage_ids).select_related('stats')[:PAGE_SIZE])
+    for voyage in voyages:
+        stats = voyage.statistics
+        (stats.entries_count, stats.crew_count, stats.weather_count, stats.incidents_count, voyage.photos_count)
+    return voyages
+
+
+class Command(BaseCommand):
+    help = "Mesure la liste des livres de bord avant/après les compteurs dénormalisés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voyages', type=int, default=100)
+        parser.add_argument('--entries', type=int, default=2000, help='Entrées de log par voyage')
+        parser.add_argument('--crew', type=int, default=4, help='Équipiers par voyage')
+        parser.add_argument('--weather', type=int, default=5, help='Bulletins météo par voyage')
+        parser.add_argument('--incidents', type=int, default=2, help='Incidents par voyage')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                voyage_ids = self._populate(options)
+                self._measure(voyage_ids, options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Données synthétiques supprimées (transaction annulée)"))
+
+    def _populate(self, options):
+        started = time.perf_counter()
+        voyages = VoyageLogNew.objects.bulk_create([
+            VoyageLogNew(
+                date_debut=date(2030, 1, 1) + timedelta(days=i), port_depart='Papeete', port_arrivee='Moorea',
+                skipper='Terry DYER', sujet_voyage=f"Benchmark {i}", bateau='MANTA', statut='termine',
+            )
+            for i in range(options['voyages'])
+        ])
+        for voyage in voyages:
+            start = datetime(2030, 1, 1)
+            entries = []
+            for j in range(options['entries']):
+                at = start + timedelta(minutes=10 * j)
+                entry = LogEntryNew(voyage=voyage, date=at.date(), heure=at.time(), evenements='Benchmark')
+                entry.update_timestamp()
+                entries.append(entry)
+            LogEntryNew.objects.bulk_create(entries, batch_size=2000)
+            CrewMemberNew.objects.bulk_create([
+                CrewMemberNew(voyage=voyage, nom=f"Equipier {k}", prenom='Bench') for k in range(options['crew'])
+            ])
+            WeatherConditionNew.objects.bulk_create([
+                WeatherConditionNew(voyage=voyage, datetime=voyage.created_at) for _ in range(options['weather'])
+            ])
+            IncidentNew.objects.bulk_create([
+                IncidentNew(voyage=voyage, datetime=voyage.created_at, description='Benchmark')
+                for _ in range(options['incidents'])
+            ])
+            # bulk_create ne déclenche pas les signaux : statistiques calculées ici
+            VoyageStats.rebuild(voyage.pk)
+        self.stdout.write(
+            f"{len(voyages)} voyages x {options['entries']} entrées créés en {time.perf_counter() - started:.1f} s"
+        )
+        return [voyage.pk for voyage in voyages]
+
+    def _time(self, function, repeat):
+        durations = []
+        for _ in range(repeat):
+            # journal des requêtes borné (DEBUG) : le vider pour compter juste
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                function()
+                durations.append(time.perf_counter() - started)
+        return statistics.median(durations) * 1000, len(queries.captured_queries)
+
+    def _measure(self, voyage_ids, repeat):
+        before_ms, before_queries = self._time(lambda: _before(voyage_ids), repeat)
+        after_ms, after_queries = self._time(lambda: _after(voyage_ids), repeat)
+        # Paramètre unique par exécution : mesure hors cache_page
+        factory = RequestFactory()
+        view = VoyageLogListView.as_view()
+        page_ms, page_queries = self._time(
+            lambda: view(factory.get('/livres-de-bord/', {'bench': time.perf_counter_ns()})).render(), repeat
+        )
+
+        self.stdout.write(f"\nPremière page de la liste ({PAGE_SIZE} voyages), médiane sur {repeat} exécutions :")
+        self.stdout.write(f"  avant  (Count() joints + COUNT photos) : {before_ms:9.1f} ms  {before_queries:3d} requêtes")
+        self.stdout.write(f"  après  (compteurs VoyageStats)         : {after_ms:9.1f} ms  {after_queries:3d} requêtes")
+        self.stdout.write(f"  rendu complet de la vue, hors cache    : {page_ms:9.1f} ms  {page_queries:3d} requêtes")
+        if after_ms:
+            self.stdout.write(f"  gain : x{before_ms / after_ms:.0f}")
@@ -0,0 +1,52 @@
+"""
+Livre de bord relié d'une année : tous les voyages commencés cette année-là
+dans un seul PDF, avec table des matières et pages numérotées (voir
+nautical.books).
+
+Usage :
+    python manage.py export_logbook_book --year 2025 [--output livre.pdf] [--workers 4]
+
+Les voyages sont mis en page en parallèle (un processus par cœur par
+défaut).
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nautical import books
+from nautical.models_new import VoyageLogNew
+
+
+class Command(BaseCommand):
+    help = "Exporte le livre de bord relié (PDF) de tous les voyages d'une année"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, required=True)
+        parser.add_argument('--output', help="Fichier PDF (défaut : Livre_de_bord_<année>.pdf)")
+        parser.add_argument('--workers', type=int, help="Processus de mise en page (défaut : nombre de cœurs)")
+
+    def handle(self, *args, **options):
+        year = options['year']
+        voyages = VoyageLogNew.objects.filter(date_debut__year=year)
+        count = voyages.count()
+        if not count:
+            raise CommandError(f"Aucun voyage en {year}")
+        output = Path(options['output'] or f"Livre_de_bord_{year}.pdf").resolve()
+
+        started = time.perf_counter()
+        # écrit à côté puis renommé : jamais de livre à moitié écrit
+        fd, tmp = tempfile.mkstemp(dir=output.parent, prefix=f".{output.stem}-", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as pdf_file:
+                pages = books.build_book(voyages, pdf_file, f"Livre de bord {year}", workers=options['workers'])
+            os.replace(tmp, output)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{output} : {count} voyages, {pages} pages en {elapsed:.1f} s ({pages / elapsed:.1f} pages/s)"
+        ))
@@ -0,0 +1,101 @@
+"""
+Import d'une trace GPX ou NMEA 0183 dans un voyage.
+
+Usage :
+    python manage.py import_track <voyage_id> <fichier> [--system legacy|new] [--every 60]
+
+- legacy : crée des VoyageEvent sur un LogbookEntry (totaux mis à jour par lot)
+- new    : crée des LogEntryNew sur un VoyageLogNew
+"""
+import os
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from nautical import geo, signals, tracks
+from nautical.models import LogbookEntry, VoyageEvent
+from nautical.models_new import VoyageLogNew, LogEntryNew
+
+
+class Command(BaseCommand):
+    help = "Importe une trace GPX/NMEA (lecture en flux, écriture par lots)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('voyage', type=int, help="Identifiant du voyage (LogbookEntry ou VoyageLogNew selon --system)")
+        parser.add_argument('file', help='Fichier .gpx ou journal NMEA 0183')
+        parser.add_argument('--system', choices=['legacy', 'new'], default='legacy',
+                            help="legacy : VoyageEvent (défaut) ; new : LogEntryNew")
+        parser.add_argument('--format', choices=['gpx', 'nmea'], help='Format du fichier (détecté par défaut)')
+        parser.add_argument('--every', type=float, default=0,
+                            help='Décimation : au plus un point toutes les N secondes')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Taille des lots bulk_create')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not os.path.exists(path):
+            raise CommandError(f"Fichier introuvable : {path}")
+        fmt = options['format'] or tracks.detect_format(path)
+
+        if options['system'] == 'legacy':
+            voyage = LogbookEntry.objects.filter(pk=options['voyage']).first()
+            write_chunk = self._write_events
+        else:
+            voyage = VoyageLogNew.objects.filter(pk=options['voyage']).first()
+            write_chunk = self._write_log_entries
+        if voyage is None:
+            raise CommandError(f"Voyage {options['voyage']} introuvable")
+
+        size = os.path.getsize(path) or 1
+        imported = 0
+        started = time.monotonic()
+        with open(path, 'rb') as f:
+            points = tracks.decimate(tracks.iter_track(f, fmt), options['every'])
+            for chunk in tracks.chunked(points, options['batch_size']):
+                write_chunk(voyage, chunk)
+                imported += len(chunk)
+                self.stdout.write(
+                    f"{imported} points importés — {min(f.tell() / size, 1):.0%} du fichier "
+                    f"({time.monotonic() - started:.1f} s)"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"{imported} points importés dans « {voyage} »"))
+
+    def _write_events(self, voyage, chunk):
+        # bulk_add est atomique et met à jour les totaux du voyage une fois par lot
+        VoyageEvent.bulk_add(voyage, [
+            {
+                'timestamp': point.timestamp,
+                'latitude': Decimal(f"{point.latitude:.6f}"),
+                'longitude': Decimal(f"{point.longitude:.6f}"),
+                'description': 'Point de trace importé',
+            }
+            for point in chunk
+        ])
+
+    def _write_log_entries(self, voyage, chunk):
+        entries = []
+        for point in chunk:
+            local = timezone.localtime(point.timestamp)
+            entry = LogEntryNew(
+                voyage=voyage,
+                date=local.date(),
+                heure=local.time().replace(microsecond=0),
+                evenements='Point de trace importé',
+                position=geo.format_position(point.latitude, point.longitude),
+                origine_position='gps',
+                latitude=Decimal(f"{point.latitude:.7f}"),
+                longitude=Decimal(f"{point.longitude:.7f}"),
+                cap_compas=int(round(point.cog_deg)) % 360 if point.cog_deg is not None else None,
+            )
+            # bulk_create n'appelle pas save()
+            entry.update_geohash()
+            entry.update_timestamp()
+            entries.append(entry)
+        timestamps = [entry.timestamp for entry in entries]
+        with transaction.atomic():
+            LogEntryNew.objects.bulk_create(entries)
+            # bulk_create ne déclenche pas les signaux post_save
+            signals.after_bulk_entries(voyage.pk, [entry.pk for entry in entries], (min(timestamps), max(timestamps)))
@@ -0,0 +1,173 @@
+"""
+Écoute le flux NMEA 0183 du multiplexeur de bord et tient le livre de bord
+automatiquement (voyage « en cours »).
+
+Usage :
+    python manage.py nmea_listener [--udp 0.0.0.0:10110] [--tcp 192.168.1.1:10110]
+                                   [--interval 60] [--min-interval 5] [--flush 300]
+                                   [--voyage <id>] [--duration <s>]
+
+- Réception asynchrone (asyncio) en UDP et/ou TCP (reconnexion automatique).
+- Les phrases RMC/GGA/MWV/DPT/XDR/VHW/VLW mettent à jour l'état des
+  instruments en mémoire (nautical.instruments).
+- Une entrée LogEntryNew est produite toutes les --interval minutes (heure
+  GPS), ou sur changement significatif (cap, vent, baromètre).
+- Les entrées sont écrites par lots : toutes les --flush secondes, dès
+  --batch-size entrées en attente, et à l'arrêt.
+
+Pour tester sans instruments : `manage.py replay_nmea <fichier.nmea>`.
+"""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+
+from nautical import instruments
+from nautical.models_new import VoyageLogNew
+
+NMEA_PORT = 10110
+
+
+def _address(value, default_host):
+    host, sep, port = value.rpartition(':')
+    try:
+        return (host if sep else default_host) or default_host, int(port)
+    except ValueError:
+        raise CommandError(f"Adresse invalide : {value!r} (attendu hôte:port ou port)")
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, feed):
+        self.feed = feed
+
+    def datagram_received(self, data, addr):
+        for line in data.decode('ascii', 'ignore').splitlines():
+            self.feed(line)
+
+
+class Command(BaseCommand):
+    help = "Écoute les instruments (NMEA 0183 UDP/TCP) et écrit des entrées de log automatiques"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--udp', help=f"Écoute UDP [hôte:]port (défaut : 0.0.0.0:{NMEA_PORT} sans --tcp)")
+        parser.add_argument('--tcp', help='Connexion TCP au multiplexeur hôte:port')
+        parser.add_argument('--voyage', type=int, help='Voyage cible (défaut : le voyage « en cours » le plus récent)')
+        parser.add_argument('--interval', type=float, default=60, help='Minutes entre deux entrées régulières')
+        parser.add_argument('--min-interval', type=float, default=5,
+                            help='Minutes minimum entre deux entrées (changements significatifs)')
+        parser.add_argument('--heading-change', type=float, default=30, help='Changement de cap significatif (°)')
+        parser.add_argument('--wind-change', type=int, default=2, help='Changement de vent significatif (Beaufort)')
+        parser.add_argument('--pressure-change', type=float, default=2, help='Variation barométrique significative (hPa)')
+        parser.add_argument('--flush', type=float, default=300, help='Secondes max avant écriture des entrées en attente')
+        parser.add_argument('--batch-size', type=int, default=20, help='Écriture dès N entrées en attente')
+        parser.add_argument('--duration', type=float, help="Arrêt après N secondes (tests)")
+
+    def handle(self, *args, **options):
+        if options['voyage'] is not None and not VoyageLogNew.objects.filter(pk=options['voyage']).exists():
+            raise CommandError(f"Voyage {options['voyage']} introuvable")
+        self.state = instruments.InstrumentState()
+        self.logger = instruments.AutoLogger(
+            interval=options['interval'] * 60,
+            min_interval=options['min_interval'] * 60,
+            heading_change=options['heading_change'],
+            wind_change=options['wind_change'],
+            pressure_change=options['pressure_change'],
+        )
+        self.pending = []
+        self.written = 0
+        self.options = options
+        try:
+            asyncio.run(self._run())
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.state.sentences} phrases reçues, {self.written} entrées écrites"
+        ))
+
+    def _feed(self, line):
+        if self.state.feed(line):
+            reading = self.logger.check(self.state)
+            if reading is not None:
+                self.pending.append(reading)
+                if len(self.pending) >= self.options['batch_size']:
+                    self._wake.set()
+
+    async def _run(self):
+        options = self.options
+        self._wake = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        tasks = []
+        transport = None
+        if options['udp'] or not options['tcp']:
+            host, port = _address(options['udp'] or str(NMEA_PORT), '0.0.0.0')
+            transport, _ = await loop.create_datagram_endpoint(lambda: _UDPProtocol(self._feed), local_addr=(host, port))
+            self.stdout.write(f"Écoute UDP sur {host}:{port}")
+        if options['tcp']:
+            tasks.append(asyncio.create_task(self._tcp_client(*_address(options['tcp'], '127.0.0.1'))))
+        writer = asyncio.create_task(self._writer())
+        try:
+            if options['duration']:
+                await asyncio.sleep(options['duration'])
+            else:
+                await asyncio.Event().wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if transport is not None:
+                transport.close()
+            writer.cancel()
+            await asyncio.gather(*tasks, writer, return_exceptions=True)
+            await self._flush()
+
+    async def _tcp_client(self, host, port):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError as exc:
+                self.stderr.write(f"TCP {host}:{port} indisponible ({exc}), nouvel essai dans 5 s")
+                await asyncio.sleep(5)
+                continue
+            self.stdout.write(f"Connecté au multiplexeur TCP {host}:{port}")
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    self._feed(line.decode('ascii', 'ignore'))
+            except OSError:
+                pass
+            finally:
+                writer.close()
+            self.stderr.write(f"Connexion TCP {host}:{port} perdue, reconnexion")
+            await asyncio.sleep(1)
+
+    async def _writer(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.options['flush'])
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._flush()
+
+    async def _flush(self):
+        if not self.pending:
+            return
+        readings, self.pending = self.pending, []
+        started = time.monotonic()
+        voyage_id = self.options['voyage'] or await sync_to_async(instruments.current_voyage_id)()
+        if voyage_id is None:
+            self.stderr.write(f"Aucun voyage en cours : {len(readings)} entrées ignorées")
+            return
+        try:
+            await sync_to_async(instruments.write_readings)(voyage_id, readings)
+        except Exception as exc:
+            # on garde les entrées pour le lot suivant plutôt que de les perdre
+            self.pending[:0] = readings
+            self.stderr.write(f"Écriture impossible ({exc}), nouvel essai au prochain lot")
+            return
+        self.written += len(readings)
+        self.stdout.write(
+            f"{len(readings)} entrées écrites dans le voyage {voyage_id} ({time.monotonic() - started:.2f} s)"
+        )
@@ -0,0 +1,38 @@
+"""
+Recalcule entièrement les agrégats du tableau de bord (voir nautical.rollups).
+
+Usage :
+    python manage.py rebuild_rollups [voyage_id ...]
+
+Sans argument, tous les voyages sont recalculés et les agrégats des voyages
+supprimés disparaissent. À lancer après la migration qui crée les tables,
+après une écriture en masse qui contourne les signaux, ou pour corriger une
+dérive.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from nautical import rollups
+from nautical.models_new import IncidentRollup, MonthRollup, VoyageDayRollup, VoyageLogNew
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats du tableau de bord (jours, mois, incidents)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('voyages', nargs='*', type=int, help='Identifiants des voyages (défaut : tous)')
+
+    def handle(self, *args, **options):
+        voyage_ids = options['voyages']
+        if not voyage_ids:
+            voyage_ids = list(VoyageLogNew.objects.order_by('pk').values_list('pk', flat=True))
+            with transaction.atomic():
+                VoyageDayRollup.objects.exclude(voyage_id__in=voyage_ids).delete()
+                IncidentRollup.objects.exclude(voyage_id__in=voyage_ids).delete()
+                MonthRollup.objects.all().delete()
+        for i, voyage_id in enumerate(voyage_ids, 1):
+            days = rollups.rebuild_voyage(voyage_id)
+            self.stdout.write(f"[{i}/{len(voyage_ids)}] voyage {voyage_id} : {len(days)} jours")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(voyage_ids)} voyages recalculés, {MonthRollup.objects.count()} mois"
+        ))
@@ -0,0 +1,31 @@
+"""
+Recalcule entièrement les statistiques matérialisées (VoyageStats) des livres de bord.
+
+Usage :
+    python manage.py rebuild_voyage_stats [voyage_id ...]
+
+Sans argument, tous les voyages sont recalculés. À lancer après une
+écriture en masse qui contourne les signaux, ou pour corriger une dérive.
+"""
+from django.core.management.base import BaseCommand
+
+from nautical import caching
+from nautical.models_new import VoyageLogNew, VoyageStats
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques des livres de bord (VoyageStats)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('voyages', nargs='*', type=int, help='Identifiants des voyages (défaut : tous)')
+
+    def handle(self, *args, **options):
+        voyage_ids = options['voyages'] or list(VoyageLogNew.objects.order_by('pk').values_list('pk', flat=True))
+        for i, voyage_id in enumerate(voyage_ids, 1):
+            stats = VoyageStats.rebuild(voyage_id)
+            caching.bump_voyage(voyage_id)
+            self.stdout.write(
+                f"[{i}/{len(voyage_ids)}] voyage {voyage_id} : {stats.entries_count} entrées, "
+                f"{stats.distance_gps_nm} NM"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(voyage_ids)} voyages recalculés"))
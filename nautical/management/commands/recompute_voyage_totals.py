@@ -0,0 +1,170 @@
+"""
+Recalcule les totaux des voyages (distance, durée, vitesse moyenne) à partir
+de leurs VoyageEvent, par lots, avec reprise et calcul parallèle.
+
+Usage :
+    python manage.py recompute_voyage_totals --all
+    python manage.py recompute_voyage_totals 12 15 18
+    python manage.py recompute_voyage_totals --since 2023-01-01 --until 2023-12-31 --workers 4
+    python manage.py recompute_voyage_totals --all --dry-run
+
+- Les voyages sont traités par lots de --chunk-size, dans l'ordre des clés.
+- Avec --workers N, les lots sont lus et calculés par N processus ; seul le
+  processus principal écrit (bulk_update, une transaction par lot).
+- Après chaque lot écrit, le dernier identifiant traité est enregistré dans
+  le fichier --checkpoint : une exécution interrompue reprend là où elle
+  s'était arrêtée (--restart pour l'ignorer). Le fichier est supprimé à la fin.
+- --dry-run n'écrit rien et liste les écarts entre valeurs stockées et recalculées.
+- Les voyages sans événement ne sont pas modifiés : leur distance peut venir
+  des positions de départ/arrivée (LogbookEntry.save()).
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils.dateparse import parse_date
+
+from nautical.models import LogbookEntry, VoyageEvent, TOTAL_FIELDS, compute_voyage_totals
+
+DEFAULT_CHECKPOINT = '.recompute_voyage_totals.json'
+
+
+def _init_worker():
+    # Les connexions héritées du processus parent ne doivent pas être partagées
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def compute_chunk(voyage_ids):
+    """Totaux recalculés d'un lot de voyages : {voyage_id: {champ: valeur}},
+    pour les voyages qui ont des événements.
+
+    Lecture seule (exécuté dans un processus de calcul) : une requête pour
+    tous les événements du lot, dans l'ordre de l'index (voyage, timestamp).
+    """
+    rows = (
+        VoyageEvent.objects.filter(voyage_id__in=voyage_ids)
+        .order_by('voyage_id', 'timestamp', 'id')
+        .values_list('voyage_id', 'latitude', 'longitude', 'distance_from_prev_nm', 'timestamp')
+    )
+    totals = {}
+    for voyage_id, events in groupby(rows.iterator(chunk_size=5000), key=lambda row: row[0]):
+        totals[voyage_id] = compute_voyage_totals([row[1:] for row in events])
+    return totals
+
+
+class Command(BaseCommand):
+    help = "Recalcule les totaux des voyages depuis leurs événements (par lots, reprise, parallèle)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('voyages', nargs='*', type=int, help='Identifiants des voyages')
+        parser.add_argument('--all', action='store_true', help='Tous les voyages')
+        parser.add_argument('--since', help='Voyages partis à partir de cette date (AAAA-MM-JJ)')
+        parser.add_argument('--until', help="Voyages partis jusqu'à cette date incluse (AAAA-MM-JJ)")
+        parser.add_argument('--chunk-size', type=int, default=200, help='Voyages par lot')
+        parser.add_argument('--workers', type=int, default=1, help='Processus de calcul (1 = dans le processus courant)')
+        parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='Fichier de reprise')
+        parser.add_argument('--restart', action='store_true', help='Ignore le fichier de reprise existant')
+        parser.add_argument('--dry-run', action='store_true', help="N'écrit rien, rapporte les écarts")
+
+    def handle(self, *args, **options):
+        qs = self._selection(options)
+        selection_key = json.dumps(
+            {k: options[k] for k in ('voyages', 'all', 'since', 'until')}, sort_keys=True
+        )
+        dry_run = options['dry_run']
+
+        last_pk = 0
+        checkpoint = options['checkpoint']
+        if not dry_run and not options['restart'] and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                state = json.load(f)
+            if state.get('selection') == selection_key:
+                last_pk = state['last_pk']
+                self.stdout.write(f"Reprise après le voyage #{last_pk} ({checkpoint})")
+
+        voyage_ids = list(qs.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True))
+        size = max(1, options['chunk_size'])
+        chunks = [voyage_ids[i:i + size] for i in range(0, len(voyage_ids), size)]
+        self.stdout.write(f"{len(voyage_ids)} voyages en {len(chunks)} lots")
+
+        started = time.monotonic()
+        checked = drifted = 0
+        if options['workers'] > 1 and len(chunks) > 1:
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker)
+            results = executor.map(compute_chunk, chunks)
+        else:
+            executor = None
+            results = map(compute_chunk, chunks)
+        try:
+            # Écrivain unique : les lots arrivent dans l'ordre, le point de reprise avance de façon monotone
+            for index, (chunk, totals) in enumerate(zip(chunks, results), 1):
+                changed = self._write_chunk(chunk, totals, dry_run)
+                checked += len(chunk)
+                drifted += changed
+                if not dry_run:
+                    with open(checkpoint, 'w') as f:
+                        json.dump({'selection': selection_key, 'last_pk': chunk[-1]}, f)
+                self.stdout.write(
+                    f"Lot {index}/{len(chunks)} : {len(chunk)} voyages, {changed} écarts "
+                    f"({time.monotonic() - started:.1f} s)"
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        if not dry_run and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        verb = 'à corriger' if dry_run else 'corrigés'
+        self.stdout.write(self.style.SUCCESS(
+            f"{checked} voyages vérifiés, {drifted} {verb} en {time.monotonic() - started:.1f} s"
+        ))
+
+    def _selection(self, options):
+        if not (options['voyages'] or options['all'] or options['since'] or options['until']):
+            raise CommandError("Préciser des identifiants de voyages, --since/--until ou --all")
+        qs = LogbookEntry.objects.all()
+        if options['voyages']:
+            qs = qs.filter(pk__in=options['voyages'])
+        for option, lookup in (('since', 'start_datetime__date__gte'), ('until', 'start_datetime__date__lte')):
+            if options[option]:
+                value = parse_date(options[option])
+                if value is None:
+                    raise CommandError(f"Date invalide pour --{option} : {options[option]}")
+                qs = qs.filter(**{lookup: value})
+        return qs
+
+    def _write_chunk(self, chunk, totals, dry_run):
+        """Compare et écrit un lot ; retourne le nombre de voyages en écart."""
+        stored = LogbookEntry.objects.filter(pk__in=chunk).only(
+            *TOTAL_FIELDS, 'departure_port', 'arrival_port', 'start_datetime'
+        ).in_bulk()
+        changed = []
+        for voyage_id in chunk:
+            voyage = stored.get(voyage_id)
+            if voyage is None or voyage_id not in totals:
+                continue
+            diffs = [
+                (field, getattr(voyage, field), totals[voyage_id][field])
+                for field in TOTAL_FIELDS
+                if getattr(voyage, field) != totals[voyage_id][field]
+            ]
+            if not diffs:
+                continue
+            if dry_run:
+                details = ', '.join(f"{field} {old} → {new}" for field, old, new in diffs)
+                self.stdout.write(f"  #{voyage_id} {voyage} : {details}")
+            for field, _, new in diffs:
+                setattr(voyage, field, new)
+            changed.append(voyage)
+        if changed and not dry_run:
+            # bulk_update : pas de LogbookEntry.save(), qui recalculerait la distance départ/arrivée
+            with transaction.atomic():
+                LogbookEntry.objects.bulk_update(changed, TOTAL_FIELDS)
+        return len(changed)
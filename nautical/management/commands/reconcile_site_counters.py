@@ -0,0 +1,41 @@
+"""
+Vérifie et corrige les compteurs globaux du site (SiteCounter).
+
+Usage :
+    python manage.py reconcile_site_counters [--dry-run]
+
+Les compteurs sont ajustés par les signaux ; une écriture en masse ou une
+suppression hors ORM peut les faire dériver. À planifier chaque nuit, par
+exemple avec cron :
+
+    30 3 * * * cd /chemin/du/projet && python manage.py reconcile_site_counters
+
+Chaque table est recomptée (COUNT(*)) ; seuls les compteurs faux sont
+réécrits.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from nautical import counters
+from nautical.models_new import SiteCounter
+
+
+class Command(BaseCommand):
+    help = "Recompte les tables et corrige les compteurs globaux du site"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Affiche les écarts sans les corriger')
+
+    def handle(self, *args, **options):
+        actual = counters.actual_counts()
+        stored = dict(SiteCounter.objects.values_list('name', 'value'))
+        drift = {name: value for name, value in actual.items() if stored.get(name) != value}
+        for name, value in drift.items():
+            self.stdout.write(f"  {name} : {stored.get(name, 'absent')} → {value}")
+
+        if drift and not options['dry_run']:
+            with transaction.atomic():
+                for name, value in drift.items():
+                    SiteCounter.objects.update_or_create(name=name, defaults={'value': value})
+        verb = "à corriger" if options['dry_run'] else "corrigés"
+        self.stdout.write(self.style.SUCCESS(f"{len(drift)} compteurs {verb} sur {len(actual)}"))
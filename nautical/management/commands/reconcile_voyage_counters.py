@@ -0,0 +1,74 @@
+"""
+Vérifie et corrige les compteurs dénormalisés des livres de bord (VoyageStats).
+
+Usage :
+    python manage.py reconcile_voyage_counters [--dry-run]
+
+Les compteurs (entrées, incidents, bulletins météo, équipiers, photos) sont
+tenus à jour par les signaux avec F() ; une écriture en masse ou une
+suppression hors ORM peut les faire dériver. Un COUNT() groupé par table
+donne les valeurs exactes de tous les voyages ; seuls les compteurs faux
+sont réécrits. Les voyages sans statistiques sont recalculés entièrement.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from nautical import caching
+from nautical.models_new import (
+    CrewMemberNew, IncidentNew, LogEntryNew, VoyageLogNew, VoyagePhoto, VoyageStats, WeatherConditionNew,
+)
+
+COUNTER_SOURCES = {
+    'entries_count': LogEntryNew.objects.all(),
+    'incidents_count': IncidentNew.objects.all(),
+    'weather_count': WeatherConditionNew.objects.all(),
+    'crew_count': CrewMemberNew.objects.all(),
+    'photos_count': VoyagePhoto.objects.filter(type_photo='gallery'),
+}
+
+
+def actual_counts():
+    """{champ: {voyage_id: nombre}} par un COUNT() groupé par table."""
+    return {
+        field: dict(qs.values_list('voyage_id').annotate(n=Count('id')).order_by())
+        for field, qs in COUNTER_SOURCES.items()
+    }
+
+
+class Command(BaseCommand):
+    help = "Vérifie les compteurs des livres de bord et corrige les dérives"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Affiche les écarts sans les corriger')
+
+    def handle(self, *args, **options):
+        missing = list(VoyageLogNew.objects.filter(stats__isnull=True).values_list('pk', flat=True))
+        if missing and not options['dry_run']:
+            for voyage_id in missing:
+                VoyageStats.rebuild(voyage_id)
+        self.stdout.write(f"{len(missing)} voyages sans statistiques")
+
+        actual = actual_counts()
+        fixed = []
+        for stats in VoyageStats.objects.only('voyage_id', *COUNTER_SOURCES):
+            drift = {
+                field: actual[field].get(stats.voyage_id, 0)
+                for field in COUNTER_SOURCES
+                if getattr(stats, field) != actual[field].get(stats.voyage_id, 0)
+            }
+            if not drift:
+                continue
+            details = ', '.join(f"{field} {getattr(stats, field)} → {value}" for field, value in drift.items())
+            self.stdout.write(f"  voyage {stats.voyage_id} : {details}")
+            for field, value in drift.items():
+                setattr(stats, field, value)
+            fixed.append(stats)
+
+        if fixed and not options['dry_run']:
+            with transaction.atomic():
+                VoyageStats.objects.bulk_update(fixed, list(COUNTER_SOURCES), batch_size=500)
+            for stats in fixed:
+                caching.bump_voyage(stats.voyage_id)
+        verb = "à corriger" if options['dry_run'] else "corrigés"
+        self.stdout.write(self.style.SUCCESS(f"{len(fixed)} voyages avec des compteurs {verb}"))
@@ -0,0 +1,90 @@
+"""
+Rejoue un journal NMEA 0183 enregistré vers une socket locale, comme le
+ferait le multiplexeur de bord (tests de `nmea_listener`).
+
+Usage :
+    python manage.py replay_nmea <fichier.nmea> [--udp 127.0.0.1:10110 | --tcp-serve 10110] [--speed 60]
+
+Le rythme suit l'heure des phrases RMC, accéléré d'un facteur --speed
+(0 : aussi vite que possible).
+"""
+import asyncio
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nautical import nmea
+from nautical.management.commands.nmea_listener import NMEA_PORT, _address
+
+
+def _replay_lines(path, speed):
+    """Lignes du fichier, avec le délai (secondes réelles) à attendre avant chacune."""
+    previous = None
+    with open(path, 'rb') as f:
+        for raw in f:
+            line = raw.decode('ascii', 'ignore').strip()
+            if not line:
+                continue
+            delay = 0.0
+            parsed = nmea.split_sentence(line)
+            if speed and parsed and parsed[0] == 'RMC':
+                fix = nmea.parse_rmc(parsed[1])
+                if fix:
+                    if previous is not None:
+                        delay = max(0.0, (fix['timestamp'] - previous).total_seconds() / speed)
+                    previous = fix['timestamp']
+            yield delay, line
+
+
+class Command(BaseCommand):
+    help = "Rejoue un journal NMEA vers une socket UDP ou TCP locale"
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Journal NMEA 0183')
+        parser.add_argument('--udp', help=f"Destination UDP [hôte:]port (défaut : 127.0.0.1:{NMEA_PORT})")
+        parser.add_argument('--tcp-serve', help='Sert le flux en TCP sur [hôte:]port (un client à la fois)')
+        parser.add_argument('--speed', type=float, default=60, help="Facteur d'accélération (0 : sans attente)")
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['file']):
+            raise CommandError(f"Fichier introuvable : {options['file']}")
+        started = time.monotonic()
+        if options['tcp_serve']:
+            sent = asyncio.run(self._serve_tcp(*_address(options['tcp_serve'], '127.0.0.1'), options))
+        else:
+            sent = self._send_udp(*_address(options['udp'] or str(NMEA_PORT), '127.0.0.1'), options)
+        self.stdout.write(self.style.SUCCESS(f"{sent} phrases rejouées en {time.monotonic() - started:.1f} s"))
+
+    def _send_udp(self, host, port, options):
+        sent = 0
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for delay, line in _replay_lines(options['file'], options['speed']):
+                if delay:
+                    time.sleep(delay)
+                sock.sendto(line.encode('ascii') + b'\r\n', (host, port))
+                sent += 1
+        return sent
+
+    async def _serve_tcp(self, host, port, options):
+        done = asyncio.get_running_loop().create_future()
+
+        async def client(reader, writer):
+            sent = 0
+            try:
+                for delay, line in _replay_lines(options['file'], options['speed']):
+                    if delay:
+                        await asyncio.sleep(delay)
+                    writer.write(line.encode('ascii') + b'\r\n')
+                    await writer.drain()
+                    sent += 1
+            finally:
+                writer.close()
+                if not done.done():
+                    done.set_result(sent)
+
+        server = await asyncio.start_server(client, host, port)
+        self.stdout.write(f"En attente d'un client TCP sur {host}:{port}")
+        async with server:
+            return await done
@@ -0,0 +1,44 @@
+"""
+Worker des exports PDF : construit les tâches PdfJob en attente (voir
+nautical.exports) et enregistre les fichiers sous MEDIA_ROOT.
+
+Usage :
+    python manage.py run_worker [--once] [--sleep 2] [--max-jobs N]
+
+Plusieurs workers peuvent tourner en parallèle : chaque tâche est réservée
+par une mise à jour conditionnelle de son statut.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from nautical import exports
+
+
+class Command(BaseCommand):
+    help = "Construit les exports PDF en attente (boucle, ou une passe avec --once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Traite les tâches en attente puis s'arrête")
+        parser.add_argument('--sleep', type=float, default=2, help="Secondes d'attente quand la file est vide")
+        parser.add_argument('--max-jobs', type=int, help="Arrêt après N tâches (redémarrage par le superviseur)")
+
+    def handle(self, *args, **options):
+        remaining = options['max_jobs']
+        total_done = total_failed = 0
+        try:
+            while remaining is None or remaining > 0:
+                done, failed = exports.run_pending(limit=remaining)
+                if done or failed:
+                    self.stdout.write(f"{done} export(s) construit(s), {failed} échec(s)")
+                total_done += done
+                total_failed += failed
+                if remaining is not None:
+                    remaining -= done + failed
+                if options['once']:
+                    break
+                if not (done or failed):
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Worker arrêté : {total_done} export(s), {total_failed} échec(s)"))
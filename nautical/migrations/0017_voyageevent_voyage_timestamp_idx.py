@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0016_add_voyage_photos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='voyageevent',
+            index=models.Index(fields=['voyage', 'timestamp'], name='nautical_vo_voyage__232b33_idx'),
+        ),
+    ]
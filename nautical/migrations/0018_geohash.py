@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0017_voyageevent_voyage_timestamp_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logentrynew',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AddField(
+            model_name='voyageevent',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AddIndex(
+            model_name='logentrynew',
+            index=models.Index(fields=['geohash'], name='nautical_lo_geohash_2842c9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voyageevent',
+            index=models.Index(fields=['geohash'], name='nautical_vo_geohash_a40464_idx'),
+        ),
+    ]
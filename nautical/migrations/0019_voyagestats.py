@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0018_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoyageStats',
+            fields=[
+                ('voyage', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='nautical.voyagelognew')),
+                ('distance_gps_nm', models.DecimalField(decimal_places=2, default=0, max_digits=9, verbose_name='Distance GPS (NM)')),
+                ('log_debut', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='Log au départ')),
+                ('log_fin', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name="Log à l'arrivée")),
+                ('premiere_entree', models.DateTimeField(blank=True, null=True, verbose_name='Première entrée')),
+                ('derniere_entree', models.DateTimeField(blank=True, null=True, verbose_name='Dernière entrée')),
+                ('vent_force_max', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Vent max (Beaufort)')),
+                ('barometre_min', models.DecimalField(blank=True, decimal_places=1, max_digits=6, null=True, verbose_name='Baromètre min (hPa)')),
+                ('barometre_max', models.DecimalField(blank=True, decimal_places=1, max_digits=6, null=True, verbose_name='Baromètre max (hPa)')),
+                ('entries_count', models.PositiveIntegerField(default=0, verbose_name='Entrées de log')),
+                ('incidents_count', models.PositiveIntegerField(default=0, verbose_name='Incidents')),
+                ('weather_count', models.PositiveIntegerField(default=0, verbose_name='Bulletins météo')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Statistiques de voyage',
+                'verbose_name_plural': 'Statistiques de voyage',
+            },
+        ),
+    ]
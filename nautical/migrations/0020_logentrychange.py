@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0019_voyagestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogEntryChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_id', models.BigIntegerField(verbose_name='Entrée')),
+                ('action', models.CharField(choices=[('upsert', 'Création / modification'), ('delete', 'Suppression')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('voyage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entry_changes', to='nautical.voyagelognew')),
+            ],
+            options={
+                'verbose_name': "Modification d'entrée de log",
+                'verbose_name_plural': "Modifications d'entrées de log",
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['voyage', 'id'], name='nautical_lo_voyage__3e12d8_idx'), models.Index(fields=['voyage', 'entry_id'], name='nautical_lo_voyage__350212_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+"""Seed the LogEntryChange journal with one 'upsert' row per existing LogEntryNew.
+
+Entries written before the journal existed would otherwise never appear in a
+delta sync: with this seed, `?cursor=0` on voyage_log_api_entries returns the
+complete logbook. Entries that already have a journal row are left alone, so
+the operation is idempotent.
+"""
+from django.db import migrations
+
+
+def forwards(apps, schema_editor):
+    LogEntryNew = apps.get_model('nautical', 'LogEntryNew')
+    LogEntryChange = apps.get_model('nautical', 'LogEntryChange')
+
+    journaled = set(LogEntryChange.objects.values_list('entry_id', flat=True))
+    rows = (
+        LogEntryNew.objects.order_by('voyage_id', 'date', 'heure', 'id')
+        .values_list('voyage_id', 'id')
+        .iterator(chunk_size=2000)
+    )
+    batch = []
+    for voyage_id, entry_id in rows:
+        if entry_id in journaled:
+            continue
+        batch.append(LogEntryChange(voyage_id=voyage_id, entry_id=entry_id, action='upsert'))
+        if len(batch) >= 2000:
+            LogEntryChange.objects.bulk_create(batch)
+            batch = []
+    LogEntryChange.objects.bulk_create(batch)
+
+
+def reverse(apps, schema_editor):
+    # no-op reverse: the journal rows are harmless
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0020_logentrychange'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, reverse_code=reverse),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:47
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+
+
+def backfill_timestamps(apps, schema_editor):
+    """Renseigne timestamp (date + heure, heure locale du bord) par lots de
+    clés primaires croissantes, écrits avec bulk_update."""
+    LogEntryNew = apps.get_model('nautical', 'LogEntryNew')
+    last_pk = 0
+    while True:
+        rows = list(
+            LogEntryNew.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'date', 'heure')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        for row in rows:
+            row.timestamp = timezone.make_aware(datetime.datetime.combine(row.date, row.heure))
+        LogEntryNew.objects.bulk_update(rows, ['timestamp'])
+        last_pk = rows[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0021_seed_logentrychange'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='logentrynew',
+            options={'ordering': ['timestamp', 'id'], 'verbose_name': 'Entrée de log', 'verbose_name_plural': 'Entrées de log'},
+        ),
+        migrations.RemoveIndex(
+            model_name='logentrynew',
+            name='nautical_lo_voyage__b91618_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='logentrynew',
+            name='nautical_lo_date_e17829_idx',
+        ),
+        migrations.AddField(
+            model_name='logentrynew',
+            name='timestamp',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Horodatage'),
+        ),
+        migrations.RunPython(backfill_timestamps, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='logentrynew',
+            index=models.Index(fields=['voyage', 'timestamp'], name='nautical_lo_voyage__33e55f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logentrynew',
+            index=models.Index(fields=['timestamp'], name='nautical_lo_timesta_f0b83c_idx'),
+        ),
+    ]
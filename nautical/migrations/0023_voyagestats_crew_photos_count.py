@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:50
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    """Compteurs initiaux : un COUNT() groupé par voyage pour chaque table."""
+    VoyageStats = apps.get_model('nautical', 'VoyageStats')
+    CrewMemberNew = apps.get_model('nautical', 'CrewMemberNew')
+    VoyagePhoto = apps.get_model('nautical', 'VoyagePhoto')
+    crew = dict(CrewMemberNew.objects.values_list('voyage_id').annotate(n=Count('id')).order_by())
+    photos = dict(
+        VoyagePhoto.objects.filter(type_photo='gallery').values_list('voyage_id').annotate(n=Count('id')).order_by()
+    )
+    rows = list(VoyageStats.objects.all())
+    for stats in rows:
+        stats.crew_count = crew.get(stats.voyage_id, 0)
+        stats.photos_count = photos.get(stats.voyage_id, 0)
+    VoyageStats.objects.bulk_update(rows, ['crew_count', 'photos_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0022_logentrynew_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voyagestats',
+            name='crew_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Équipiers'),
+        ),
+        migrations.AddField(
+            model_name='voyagestats',
+            name='photos_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Photos de galerie'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
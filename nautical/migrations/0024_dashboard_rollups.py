@@ -0,0 +1,71 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0023_voyagestats_crew_photos_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Mois')),
+                ('voyages_count', models.PositiveIntegerField(default=0, verbose_name='Voyages')),
+                ('days_at_sea', models.PositiveIntegerField(default=0, verbose_name='Jours de mer')),
+                ('entries_count', models.PositiveIntegerField(default=0, verbose_name='Entrées de log')),
+                ('distance_nm', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Distance GPS (NM)')),
+                ('motor_minutes', models.PositiveIntegerField(default=0, verbose_name='Minutes au moteur')),
+                ('sail_minutes', models.PositiveIntegerField(default=0, verbose_name='Minutes à la voile')),
+                ('vent_force_max', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Vent max (Beaufort)')),
+            ],
+            options={
+                'verbose_name': 'Agrégat mensuel',
+                'verbose_name_plural': 'Agrégats mensuels',
+                'ordering': ['month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VoyageDayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('entries_count', models.PositiveIntegerField(default=0, verbose_name='Entrées de log')),
+                ('distance_nm', models.DecimalField(decimal_places=2, default=0, max_digits=9, verbose_name='Distance GPS (NM)')),
+                ('motor_minutes', models.PositiveIntegerField(default=0, verbose_name='Minutes au moteur')),
+                ('sail_minutes', models.PositiveIntegerField(default=0, verbose_name='Minutes à la voile')),
+                ('vent_force_max', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Vent max (Beaufort)')),
+                ('voyage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_rollups', to='nautical.voyagelognew')),
+            ],
+            options={
+                'verbose_name': 'Agrégat journalier',
+                'verbose_name_plural': 'Agrégats journaliers',
+                'ordering': ['voyage', 'day'],
+                'indexes': [models.Index(fields=['day'], name='nautical_vo_day_b1c96b_idx')],
+                'unique_together': {('voyage', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='IncidentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mois')),
+                ('type_incident', models.CharField(choices=[('personne', 'Incident de personne'), ('materiel', 'Incident matériel'), ('navigation', 'Incident de navigation'), ('meteo', 'Incident météorologique')], max_length=20, verbose_name="Type d'incident")),
+                ('gravite', models.CharField(choices=[('mineur', 'Mineur'), ('moyen', 'Moyen'), ('grave', 'Grave'), ('critique', 'Critique')], max_length=20, verbose_name='Gravité')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Incidents')),
+                ('voyage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incident_rollups', to='nautical.voyagelognew')),
+            ],
+            options={
+                'verbose_name': "Agrégat d'incidents",
+                'verbose_name_plural': "Agrégats d'incidents",
+                'ordering': ['month', 'type_incident', 'gravite'],
+                'indexes': [models.Index(fields=['month'], name='nautical_in_month_e4e321_idx')],
+                'unique_together': {('voyage', 'month', 'type_incident', 'gravite')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:02
+
+from django.db import migrations, models
+
+COUNTED_MODELS = {
+    'logbook_entries': 'LogbookEntry',
+    'crew_members': 'CrewMember',
+    'maintenance_records': 'MaintenanceRecord',
+    'voyages': 'VoyageLogNew',
+    'log_entries': 'LogEntryNew',
+    'incidents': 'IncidentNew',
+}
+
+
+def seed_counters(apps, schema_editor):
+    """Valeurs initiales : un COUNT(*) par table."""
+    SiteCounter = apps.get_model('nautical', 'SiteCounter')
+    SiteCounter.objects.bulk_create([
+        SiteCounter(name=name, value=apps.get_model('nautical', model).objects.count())
+        for name, model in COUNTED_MODELS.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0024_dashboard_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Compteur')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Valeur')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Compteur global',
+                'verbose_name_plural': 'Compteurs globaux',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
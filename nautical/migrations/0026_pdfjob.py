@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0025_sitecounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voyagestats',
+            name='content_version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Version du contenu'),
+        ),
+        migrations.CreateModel(
+            name='PdfJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=30, verbose_name="Type d'export")),
+                ('version', models.PositiveBigIntegerField(verbose_name='Version du contenu')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=10, verbose_name='Statut')),
+                ('file', models.CharField(blank=True, max_length=255, verbose_name='Fichier (relatif à MEDIA_ROOT)')),
+                ('error', models.TextField(blank=True, verbose_name='Erreur')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('voyage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pdf_jobs', to='nautical.voyagelognew')),
+            ],
+            options={
+                'verbose_name': 'Export PDF',
+                'verbose_name_plural': 'Exports PDF',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='nautical_pd_status_772d5b_idx')],
+                'unique_together': {('kind', 'voyage', 'version')},
+            },
+        ),
+    ]
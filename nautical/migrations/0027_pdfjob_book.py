@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0026_pdfjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfjob',
+            name='params',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Paramètres'),
+        ),
+        migrations.AlterField(
+            model_name='pdfjob',
+            name='voyage',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pdf_jobs', to='nautical.voyagelognew'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+"""
+Crée les statistiques (VoyageStats) des livres de bord qui n'en ont pas.
+
+Même calcul que VoyageStats.rebuild(), recopié ici : une migration n'importe
+pas le code vivant de l'application. Les lignes existantes ne sont pas
+modifiées (`manage.py rebuild_voyage_stats` les recalcule).
+"""
+import bisect
+import math
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations
+from django.db.models import Count, Max, Min
+
+EARTH_RADIUS_NM = 6371000.0 / 1852.0
+BEAUFORT_KNOTS = [1, 4, 7, 11, 17, 22, 28, 34, 41, 48, 56, 64]
+
+
+def segment_cents(lat1, lon1, lat2, lon2):
+    """Distance orthodromique en centièmes de NM, arrondie ROUND_HALF_UP."""
+    rlat1, rlat2 = math.radians(float(lat1)), math.radians(float(lat2))
+    dlat = rlat2 - rlat1
+    dlon = math.radians(float(lon2)) - math.radians(float(lon1))
+    a = math.sin(dlat / 2) ** 2 + math.cos(rlat1) * math.cos(rlat2) * math.sin(dlon / 2) ** 2
+    nm = EARTH_RADIUS_NM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return int(Decimal(str(nm)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def beaufort_from_text(value):
+    if not value:
+        return None
+    numbers = [float(n.replace(',', '.')) for n in re.findall(r'\d+(?:[.,]\d+)?', value)]
+    if not numbers:
+        return None
+    top = max(numbers)
+    if re.search(r'\b(kn|kts?|nds?|n(oe|œ)uds?)\b', value, re.IGNORECASE):
+        return bisect.bisect_right(BEAUFORT_KNOTS, top)
+    return min(12, int(top))
+
+
+def first_last(entries, field):
+    first = entries.order_by('timestamp', 'id').values_list(field, flat=True).first()
+    last = entries.order_by('-timestamp', '-id').values_list(field, flat=True).first()
+    return first, last
+
+
+def forwards(apps, schema_editor):
+    VoyageLogNew = apps.get_model('nautical', 'VoyageLogNew')
+    VoyageStats = apps.get_model('nautical', 'VoyageStats')
+    LogEntryNew = apps.get_model('nautical', 'LogEntryNew')
+    for voyage in VoyageLogNew.objects.filter(stats__isnull=True).iterator():
+        entries = LogEntryNew.objects.filter(voyage=voyage)
+        aggregates = entries.aggregate(
+            entries_count=Count('id'), barometre_min=Min('barometre'), barometre_max=Max('barometre'),
+        )
+        positions = list(
+            entries.filter(latitude__isnull=False, longitude__isnull=False)
+            .order_by('timestamp', 'id').values_list('latitude', 'longitude')
+        )
+        distance_cents = sum(segment_cents(*a, *b) for a, b in zip(positions, positions[1:]))
+        forces = [beaufort_from_text(v) for v in entries.exclude(vent_force='').values_list('vent_force', flat=True)]
+        forces = [f for f in forces if f is not None]
+        first, last = first_last(entries, 'timestamp')
+        log_debut, log_fin = first_last(entries.filter(log_nautique__isnull=False), 'log_nautique')
+        VoyageStats.objects.create(
+            voyage=voyage,
+            distance_gps_nm=Decimal(distance_cents).scaleb(-2),
+            log_debut=log_debut,
+            log_fin=log_fin,
+            premiere_entree=first,
+            derniere_entree=last,
+            vent_force_max=max(forces) if forces else None,
+            incidents_count=voyage.incidents.count(),
+            weather_count=voyage.conditions_meteo.count(),
+            crew_count=voyage.equipage.count(),
+            photos_count=voyage.photos.filter(type_photo='gallery').count(),
+            **aggregates,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0027_pdfjob_book'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:03
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_books(apps, schema_editor):
+    # garde la plus ancienne tâche de chaque livre avant de poser la contrainte
+    PdfJob = apps.get_model('nautical', 'PdfJob')
+    books = PdfJob.objects.filter(voyage__isnull=True)
+    duplicates = (
+        books.values('kind', 'version')
+        .annotate(n=Count('id'), keep=Min('id')).filter(n__gt=1)
+    )
+    for row in duplicates:
+        books.filter(kind=row['kind'], version=row['version']).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nautical', '0028_backfill_voyage_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_books, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='pdfjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('voyage__isnull', True)), fields=('kind', 'version'), name='unique_pdfjob_book_version'),
+        ),
+    ]
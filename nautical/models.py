@@ -1,8 +1,12 @@
 
-from django.db import models
+from django.db import models, transaction
 import math
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
+import numpy as np
 from django.core.validators import FileExtensionValidator
+from django.db.models.functions import Coalesce, Lag, NullIf, Round
+from . import geo, tracks
+from .db_functions import BearingDeg, HaversineNM, JulianDay
 
 class CrewRole(models.TextChoices):
     SKIPPER = 'Skipper', 'Skipper'
@@ -75,32 +79,12 @@ class LogbookEntry(models.Model):
         """
         try:
             if self.start_lat is not None and self.start_lng is not None and self.end_lat is not None and self.end_lng is not None:
-                # haversine formula
-                lat1 = float(self.start_lat)
-                lon1 = float(self.start_lng)
-                lat2 = float(self.end_lat)
-                lon2 = float(self.end_lng)
-                # convert degrees to radians
-                rlat1 = math.radians(lat1)
-                rlon1 = math.radians(lon1)
-                rlat2 = math.radians(lat2)
-                rlon2 = math.radians(lon2)
-                dlat = rlat2 - rlat1
-                dlon = rlon2 - rlon1
-                a = math.sin(dlat/2)**2 + math.cos(rlat1) * math.cos(rlat2) * math.sin(dlon/2)**2
-                c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                # Earth's radius in meters (mean)
-                R = 6371000.0
-                meters = R * c
-                # convert to nautical miles (1 NM = 1852 meters)
-                nm = meters / 1852.0
-                # round to 2 decimals using Decimal for consistent DB storage
-                self.distance_nm = Decimal(str(nm)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                # great-circle distance, rounded to 2 decimals for DB storage
+                self.distance_nm = geo.quantize_2(geo.haversine_nm(self.start_lat, self.start_lng, self.end_lat, self.end_lng))
             # compute duration in hours if datetimes present
             if self.start_datetime and self.end_datetime:
                 try:
-                    delta = (self.end_datetime - self.start_datetime).total_seconds() / 3600.0
-                    self.duration_hours = Decimal(str(delta)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                    self.duration_hours = geo.quantize_2(geo.hours_between(self.start_datetime, self.end_datetime))
                 except Exception:
                     pass
         except Exception:
@@ -115,70 +99,102 @@ class LogbookEntry(models.Model):
         - distance_nm: sum of segment distances between consecutive events (in NM)
         - duration_hours: hours between first and last event timestamps
         - avg_speed_kn: distance_nm / duration_hours when possible
+
+        This is the full recompute; `VoyageEvent.save()` / `delete()` keep the
+        same totals up to date incrementally through `apply_event_delta()`.
+        Segments are summed as rounded hundredths of NM (the values stored on
+        each event), so both paths give identical results.
         """
         try:
-            events = list(self.events.all().order_by('timestamp'))
-            if not events:
-                # no events -> leave values as-is or clear
-                self.distance_nm = None
-                self.duration_hours = None
-                self.avg_speed_kn = None
-                super().save(update_fields=['distance_nm', 'duration_hours', 'avg_speed_kn'])
-                return
-
-            from decimal import Decimal, ROUND_HALF_UP
-            import math
-
-            total_nm = Decimal('0')
-            # compute distances between consecutive events
-            for i in range(1, len(events)):
-                prev = events[i-1]
-                cur = events[i]
-                if prev.latitude is not None and prev.longitude is not None and cur.latitude is not None and cur.longitude is not None:
-                    # haversine
-                    def to_rad(x):
-                        return math.radians(float(x))
-                    rlat1 = to_rad(prev.latitude)
-                    rlon1 = to_rad(prev.longitude)
-                    rlat2 = to_rad(cur.latitude)
-                    rlon2 = to_rad(cur.longitude)
-                    dlat = rlat2 - rlat1
-                    dlon = rlon2 - rlon1
-                    a = math.sin(dlat/2)**2 + math.cos(rlat1) * math.cos(rlat2) * math.sin(dlon/2)**2
-                    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                    meters = 6371000.0 * c
-                    nm = meters / 1852.0
-                    total_nm += Decimal(str(nm))
-                else:
-                    # fallback: if the event has stored distance_from_prev_nm use it
-                    if cur.distance_from_prev_nm is not None:
-                        total_nm += Decimal(str(cur.distance_from_prev_nm))
-
-            # round and store
-            self.distance_nm = total_nm.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) if total_nm != Decimal('0') else None
-
-            # duration: difference between first and last event
-            try:
-                delta_hours = (events[-1].timestamp - events[0].timestamp).total_seconds() / 3600.0
-                self.duration_hours = Decimal(str(delta_hours)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            except Exception:
-                self.duration_hours = None
-
-            # avg speed
-            try:
-                if self.distance_nm is not None and self.duration_hours and float(self.duration_hours) > 0:
-                    avg = float(self.distance_nm) / float(self.duration_hours)
-                    self.avg_speed_kn = Decimal(str(avg)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                else:
-                    self.avg_speed_kn = None
-            except Exception:
-                self.avg_speed_kn = None
-
+            events = list(
+                self.events.order_by('timestamp', 'id')
+                .values_list('latitude', 'longitude', 'distance_from_prev_nm', 'timestamp')
+            )
+            for field, value in compute_voyage_totals(events).items():
+                setattr(self, field, value)
             super().save(update_fields=['distance_nm', 'duration_hours', 'avg_speed_kn'])
         except Exception:
             # keep existing values on error
             pass
 
+    def apply_event_delta(self, distance_delta):
+        """Incrementally update totals after one event was added, moved or deleted.
+
+        `distance_delta` is the change (Decimal, NM) of the sum of segment
+        distances, computed by the event from the two affected segments only.
+        The duration is re-read from the first/last event timestamps, which is
+        two index lookups on (voyage, timestamp).
+
+        The delta is added by the database (UPDATE ... SET distance_nm =
+        distance_nm + delta), so two events saved at the same time on the
+        same voyage both count; duration and speed are then derived from the
+        stored total.
+        """
+        events = self.events.values_list('timestamp', flat=True)
+        first = events.order_by('timestamp').first()
+        last = events.order_by('-timestamp').first()
+        if first is None:
+            self.distance_nm = None
+            self.duration_hours = None
+            self.avg_speed_kn = None
+            super().save(update_fields=['distance_nm', 'duration_hours', 'avg_speed_kn'])
+            return
+        zero = models.Value(Decimal('0.00'))
+        total = Round(Coalesce('distance_nm', zero) + models.Value(Decimal(distance_delta)), 2)
+        LogbookEntry.objects.filter(pk=self.pk).update(
+            distance_nm=NullIf(total, zero, output_field=models.DecimalField(max_digits=7, decimal_places=2)),
+        )
+        self.refresh_from_db(fields=['distance_nm'])
+        self._set_duration_and_speed(first, last)
+        super().save(update_fields=['duration_hours', 'avg_speed_kn'])
+
+    def _set_duration_and_speed(self, first_timestamp, last_timestamp):
+        self.duration_hours, self.avg_speed_kn = _duration_and_speed(self.distance_nm, first_timestamp, last_timestamp)
+
+
+TOTAL_FIELDS = ['distance_nm', 'duration_hours', 'avg_speed_kn']
+
+
+def _duration_and_speed(distance_nm, first_timestamp, last_timestamp):
+    # duration: difference between first and last event
+    try:
+        duration_hours = geo.quantize_2(geo.hours_between(first_timestamp, last_timestamp))
+    except Exception:
+        duration_hours = None
+
+    # avg speed
+    try:
+        avg_speed_kn = geo.quantize_2(geo.speed_kn(distance_nm, duration_hours))
+    except Exception:
+        avg_speed_kn = None
+    return duration_hours, avg_speed_kn
+
+
+def compute_voyage_totals(events):
+    """Voyage totals from its events, given as (latitude, longitude,
+    distance_from_prev_nm, timestamp) rows ordered by (timestamp, id).
+
+    Returns a dict of TOTAL_FIELDS values (all None without events). Pure
+    function: used by `LogbookEntry.recalculate_from_events()` and by the
+    worker processes of the `recompute_voyage_totals` command.
+    """
+    if not events:
+        return dict.fromkeys(TOTAL_FIELDS)
+
+    lats, lngs, stored, stamps = zip(*events)
+    # segment distances between consecutive events, in one vectorized pass
+    segments = geo.segment_distances_nm(lats, lngs)
+    total_cents = int(geo.round_cents(segments).sum())
+    # fallback: missing coords, use the stored segment distance
+    for cur_stored, nm in zip(stored[1:], segments):
+        if math.isnan(nm) and cur_stored is not None:
+            total_cents += geo.to_cents(cur_stored)
+
+    # round and store
+    distance_nm = geo.from_cents(total_cents) if total_cents else None
+    duration_hours, avg_speed_kn = _duration_and_speed(distance_nm, stamps[0], stamps[-1])
+    return {'distance_nm': distance_nm, 'duration_hours': duration_hours, 'avg_speed_kn': avg_speed_kn}
+
 class MaintenanceRecord(models.Model):
     date = models.DateField('Date intervention')
     equipment = models.CharField('Équipement concerné', max_length=30, choices=EquipmentType.choices, default=EquipmentType.DIVERS)
@@ -337,6 +353,42 @@ class Chronology(models.Model):
         return f"{self.date}{t} — {self.performer}: {self.description[:60]}"
 
 
+class VoyageEventQuerySet(models.QuerySet):
+    def with_segments(self):
+        """Annotate each event with its segment from the previous event of the
+        same voyage, computed by the database in the same query:
+
+        - prev_latitude, prev_longitude, prev_timestamp: LAG() over the voyage
+          ordered by (timestamp, id)
+        - segment_nm, segment_hours, segment_speed_kn, segment_bearing_deg
+
+        Values are unrounded floats (None for the first event or missing
+        coordinates); the stored *_since_prev columns are a rounded cache of
+        the same values. Filters applied before this call also restrict the
+        window: filter on the voyage, not on a time range, to keep the true
+        previous event of the first row.
+        """
+        window = {
+            'partition_by': [models.F('voyage_id')],
+            'order_by': [models.F('timestamp').asc(), models.F('id').asc()],
+        }
+        hours = (JulianDay('timestamp') - JulianDay('prev_timestamp')) * 24.0
+        return self.annotate(
+            prev_latitude=models.Window(Lag('latitude'), **window),
+            prev_longitude=models.Window(Lag('longitude'), **window),
+            prev_timestamp=models.Window(Lag('timestamp'), **window),
+        ).annotate(
+            segment_nm=HaversineNM('prev_latitude', 'prev_longitude', 'latitude', 'longitude'),
+            segment_hours=models.ExpressionWrapper(hours, output_field=models.FloatField()),
+            segment_bearing_deg=BearingDeg('prev_latitude', 'prev_longitude', 'latitude', 'longitude'),
+        ).annotate(
+            segment_speed_kn=models.ExpressionWrapper(
+                models.F('segment_nm') / NullIf('segment_hours', models.Value(0.0)),
+                output_field=models.FloatField(),
+            ),
+        )
+
+
 class VoyageEvent(models.Model):
     """An event or period that occurs during a voyage.
 
@@ -359,49 +411,36 @@ class VoyageEvent(models.Model):
     elapsed_hours_since_prev = models.DecimalField('Temps écoulé depuis précédent (heures)', max_digits=6, decimal_places=2, null=True, blank=True)
     avg_speed_since_prev_kn = models.DecimalField('Vitesse moyenne depuis précédent (kn)', max_digits=6, decimal_places=2, null=True, blank=True)
 
+    objects = VoyageEventQuerySet.as_manager()
+
+    # Spatial lookup key derived from latitude/longitude (see nautical.spatial)
+    geohash = models.CharField('Geohash', max_length=12, blank=True, default='', editable=False)
+
     class Meta:
         ordering = ['-timestamp']
         verbose_name = "Événement de voyage"
         verbose_name_plural = "Événements de voyage"
+        indexes = [
+            models.Index(fields=['voyage', 'timestamp']),
+            models.Index(fields=['geohash']),
+        ]
 
     def __str__(self):
         return f"{self.voyage} @ {self.timestamp} — {self.description[:40]}"
 
-    def save(self, *args, **kwargs):
-        # Compute distance/speed/elapsed time relative to the previous event
+    def compute_segment(self, prev):
+        """Fill the distance/elapsed/speed fields relative to `prev` (or clear them)."""
         try:
-            prev = VoyageEvent.objects.filter(voyage=self.voyage, timestamp__lt=self.timestamp).order_by('-timestamp').first()
             if prev and self.latitude is not None and self.longitude is not None and prev.latitude is not None and prev.longitude is not None:
-                # haversine (meters)
-                import math
-                def to_rad(x):
-                    return math.radians(float(x))
-                rlat1 = to_rad(prev.latitude)
-                rlon1 = to_rad(prev.longitude)
-                rlat2 = to_rad(self.latitude)
-                rlon2 = to_rad(self.longitude)
-                dlat = rlat2 - rlat1
-                dlon = rlon2 - rlon1
-                a = math.sin(dlat/2)**2 + math.cos(rlat1) * math.cos(rlat2) * math.sin(dlon/2)**2
-                c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                R = 6371000.0
-                meters = R * c
-                nm = meters / 1852.0
-                from decimal import Decimal, ROUND_HALF_UP
-                self.distance_from_prev_nm = Decimal(str(nm)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                self.distance_from_prev_nm = geo.quantize_2(geo.haversine_nm(prev.latitude, prev.longitude, self.latitude, self.longitude))
                 # elapsed hours
                 try:
-                    delta_hours = (self.timestamp - prev.timestamp).total_seconds() / 3600.0
-                    self.elapsed_hours_since_prev = Decimal(str(delta_hours)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                    self.elapsed_hours_since_prev = geo.quantize_2(geo.hours_between(prev.timestamp, self.timestamp))
                 except Exception:
                     self.elapsed_hours_since_prev = None
                 # avg speed (knots) = nm / hours
                 try:
-                    if self.elapsed_hours_since_prev and float(self.elapsed_hours_since_prev) > 0:
-                        avg_kn = float(self.distance_from_prev_nm) / float(self.elapsed_hours_since_prev)
-                        self.avg_speed_since_prev_kn = Decimal(str(avg_kn)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                    else:
-                        self.avg_speed_since_prev_kn = None
+                    self.avg_speed_since_prev_kn = geo.quantize_2(geo.speed_kn(self.distance_from_prev_nm, self.elapsed_hours_since_prev))
                 except Exception:
                     self.avg_speed_since_prev_kn = None
             else:
@@ -413,22 +452,177 @@ class VoyageEvent(models.Model):
             # If any error happens, skip calculations
             pass
 
-        super().save(*args, **kwargs)
-        # After saving an event, recompute voyage totals
-        try:
-            if self.voyage_id:
-                self.voyage.recalculate_from_events()
-        except Exception:
-            pass
+    @staticmethod
+    def neighbours(voyage_id, timestamp, pk=None):
+        """Return the (previous, next) events around position (timestamp, pk)
+        of a voyage, ordered by (timestamp, id) and excluding `pk` itself.
+        A new event (pk=None) sorts after existing events with the same timestamp.
+        """
+        qs = VoyageEvent.objects.filter(voyage_id=voyage_id)
+        if pk is None:
+            before = models.Q(timestamp__lte=timestamp)
+            after = models.Q(timestamp__gt=timestamp)
+        else:
+            qs = qs.exclude(pk=pk)
+            before = models.Q(timestamp__lt=timestamp) | models.Q(timestamp=timestamp, pk__lt=pk)
+            after = models.Q(timestamp__gt=timestamp) | models.Q(timestamp=timestamp, pk__gt=pk)
+        prev = qs.filter(before).order_by('-timestamp', '-id').first()
+        nxt = qs.filter(after).order_by('timestamp', 'id').first()
+        return prev, nxt
+
+    def relink(self, prev):
+        """Recompute this event's segment against a new previous event and store
+        it without triggering the save cascade. Returns the distance delta.
+        """
+        old_nm = self.distance_from_prev_nm or 0
+        self.compute_segment(prev)
+        VoyageEvent.objects.filter(pk=self.pk).update(
+            distance_from_prev_nm=self.distance_from_prev_nm,
+            elapsed_hours_since_prev=self.elapsed_hours_since_prev,
+            avg_speed_since_prev_kn=self.avg_speed_since_prev_kn,
+        )
+        return (self.distance_from_prev_nm or 0) - old_nm
+
+    def update_geohash(self):
+        self.geohash = geo.geohash_encode(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        # Only the segment of this event and the one of the following event
+        # change; voyage totals are adjusted by the resulting delta.
+        with transaction.atomic():
+            old = None
+            if self.pk:
+                old = VoyageEvent.objects.filter(pk=self.pk).values(
+                    'voyage_id', 'timestamp', 'latitude', 'longitude', 'distance_from_prev_nm'
+                ).first()
+            if old and (old['voyage_id'], old['timestamp'], old['latitude'], old['longitude']) == (self.voyage_id, self.timestamp, self.latitude, self.longitude):
+                # position in the track unchanged: segments and totals unchanged
+                super().save(*args, **kwargs)
+                return
+
+            deltas = {}
+            if old:
+                # detach from the old position: the old next event now follows the old previous one
+                prev, nxt = VoyageEvent.neighbours(old['voyage_id'], old['timestamp'], self.pk)
+                delta = -(old['distance_from_prev_nm'] or 0)
+                if nxt:
+                    delta += nxt.relink(prev)
+                deltas[old['voyage_id']] = (delta, prev is None and nxt is None)
+
+            prev, nxt = VoyageEvent.neighbours(self.voyage_id, self.timestamp, self.pk)
+            self.compute_segment(prev)
+            super().save(*args, **kwargs)
+            delta = self.distance_from_prev_nm or 0
+            if nxt:
+                delta += nxt.relink(self)
+            old_delta, _ = deltas.get(self.voyage_id, (0, False))
+            deltas[self.voyage_id] = (old_delta + delta, prev is None and nxt is None)
+
+            for voyage_id, (delta, alone) in deltas.items():
+                _update_voyage_totals(voyage_id, delta, alone)
 
     def delete(self, *args, **kwargs):
-        voyage = self.voyage
-        super().delete(*args, **kwargs)
-        try:
-            if voyage:
-                voyage.recalculate_from_events()
-        except Exception:
-            pass
+        voyage_id = self.voyage_id
+        with transaction.atomic():
+            prev, nxt = VoyageEvent.neighbours(voyage_id, self.timestamp, self.pk)
+            delta = -(self.distance_from_prev_nm or 0)
+            result = super().delete(*args, **kwargs)
+            if nxt:
+                delta += nxt.relink(prev)
+            _update_voyage_totals(voyage_id, delta, prev is None and nxt is None)
+        return result
+
+    @classmethod
+    def bulk_add(cls, voyage, rows, batch_size=1000):
+        """Insert many events of one voyage at once (e.g. a day of GPS fixes).
+
+        `rows` are dicts of field values. They are sorted by timestamp and
+        merged with the existing events they overlap; all segments are then
+        computed in one vectorized pass, new rows are written with
+        `bulk_create`, existing rows whose segment changed with `bulk_update`,
+        and the voyage totals are updated once.
+        """
+        new = sorted((cls(voyage=voyage, **row) for row in rows), key=lambda e: e.timestamp)
+        if not new:
+            return []
+        for event in new:
+            event.update_geohash()
+        segment_fields = ['distance_from_prev_nm', 'elapsed_hours_since_prev', 'avg_speed_since_prev_kn']
+        with transaction.atomic():
+            first, last = new[0].timestamp, new[-1].timestamp
+            events = cls.objects.filter(voyage=voyage)
+            prev = events.filter(timestamp__lt=first).order_by('-timestamp', '-id').first()
+            nxt = events.filter(timestamp__gt=last).order_by('timestamp', 'id').first()
+            overlapped = list(events.filter(timestamp__gte=first, timestamp__lte=last))
+
+            # existing events sort before new ones with the same timestamp
+            track = sorted(
+                [(e.timestamp, 0, e.pk, e) for e in overlapped] + [(e.timestamp, 1, i, e) for i, e in enumerate(new)],
+                key=lambda item: item[:3],
+            )
+            track = [item[3] for item in track]
+            if prev:
+                track.insert(0, prev)
+            if nxt:
+                track.append(nxt)
+            existing = {e.pk: e.distance_from_prev_nm for e in overlapped + ([nxt] if nxt else [])}
+
+            segments = geo.track_segments(
+                [e.latitude for e in track],
+                [e.longitude for e in track],
+                [e.timestamp for e in track],
+            )
+            # same rounding as VoyageEvent.compute_segment(): speed from rounded distance and hours
+            distance_cents = geo.round_cents(segments.distance_nm)
+            hours_cents = geo.round_cents(segments.elapsed_hours)
+            speed_cents = geo.round_cents(geo.segment_speeds_kn(distance_cents / 100, hours_cents / 100))
+            has_position = ~np.isnan(segments.distance_nm)
+            has_speed = has_position & (hours_cents > 0)
+
+            if track[0] is not prev:
+                # first point of the voyage: no previous segment
+                track[0].distance_from_prev_nm = None
+                track[0].elapsed_hours_since_prev = None
+                track[0].avg_speed_since_prev_kn = None
+            delta = 0
+            for i, event in enumerate(track[1:]):
+                if has_position[i]:
+                    event.distance_from_prev_nm = geo.from_cents(distance_cents[i])
+                    event.elapsed_hours_since_prev = geo.from_cents(hours_cents[i])
+                    event.avg_speed_since_prev_kn = geo.from_cents(speed_cents[i]) if has_speed[i] else None
+                else:
+                    event.distance_from_prev_nm = None
+                    event.elapsed_hours_since_prev = None
+                    event.avg_speed_since_prev_kn = None
+            for event in track:
+                if event is prev:
+                    continue
+                delta += (event.distance_from_prev_nm or 0) - (existing.get(event.pk) or 0)
+
+            cls.objects.bulk_create(new, batch_size=batch_size)
+            changed = [e for e in track if e.pk in existing]
+            if changed:
+                cls.objects.bulk_update(changed, segment_fields, batch_size=batch_size)
+            _update_voyage_totals(voyage.pk, delta, prev is None and nxt is None and not overlapped)
+        return new
+
+
+def _update_voyage_totals(voyage_id, distance_delta, alone):
+    """Apply an event's distance delta to its voyage. When the event is (or was)
+    the only one of the voyage, a full recompute is just as cheap and also
+    replaces any distance derived from the voyage's start/end coordinates.
+    The cached simplified track of the voyage is invalidated as well, once
+    the transaction commits.
+    """
+    tracks.invalidate_track('events', voyage_id)
+    voyage = LogbookEntry.objects.filter(pk=voyage_id).first()
+    if voyage is None:
+        return
+    if alone:
+        voyage.recalculate_from_events()
+    else:
+        voyage.apply_event_delta(distance_delta)
 
 
 # =============================================================================
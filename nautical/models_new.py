@@ -2,11 +2,28 @@
 Nouveaux modèles Django basés sur la structure réelle du livre de bord
 Analysé depuis Livre_de_Bord.pdf
 """
-from django.db import models
+import bisect
+import re
+from collections import namedtuple
+from datetime import datetime as dt_datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.urls import reverse
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from . import geo
+
+
+class VoyageLogNewQuerySet(models.QuerySet):
+    def with_photos(self):
+        """Précharge toutes les photos des voyages en une requête (attribut
+        `prefetched_photos`), lu par header_photo, gallery_photos et photos_count."""
+        return self.prefetch_related(models.Prefetch(
+            'photos', queryset=VoyagePhoto.objects.order_by('ordre', 'created_at', 'id'), to_attr='prefetched_photos',
+        ))
+
 
 class VoyageLogNew(models.Model):
     """
@@ -36,6 +53,8 @@ class VoyageLogNew(models.Model):
     # Métadonnées
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VoyageLogNewQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Livre de bord"
@@ -66,20 +85,43 @@ class VoyageLogNew(models.Model):
             self.bateau = 'MANTA'
         super().save(*args, **kwargs)
     
+    # Photos : lues dans `prefetched_photos` si le voyage vient d'un queryset
+    # `with_photos()`, sinon une requête à chaque accès
+
     @property
     def header_photo(self):
         """Retourne la photo d'en-tête du voyage"""
+        photos = getattr(self, 'prefetched_photos', None)
+        if photos is not None:
+            return next((photo for photo in photos if photo.type_photo == 'header'), None)
         return self.photos.filter(type_photo='header').first()
     
     @property
     def gallery_photos(self):
-        """Retourne les photos de galerie du voyage triées par ordre"""
-        return self.photos.filter(type_photo='gallery').order_by('ordre', 'created_at')
+        """Retourne les photos de galerie du voyage triées par ordre
+        (une liste si les photos sont préchargées, un queryset sinon)"""
+        photos = getattr(self, 'prefetched_photos', None)
+        if photos is not None:
+            return [photo for photo in photos if photo.type_photo == 'gallery']
+        return self.photos.filter(type_photo='gallery').order_by('ordre', 'created_at', 'id')
     
     @property
     def photos_count(self):
-        """Nombre total de photos (hors en-tête)"""
-        return self.photos.filter(type_photo='gallery').count()
+        """Nombre total de photos (hors en-tête) : photos préchargées, sinon compteur de VoyageStats"""
+        photos = getattr(self, 'prefetched_photos', None)
+        if photos is not None:
+            return sum(1 for photo in photos if photo.type_photo == 'gallery')
+        return self.statistics.photos_count
+
+    @property
+    def statistics(self):
+        """Statistiques matérialisées du voyage. Lecture seule : sans ligne
+        VoyageStats (créée à la création du voyage, migration 0028 pour
+        l'existant), des statistiques vides non enregistrées."""
+        try:
+            return self.stats
+        except VoyageStats.DoesNotExist:
+            return VoyageStats(voyage=self)
 
 
 class WeatherConditionNew(models.Model):
@@ -132,6 +174,38 @@ class WeatherConditionNew(models.Model):
         return f"Météo {self.datetime.strftime('%d/%m %H:%M')} - {self.voyage.bateau}"
 
 
+class LogEntryNewQuerySet(models.QuerySet):
+    def timeline_page(self, after=None, limit=50):
+        """Page de la chronologie, pagination par clé sur (timestamp, id).
+
+        `after` est le curseur de la dernière entrée déjà affichée (voir
+        `LogEntryNew.timeline_cursor`) : la page commence par une recherche
+        dans l'index (voyage, timestamp), sans OFFSET. Retourne (entrées,
+        curseur de la page suivante ou None).
+        """
+        qs = self.order_by('timestamp', 'id')
+        if after is not None:
+            timestamp, pk = after
+            qs = qs.filter(models.Q(timestamp__gt=timestamp) | models.Q(timestamp=timestamp, pk__gt=pk))
+        entries = list(qs[:limit + 1])
+        if len(entries) <= limit:
+            return entries, None
+        entries = entries[:limit]
+        return entries, entries[-1].timeline_cursor()
+
+
+TIMELINE_EPOCH = dt_datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def parse_timeline_cursor(value):
+    """(timestamp, id) d'un curseur '<microsecondes epoch>-<id>', ou None si invalide."""
+    try:
+        micros, pk = (int(part) for part in value.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return TIMELINE_EPOCH + timedelta(microseconds=micros), pk
+
+
 class LogEntryNew(models.Model):
     """
     Entrée de log horodatée dans le livre de bord
@@ -142,6 +216,9 @@ class LogEntryNew(models.Model):
     # Timing
     heure = models.TimeField(verbose_name="Heure")
     date = models.DateField(verbose_name="Date", default=timezone.now)
+    # Date + heure en heure locale du bord, dérivé à chaque enregistrement :
+    # tris et filtres par période sur une seule colonne indexée
+    timestamp = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Horodatage")
     
     # Navigation
     log_nautique = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, verbose_name="Log nautique")
@@ -173,23 +250,140 @@ class LogEntryNew(models.Model):
     # Coordonnées GPS (calculées ou saisies)
     latitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True, verbose_name="Latitude")
     longitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True, verbose_name="Longitude")
+    # Clé de recherche spatiale dérivée de latitude/longitude (voir nautical.spatial)
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False, verbose_name="Geohash")
+
+    objects = LogEntryNewQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Entrée de log"
         verbose_name_plural = "Entrées de log"
-        ordering = ['date', 'heure']
+        ordering = ['timestamp', 'id']
         indexes = [
-            models.Index(fields=['voyage', 'date', 'heure']),
-            models.Index(fields=['date', 'heure']),
+            models.Index(fields=['voyage', 'timestamp']),
+            models.Index(fields=['timestamp']),
+            models.Index(fields=['geohash']),
         ]
     
     def __str__(self):
         return f"{self.date.strftime('%d/%m')} {self.heure.strftime('%H:%M')} - {self.evenements[:50]}..."
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'position' in field_names:
+            # Texte de position tel que chargé, pour détecter une modification
+            instance._loaded_position = instance.position
+        return instance
+
+    def update_coordinates(self):
+        """Renseigne latitude/longitude à partir du texte `position` lorsqu'elles
+        sont vides, ou lorsque le texte a été modifié depuis le chargement.
+        Retourne True si les coordonnées ont été mises à jour."""
+        if not self.position:
+            return False
+        edited = getattr(self, '_loaded_position', self.position) != self.position
+        if not edited and self.latitude is not None and self.longitude is not None:
+            return False
+        parsed = geo.parse_position(self.position)
+        if parsed is None:
+            return False
+        self.latitude = Decimal(f"{parsed[0]:.7f}")
+        self.longitude = Decimal(f"{parsed[1]:.7f}")
+        self._loaded_position = self.position
+        return True
+
+    def update_geohash(self):
+        self.geohash = geo.geohash_encode(self.latitude, self.longitude)
+
+    def update_timestamp(self):
+        self.timestamp = entry_datetime(self.date, self.heure)
+
+    def save(self, *args, **kwargs):
+        self.update_coordinates()
+        self.update_geohash()
+        self.update_timestamp()
+        super().save(*args, **kwargs)
     
     @property
     def datetime(self):
-        """Combine date et heure pour faciliter l'affichage chronologique"""
-        return timezone.datetime.combine(self.date, self.heure)
+        """Date et heure de l'entrée (aware, heure locale du bord)"""
+        return self.timestamp or entry_datetime(self.date, self.heure)
+
+    def timeline_cursor(self):
+        """Curseur de pagination de la chronologie après cette entrée."""
+        micros = (self.timestamp - TIMELINE_EPOCH) // timedelta(microseconds=1)
+        return f"{micros}-{self.pk}"
+
+    def to_live_json(self):
+        """Représentation compacte pour le mode live (API, flux SSE)"""
+        return {
+            'id': self.id,
+            'date': self.date.strftime('%d/%m/%Y'),
+            'heure': self.heure.strftime('%H:%M'),
+            'evenements': self.evenements,
+            'position': self.position,
+            'vent_force': self.vent_force,
+            'vent_direction': self.vent_direction,
+            'allure': self.allure,
+        }
+
+
+class LogEntryChange(models.Model):
+    """
+    Journal des modifications des entrées de log d'un voyage.
+    L'identifiant (AUTOINCREMENT, jamais réutilisé) sert de curseur : flux
+    SSE (Last-Event-ID), synchronisation incrémentale. Une seule ligne par
+    entrée et par voyage : sa dernière création/modification, ou sa
+    suppression (tombstone).
+    """
+    ACTION_CHOICES = [
+        ('upsert', 'Création / modification'),
+        ('delete', 'Suppression'),
+    ]
+    voyage = models.ForeignKey(VoyageLogNew, on_delete=models.CASCADE, related_name='entry_changes')
+    entry_id = models.BigIntegerField(verbose_name="Entrée")
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Modification d'entrée de log"
+        verbose_name_plural = "Modifications d'entrées de log"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['voyage', 'id']),
+            models.Index(fields=['voyage', 'entry_id']),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.action} entrée {self.entry_id}"
+
+    @classmethod
+    def record(cls, voyage_id, entry_ids, action='upsert'):
+        """Enregistre la modification (ou suppression) d'entrées d'un voyage,
+        en remplaçant leur ligne précédente. Retourne le dernier curseur."""
+        entry_ids = list(entry_ids)
+        if not entry_ids:
+            return None
+        with transaction.atomic():
+            cls.objects.filter(voyage_id=voyage_id, entry_id__in=entry_ids).delete()
+            changes = cls.objects.bulk_create([
+                cls(voyage_id=voyage_id, entry_id=entry_id, action=action) for entry_id in entry_ids
+            ])
+        return changes[-1].id
+
+    @classmethod
+    def latest_id(cls, voyage_id):
+        """Curseur courant d'un voyage (0 si aucune modification)"""
+        return cls.objects.filter(voyage_id=voyage_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+    @classmethod
+    def since(cls, voyage_id, cursor, limit=200):
+        """Modifications postérieures au curseur, avec les entrées concernées :
+        liste de (change, entry ou None pour une suppression)."""
+        changes = list(cls.objects.filter(voyage_id=voyage_id, id__gt=cursor).order_by('id')[:limit])
+        entries = LogEntryNew.objects.in_bulk([c.entry_id for c in changes if c.action == 'upsert'])
+        return [(change, entries.get(change.entry_id)) for change in changes]
 
 
 class CrewMemberNew(models.Model):
@@ -403,4 +597,486 @@ class VoyagePhoto(models.Model):
     @property
     def is_header(self):
         """True si c'est la photo d'en-tête"""
-        return self.type_photo == 'header'
\ No newline at end of file
+        return self.type_photo == 'header'
+
+
+# =============================================================================
+# STATISTIQUES MATÉRIALISÉES PAR VOYAGE
+# =============================================================================
+
+# Bornes supérieures (nœuds, exclues) des forces 0 à 11 de l'échelle de Beaufort
+BEAUFORT_KNOTS = [1, 4, 7, 11, 17, 22, 28, 34, 41, 48, 56, 64]
+
+
+def beaufort_from_text(value):
+    """Force du vent (Beaufort) lue dans la saisie libre `vent_force`.
+
+    '5', 'F5', '4-5 Bft' -> 5 ; les valeurs en nœuds ('15-20 nds', '18 kt')
+    sont converties. Retourne None si aucune valeur n'est lisible.
+    """
+    if not value:
+        return None
+    numbers = [float(n.replace(',', '.')) for n in re.findall(r'\d+(?:[.,]\d+)?', value)]
+    if not numbers:
+        return None
+    top = max(numbers)
+    if re.search(r'\b(kn|kts?|nds?|n(oe|œ)uds?)\b', value, re.IGNORECASE):
+        return bisect.bisect_right(BEAUFORT_KNOTS, top)
+    return min(12, int(top))
+
+
+def entry_datetime(date, heure):
+    """Date + heure d'une entrée de log, en heure locale du bord (aware)."""
+    return timezone.make_aware(dt_datetime.combine(date, heure))
+
+
+# Valeurs d'une entrée utiles aux statistiques, avant/après une écriture
+EntrySnapshot = namedtuple('EntrySnapshot', [
+    'pk', 'voyage_id', 'timestamp', 'latitude', 'longitude', 'log_nautique', 'vent_force', 'barometre',
+])
+
+
+_Position = namedtuple('_Position', ['latitude', 'longitude'])
+
+
+def entry_snapshot(entry):
+    return EntrySnapshot(*(getattr(entry, name) for name in EntrySnapshot._fields))
+
+
+def _positioned(snapshot):
+    return snapshot is not None and snapshot.latitude is not None and snapshot.longitude is not None
+
+
+def _segment_nm(a, b):
+    if a is None or b is None:
+        return 0
+    return geo.quantize_2(geo.haversine_nm(a.latitude, a.longitude, b.latitude, b.longitude))
+
+
+def _path_nm(rows):
+    """Longueur d'une suite de lignes (pk, latitude, longitude) triées."""
+    positions = [_Position(latitude, longitude) for _, latitude, longitude in rows]
+    return sum((_segment_nm(a, b) for a, b in zip(positions, positions[1:])), 0)
+
+
+class VoyageStats(models.Model):
+    """
+    Statistiques d'un voyage, une ligne par livre de bord.
+
+    Tenues à jour de façon incrémentale par les signaux des entrées de log,
+    incidents et bulletins météo (voir nautical.signals) : une écriture
+    coûte quelques recherches par l'index (voyage, timestamp), jamais un
+    parcours de toutes les entrées. `manage.py rebuild_voyage_stats` les
+    recalcule entièrement.
+    """
+    voyage = models.OneToOneField(VoyageLogNew, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+
+    # Distances
+    distance_gps_nm = models.DecimalField(max_digits=9, decimal_places=2, default=0, verbose_name="Distance GPS (NM)")
+    log_debut = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, verbose_name="Log au départ")
+    log_fin = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, verbose_name="Log à l'arrivée")
+
+    # Période couverte par les entrées
+    premiere_entree = models.DateTimeField(null=True, blank=True, verbose_name="Première entrée")
+    derniere_entree = models.DateTimeField(null=True, blank=True, verbose_name="Dernière entrée")
+
+    # Conditions extrêmes
+    vent_force_max = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Vent max (Beaufort)")
+    barometre_min = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, verbose_name="Baromètre min (hPa)")
+    barometre_max = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, verbose_name="Baromètre max (hPa)")
+
+    # Compteurs
+    entries_count = models.PositiveIntegerField(default=0, verbose_name="Entrées de log")
+    incidents_count = models.PositiveIntegerField(default=0, verbose_name="Incidents")
+    weather_count = models.PositiveIntegerField(default=0, verbose_name="Bulletins météo")
+    crew_count = models.PositiveIntegerField(default=0, verbose_name="Équipiers")
+    photos_count = models.PositiveIntegerField(default=0, verbose_name="Photos de galerie")
+
+    # Incrémentée à chaque écriture du voyage ou d'un objet rattaché (voir
+    # caching.bump_voyage) : clé des exports PDF enregistrés sur disque
+    content_version = models.PositiveBigIntegerField(default=0, verbose_name="Version du contenu")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Statistiques de voyage"
+        verbose_name_plural = "Statistiques de voyage"
+
+    def __str__(self):
+        return f"Statistiques - {self.voyage_id}"
+
+    @property
+    def distance_log_nm(self):
+        """Distance parcourue d'après le loch (dernier relevé - premier relevé)"""
+        if self.log_debut is None or self.log_fin is None:
+            return None
+        return self.log_fin - self.log_debut
+
+    @property
+    def duree(self):
+        if self.premiere_entree is None or self.derniere_entree is None:
+            return None
+        return self.derniere_entree - self.premiere_entree
+
+    @property
+    def vitesse_moyenne_kn(self):
+        """Vitesse moyenne sur la trace GPS entre la première et la dernière entrée"""
+        duree = self.duree
+        hours = duree.total_seconds() / 3600 if duree else 0
+        return geo.quantize_2(geo.speed_kn(self.distance_gps_nm, hours))
+
+    # --- Recalcul complet -------------------------------------------------
+
+    @classmethod
+    def rebuild(cls, voyage_id):
+        """Recalcule toutes les statistiques d'un voyage et les enregistre."""
+        entries = LogEntryNew.objects.filter(voyage_id=voyage_id)
+        aggregates = entries.aggregate(
+            entries_count=models.Count('id'),
+            barometre_min=models.Min('barometre'),
+            barometre_max=models.Max('barometre'),
+        )
+        positions = list(
+            entries.filter(latitude__isnull=False, longitude__isnull=False)
+            .order_by('timestamp', 'id')
+            .values_list('latitude', 'longitude')
+        )
+        distance_cents = 0
+        if len(positions) > 1:
+            lats, lngs = zip(*positions)
+            distance_cents = int(geo.round_cents(geo.segment_distances_nm(lats, lngs)).sum())
+        forces = [beaufort_from_text(v) for v in entries.exclude(vent_force='').values_list('vent_force', flat=True)]
+        forces = [f for f in forces if f is not None]
+        first, last = cls._first_last(entries)
+        log_debut, log_fin = cls._first_last(entries.filter(log_nautique__isnull=False), 'log_nautique')
+        stats, _ = cls.objects.update_or_create(voyage_id=voyage_id, defaults={
+            'distance_gps_nm': geo.from_cents(distance_cents),
+            'log_debut': log_debut,
+            'log_fin': log_fin,
+            'premiere_entree': first,
+            'derniere_entree': last,
+            'vent_force_max': max(forces) if forces else None,
+            **cls.count_children(voyage_id),
+            **aggregates,
+        })
+        return stats
+
+    @staticmethod
+    def count_children(voyage_id):
+        """Compteurs des objets rattachés au voyage (hors entrées de log), par COUNT()."""
+        return {
+            'incidents_count': IncidentNew.objects.filter(voyage_id=voyage_id).count(),
+            'weather_count': WeatherConditionNew.objects.filter(voyage_id=voyage_id).count(),
+            'crew_count': CrewMemberNew.objects.filter(voyage_id=voyage_id).count(),
+            'photos_count': VoyagePhoto.objects.filter(voyage_id=voyage_id, type_photo='gallery').count(),
+        }
+
+    @staticmethod
+    def _first_last(entries, field=None):
+        """Valeurs de `field` (par défaut l'horodatage) de la première et de la dernière entrée."""
+        field = field or 'timestamp'
+        first = entries.order_by('timestamp', 'id').values_list(field, flat=True).first()
+        last = entries.order_by('-timestamp', '-id').values_list(field, flat=True).first()
+        return first, last
+
+    # --- Mise à jour incrémentale ----------------------------------------
+
+    @classmethod
+    def get_or_rebuild(cls, voyage_id):
+        """(stats, rebuilt) : la ligne existante, ou une ligne recalculée
+        (qui reflète déjà l'écriture en cours) si elle n'existait pas."""
+        stats = cls.objects.filter(voyage_id=voyage_id).first()
+        if stats is not None:
+            return stats, False
+        return cls.rebuild(voyage_id), True
+
+    @classmethod
+    def bump(cls, voyage_id, field, delta):
+        """Ajuste un compteur (incidents_count, weather_count...) avec F()."""
+        with transaction.atomic():
+            _, rebuilt = cls.get_or_rebuild(voyage_id)
+            if not rebuilt:
+                cls.objects.filter(voyage_id=voyage_id).update(**{field: models.F(field) + delta})
+
+    @classmethod
+    def apply_entry_change(cls, old, new):
+        """Répercute une écriture d'entrée de log : `old`/`new` sont les
+        EntrySnapshot avant/après (None pour une création/suppression)."""
+        for voyage_id in {s.voyage_id for s in (old, new) if s is not None}:
+            with transaction.atomic():
+                cls._apply_entry_change(
+                    voyage_id,
+                    old if old is not None and old.voyage_id == voyage_id else None,
+                    new if new is not None and new.voyage_id == voyage_id else None,
+                )
+
+    @classmethod
+    def _apply_entry_change(cls, voyage_id, old, new):
+        stats, rebuilt = cls.get_or_rebuild(voyage_id)
+        if rebuilt:
+            return
+        entries = LogEntryNew.objects.filter(voyage_id=voyage_id)
+        counters = {}
+        values = {}
+
+        if (old is None) != (new is None):
+            counters['entries_count'] = models.F('entries_count') + (1 if new is not None else -1)
+
+        # Trace GPS : seuls les segments voisins de l'entrée changent
+        moved = old is None or new is None or (
+            (old.timestamp, old.latitude, old.longitude) != (new.timestamp, new.latitude, new.longitude)
+        )
+        if moved:
+            delta = 0
+            if _positioned(old):
+                delta -= cls._insertion_nm(entries, old)
+            if _positioned(new):
+                delta += cls._insertion_nm(entries, new)
+            if delta:
+                counters['distance_gps_nm'] = models.F('distance_gps_nm') + delta
+
+        if old is None or new is None or old.timestamp != new.timestamp:
+            values['premiere_entree'], values['derniere_entree'] = cls._first_last(entries)
+        if (old is not None and old.log_nautique is not None) or (new is not None and new.log_nautique is not None):
+            values['log_debut'], values['log_fin'] = cls._first_last(entries.filter(log_nautique__isnull=False), 'log_nautique')
+
+        # Extrêmes : recalcul seulement si l'ancienne valeur était l'extrême
+        old_force = beaufort_from_text(old.vent_force) if old else None
+        new_force = beaufort_from_text(new.vent_force) if new else None
+        if old_force != new_force:
+            if old_force is not None and stats.vent_force_max is not None and old_force >= stats.vent_force_max:
+                forces = [beaufort_from_text(v) for v in entries.exclude(vent_force='').values_list('vent_force', flat=True)]
+                forces = [f for f in forces if f is not None]
+                values['vent_force_max'] = max(forces) if forces else None
+            elif new_force is not None and (stats.vent_force_max is None or new_force > stats.vent_force_max):
+                values['vent_force_max'] = new_force
+
+        old_baro = old.barometre if old else None
+        new_baro = new.barometre if new else None
+        if old_baro != new_baro:
+            was_extreme = old_baro is not None and (
+                stats.barometre_min is None or old_baro <= stats.barometre_min
+                or stats.barometre_max is None or old_baro >= stats.barometre_max
+            )
+            if was_extreme:
+                values.update(entries.aggregate(barometre_min=models.Min('barometre'), barometre_max=models.Max('barometre')))
+            elif new_baro is not None:
+                if stats.barometre_min is None or new_baro < stats.barometre_min:
+                    values['barometre_min'] = new_baro
+                if stats.barometre_max is None or new_baro > stats.barometre_max:
+                    values['barometre_max'] = new_baro
+
+        if counters or values:
+            cls.objects.filter(voyage_id=voyage_id).update(updated_at=timezone.now(), **counters, **values)
+
+    @staticmethod
+    def _insertion_nm(entries, snapshot):
+        """Distance ajoutée à la trace par l'entrée positionnée `snapshot`
+        entre ses voisines (ordre timestamp, id ; l'entrée elle-même exclue)."""
+        positioned = entries.filter(latitude__isnull=False, longitude__isnull=False).exclude(pk=snapshot.pk)
+        ts, pk = snapshot.timestamp, snapshot.pk
+        before = models.Q(timestamp__lt=ts) | models.Q(timestamp=ts, pk__lt=pk)
+        after = models.Q(timestamp__gt=ts) | models.Q(timestamp=ts, pk__gt=pk)
+        prev = positioned.filter(before).order_by('-timestamp', '-id').values_list('latitude', 'longitude').first()
+        nxt = positioned.filter(after).order_by('timestamp', 'id').values_list('latitude', 'longitude').first()
+        prev = _Position(*prev) if prev else None
+        nxt = _Position(*nxt) if nxt else None
+        return _segment_nm(prev, snapshot) + _segment_nm(snapshot, nxt) - _segment_nm(prev, nxt)
+
+    @classmethod
+    def apply_bulk_insert(cls, voyage_id, ids, start, end):
+        """Répercute l'ajout en masse des entrées `ids`, horodatées de `start`
+        à `end` (relevés des instruments, import de trace).
+
+        Comme `_insertion_nm` pour une entrée : la trace n'est recalculée
+        qu'entre les entrées positionnées qui encadrent le lot (y compris les
+        entrées existantes intercalées), les autres statistiques par quelques
+        lectures de l'index (voyage, timestamp). Le coût suit la taille du
+        lot, pas celle du voyage."""
+        with transaction.atomic():
+            stats, rebuilt = cls.get_or_rebuild(voyage_id)
+            if rebuilt:
+                return
+            entries = LogEntryNew.objects.filter(voyage_id=voyage_id)
+            positioned = entries.filter(latitude__isnull=False, longitude__isnull=False)
+            fields = ('pk', 'latitude', 'longitude')
+            prev = positioned.filter(timestamp__lt=start).order_by('-timestamp', '-id').values_list(*fields).first()
+            nxt = positioned.filter(timestamp__gt=end).order_by('timestamp', 'id').values_list(*fields).first()
+            span = positioned.filter(timestamp__gte=start, timestamp__lte=end).order_by('timestamp', 'id')
+            track = [row for row in (prev, *span.values_list(*fields), nxt) if row is not None]
+            new_ids = set(ids)
+            delta = _path_nm(track) - _path_nm([row for row in track if row[0] not in new_ids])
+
+            # Extrêmes : les entrées existantes de l'intervalle n'y changent rien
+            batch = entries.filter(timestamp__gte=start, timestamp__lte=end)
+            values = batch.aggregate(barometre_min=models.Min('barometre'), barometre_max=models.Max('barometre'))
+            if values['barometre_min'] is None or (stats.barometre_min is not None and stats.barometre_min < values['barometre_min']):
+                values['barometre_min'] = stats.barometre_min
+            if values['barometre_max'] is None or (stats.barometre_max is not None and stats.barometre_max > values['barometre_max']):
+                values['barometre_max'] = stats.barometre_max
+            forces = [beaufort_from_text(v) for v in batch.exclude(vent_force='').values_list('vent_force', flat=True)]
+            forces = [f for f in forces if f is not None]
+            if stats.vent_force_max is not None:
+                forces.append(stats.vent_force_max)
+            values['vent_force_max'] = max(forces) if forces else None
+            values['premiere_entree'], values['derniere_entree'] = cls._first_last(entries)
+            values['log_debut'], values['log_fin'] = cls._first_last(entries.filter(log_nautique__isnull=False), 'log_nautique')
+
+            cls.objects.filter(voyage_id=voyage_id).update(
+                updated_at=timezone.now(),
+                entries_count=models.F('entries_count') + len(new_ids),
+                distance_gps_nm=models.F('distance_gps_nm') + delta,
+                **values,
+            )
+
+
+# --- Agrégats pour le tableau de bord (voir nautical.rollups) --------------
+
+class VoyageDayRollup(models.Model):
+    """
+    Agrégats d'un voyage pour une journée (heure locale du bord).
+
+    Tenus à jour par nautical.rollups à chaque écriture d'entrée de log :
+    seules les journées touchées sont recalculées. `manage.py rebuild_rollups`
+    recalcule tout.
+    """
+    voyage = models.ForeignKey(VoyageLogNew, on_delete=models.CASCADE, related_name='day_rollups')
+    day = models.DateField(verbose_name="Jour")
+
+    entries_count = models.PositiveIntegerField(default=0, verbose_name="Entrées de log")
+    distance_nm = models.DecimalField(max_digits=9, decimal_places=2, default=0, verbose_name="Distance GPS (NM)")
+    motor_minutes = models.PositiveIntegerField(default=0, verbose_name="Minutes au moteur")
+    sail_minutes = models.PositiveIntegerField(default=0, verbose_name="Minutes à la voile")
+    vent_force_max = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Vent max (Beaufort)")
+
+    class Meta:
+        verbose_name = "Agrégat journalier"
+        verbose_name_plural = "Agrégats journaliers"
+        ordering = ['voyage', 'day']
+        unique_together = ('voyage', 'day')
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.voyage_id} - {self.day}"
+
+
+class MonthRollup(models.Model):
+    """
+    Agrégats de tous les voyages pour un mois, recalculés à partir des
+    agrégats journaliers du mois (au plus quelques dizaines de lignes).
+    """
+    month = models.DateField(unique=True, verbose_name="Mois")  # premier jour du mois
+
+    voyages_count = models.PositiveIntegerField(default=0, verbose_name="Voyages")
+    days_at_sea = models.PositiveIntegerField(default=0, verbose_name="Jours de mer")
+    entries_count = models.PositiveIntegerField(default=0, verbose_name="Entrées de log")
+    distance_nm = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Distance GPS (NM)")
+    motor_minutes = models.PositiveIntegerField(default=0, verbose_name="Minutes au moteur")
+    sail_minutes = models.PositiveIntegerField(default=0, verbose_name="Minutes à la voile")
+    vent_force_max = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Vent max (Beaufort)")
+
+    class Meta:
+        verbose_name = "Agrégat mensuel"
+        verbose_name_plural = "Agrégats mensuels"
+        ordering = ['month']
+
+    def __str__(self):
+        return self.month.strftime('%m/%Y')
+
+    @property
+    def motor_hours(self):
+        return round(self.motor_minutes / 60, 1)
+
+    @property
+    def sail_hours(self):
+        return round(self.sail_minutes / 60, 1)
+
+
+class IncidentRollup(models.Model):
+    """Nombre d'incidents par voyage, mois, type et gravité (tenu à jour avec F())."""
+    voyage = models.ForeignKey(VoyageLogNew, on_delete=models.CASCADE, related_name='incident_rollups')
+    month = models.DateField(verbose_name="Mois")
+    type_incident = models.CharField(max_length=20, choices=IncidentNew.TYPE_CHOICES, verbose_name="Type d'incident")
+    gravite = models.CharField(max_length=20, choices=IncidentNew.GRAVITE_CHOICES, verbose_name="Gravité")
+    count = models.PositiveIntegerField(default=0, verbose_name="Incidents")
+
+    class Meta:
+        verbose_name = "Agrégat d'incidents"
+        verbose_name_plural = "Agrégats d'incidents"
+        ordering = ['month', 'type_incident', 'gravite']
+        unique_together = ('voyage', 'month', 'type_incident', 'gravite')
+        indexes = [
+            models.Index(fields=['month']),
+        ]
+
+    def __str__(self):
+        return f"{self.month.strftime('%m/%Y')} - {self.type_incident}/{self.gravite} : {self.count}"
+
+
+class SiteCounter(models.Model):
+    """Nombre de lignes d'une table, tenu à jour par les signaux (voir nautical.counters)."""
+    name = models.CharField(max_length=50, primary_key=True, verbose_name="Compteur")
+    value = models.BigIntegerField(default=0, verbose_name="Valeur")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Compteur global"
+        verbose_name_plural = "Compteurs globaux"
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} : {self.value}"
+
+
+class PdfJob(models.Model):
+    """
+    Construction d'un export PDF par le worker (`manage.py run_worker`).
+
+    Une tâche par (type d'export, voyage, version du contenu) : le fichier
+    produit est enregistré sous MEDIA_ROOT (voir nautical.exports) et servi
+    tel quel tant que le voyage ne change pas.
+
+    Livre relié de plusieurs voyages (type 'book') : pas de voyage, la
+    sélection et le titre sont dans `params`, la version résume celles des
+    voyages sélectionnés.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échec'),
+    ]
+    kind = models.CharField(max_length=30, verbose_name="Type d'export")
+    voyage = models.ForeignKey(VoyageLogNew, on_delete=models.CASCADE, null=True, blank=True, related_name='pdf_jobs')
+    version = models.PositiveBigIntegerField(verbose_name="Version du contenu")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Paramètres")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Statut")
+    file = models.CharField(max_length=255, blank=True, verbose_name="Fichier (relatif à MEDIA_ROOT)")
+    error = models.TextField(blank=True, verbose_name="Erreur")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Tentatives")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Export PDF"
+        verbose_name_plural = "Exports PDF"
+        ordering = ['created_at']
+        unique_together = ('kind', 'voyage', 'version')
+        constraints = [
+            # NULL n'étant jamais égal à NULL, unique_together ne couvre pas les livres
+            models.UniqueConstraint(
+                fields=['kind', 'version'], condition=models.Q(voyage__isnull=True),
+                name='unique_pdfjob_book_version',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        target = f"voyage {self.voyage_id}" if self.voyage_id else self.params.get('title', '')
+        return f"{self.kind} - {target} v{self.version} ({self.status})"
+
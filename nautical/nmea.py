@@ -0,0 +1,240 @@
+"""
+Décodage des phrases NMEA 0183 (GPS / centrale de navigation).
+
+Chaque `parse_xxx(fields)` reçoit les champs d'une phrase déjà découpée par
+`split_sentence` et retourne un dict, ou None si la phrase est invalide ou
+sans fix. `PARSERS` associe chaque type de phrase géré à son décodeur.
+"""
+from datetime import datetime, date, time, timedelta, timezone as dt_timezone
+
+
+def checksum_ok(sentence):
+    """Vérifie la somme de contrôle `*hh` (les phrases sans somme sont acceptées)."""
+    body, sep, checksum = sentence.partition('*')
+    if not sep:
+        return True
+    value = 0
+    for char in body.lstrip('$!'):
+        value ^= ord(char)
+    try:
+        return value == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+def split_sentence(line):
+    """Retourne (type, champs) pour une ligne NMEA, ex. ('RMC', [...]), ou None.
+
+    Le type est débarrassé de l'identifiant d'émetteur (GP, GN, II, WI...).
+    """
+    line = line.strip()
+    start = line.find('$')
+    if start < 0:
+        return None
+    line = line[start:]
+    if not checksum_ok(line):
+        return None
+    fields = line.split('*', 1)[0].split(',')
+    address = fields[0][1:]
+    if len(address) < 5:
+        return None
+    return address[-3:], fields[1:]
+
+
+def parse_latlon(value, hemisphere):
+    """Convertit 'ddmm.mmmm' + hémisphère (N/S/E/W) en degrés décimaux signés."""
+    if not value or not hemisphere:
+        return None
+    try:
+        dot = value.index('.') if '.' in value else len(value)
+        degrees = float(value[:dot - 2])
+        minutes = float(value[dot - 2:])
+    except ValueError:
+        return None
+    result = degrees + minutes / 60.0
+    if hemisphere in ('S', 'W'):
+        result = -result
+    return result
+
+
+def parse_time(value):
+    """Convertit 'hhmmss(.ss)' en `datetime.time`."""
+    if not value or len(value) < 6:
+        return None
+    try:
+        seconds = float(value[4:])
+        return time(int(value[:2]), int(value[2:4]), int(seconds), int(round((seconds % 1) * 1e6)) % 1000000)
+    except ValueError:
+        return None
+
+
+def parse_date(value):
+    """Convertit 'ddmmyy' en `datetime.date`."""
+    if not value or len(value) != 6:
+        return None
+    try:
+        return date(2000 + int(value[4:6]), int(value[2:4]), int(value[:2]))
+    except ValueError:
+        return None
+
+
+def _float(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def parse_rmc(fields):
+    """RMC : position, date/heure UTC, vitesse fond (kn) et route fond (°)."""
+    if len(fields) < 9 or fields[1] != 'A':
+        return None
+    fix_time = parse_time(fields[0])
+    fix_date = parse_date(fields[8])
+    latitude = parse_latlon(fields[2], fields[3])
+    longitude = parse_latlon(fields[4], fields[5])
+    if fix_time is None or fix_date is None or latitude is None or longitude is None:
+        return None
+    return {
+        'timestamp': datetime.combine(fix_date, fix_time, tzinfo=dt_timezone.utc),
+        'latitude': latitude,
+        'longitude': longitude,
+        'sog_kn': _float(fields[6]),
+        'cog_deg': _float(fields[7]),
+    }
+
+
+def parse_gga(fields):
+    """GGA : position et heure UTC (sans date), qualité du fix."""
+    if len(fields) < 6 or fields[5] in ('', '0'):
+        return None
+    fix_time = parse_time(fields[0])
+    latitude = parse_latlon(fields[1], fields[2])
+    longitude = parse_latlon(fields[3], fields[4])
+    if fix_time is None or latitude is None or longitude is None:
+        return None
+    return {
+        'time': fix_time,
+        'latitude': latitude,
+        'longitude': longitude,
+        'satellites': int(fields[6]) if len(fields) > 6 and fields[6].isdigit() else None,
+    }
+
+
+def date_fix_time(reference, fix_time):
+    """Horodatage d'une heure UTC sans date (GGA), daté d'après `reference`
+    (horodatage complet le plus récent, celui d'une RMC).
+
+    Une heure antérieure de plus de 12 h à la référence est celle du jour
+    suivant : GGA de 00:00:05 après une RMC de 23:59:59. Un léger retard
+    (GGA émise juste avant la RMC de la même seconde) reste le même jour.
+    """
+    timestamp = reference.replace(
+        hour=fix_time.hour, minute=fix_time.minute, second=fix_time.second, microsecond=fix_time.microsecond,
+    )
+    if reference - timestamp > timedelta(hours=12):
+        timestamp += timedelta(days=1)
+    return timestamp
+
+
+# Conversion des unités de vitesse NMEA en nœuds
+_SPEED_TO_KN = {'N': 1.0, 'K': 1 / 1.852, 'M': 3600 / 1852}
+
+
+def parse_mwv(fields):
+    """MWV : vent apparent (R) ou réel (T), angle par rapport à l'étrave (°) et vitesse (kn)."""
+    if len(fields) < 5 or fields[4] != 'A' or fields[1] not in ('R', 'T'):
+        return None
+    angle = _float(fields[0])
+    speed = _float(fields[2])
+    factor = _SPEED_TO_KN.get(fields[3])
+    if angle is None or speed is None or factor is None:
+        return None
+    return {
+        'wind_reference': fields[1],
+        'wind_angle_deg': angle % 360,
+        'wind_speed_kn': speed * factor,
+    }
+
+
+def parse_dpt(fields):
+    """DPT : profondeur sous le transducteur (m), corrigée de l'offset positif
+    (distance transducteur - surface) ; un offset négatif (quille) est ignoré."""
+    if not fields:
+        return None
+    depth = _float(fields[0])
+    if depth is None:
+        return None
+    offset = _float(fields[1]) if len(fields) > 1 else None
+    if offset is not None and offset > 0:
+        depth += offset
+    return {'depth_m': depth}
+
+
+def parse_xdr(fields):
+    """XDR : capteurs génériques, par quadruplets (type, valeur, unité, nom).
+
+    Retient la pression atmosphérique (hPa) et la température de l'air (°C).
+    """
+    result = {}
+    for i in range(0, len(fields) - 2, 4):
+        kind, value, unit = fields[i], _float(fields[i + 1]), fields[i + 2]
+        if value is None:
+            continue
+        if kind == 'P' and unit == 'B':
+            result['pressure_hpa'] = value * 1000
+        elif kind == 'P' and unit == 'P':
+            result['pressure_hpa'] = value / 100
+        elif kind == 'C' and unit == 'C':
+            result['air_temp_c'] = value
+    return result or None
+
+
+def parse_vhw(fields):
+    """VHW : cap vrai/magnétique (°) et vitesse surface (kn)."""
+    if len(fields) < 6:
+        return None
+    result = {
+        'heading_true_deg': _float(fields[0]),
+        'heading_mag_deg': _float(fields[2]),
+        'stw_kn': _float(fields[4]),
+    }
+    if result['stw_kn'] is None and len(fields) > 6 and _float(fields[6]) is not None:
+        result['stw_kn'] = _float(fields[6]) * _SPEED_TO_KN['K']
+    result = {key: value for key, value in result.items() if value is not None}
+    return result or None
+
+
+def parse_vlw(fields):
+    """VLW : distance totale (loch) et journalière, en milles."""
+    if len(fields) < 3:
+        return None
+    total = _float(fields[0])
+    trip = _float(fields[2])
+    if total is None and trip is None:
+        return None
+    return {'log_total_nm': total, 'log_trip_nm': trip}
+
+
+PARSERS = {
+    'RMC': parse_rmc,
+    'GGA': parse_gga,
+    'MWV': parse_mwv,
+    'DPT': parse_dpt,
+    'XDR': parse_xdr,
+    'VHW': parse_vhw,
+    'VLW': parse_vlw,
+}
+
+
+def parse_sentence(line):
+    """Retourne (type, valeurs décodées) pour une ligne d'un type géré, sinon None."""
+    parsed = split_sentence(line)
+    if parsed is None:
+        return None
+    kind, fields = parsed
+    parser = PARSERS.get(kind)
+    if parser is None:
+        return None
+    values = parser(fields)
+    return (kind, values) if values else None
@@ -0,0 +1,294 @@
+"""
+Moteur de rendu PDF commun aux exports (chronologie, consommables, livre de bord).
+
+Ce qui est coûteux à construire et identique d'une requête à l'autre est
+créé une fois par processus : dessin du logo (svg2rlg analyse le fichier SVG
+à chaque appel), feuille de styles, styles de tableaux. Ces objets sont
+partagés entre les requêtes : ne jamais les modifier, en dériver
+(`ParagraphStyle(parent=...)`, `TableStyle(cmds, parent=...)`).
+
+`TabularReport` décrit un rapport tabulaire (titre daté, logo, colonnes) :
+une sous-classe déclare ses colonnes, `response(objets)` produit le PDF.
+
+Les documents longs (livre de bord complet) passent à `doc.build` un
+`FlowableStream` plutôt qu'une liste : les flowables sont produits au fur et
+à mesure de la mise en page, la mémoire ne dépend pas de la longueur du
+document.
+"""
+from collections import namedtuple
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from reportlab.graphics import renderPDF
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Flowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from svglib.svglib import svg2rlg
+
+LOGO_PATH = settings.BASE_DIR / 'static' / 'img' / 'logo_bateau_manta.svg'
+LOGO_WIDTH = 120  # points, ~42 mm
+
+
+# --- Logo -------------------------------------------------------------------
+
+@lru_cache(maxsize=8)
+def _parse_svg(path, mtime_ns):
+    # mtime dans la clé : un logo remplacé sur disque est relu
+    return svg2rlg(path)
+
+
+def logo_drawing(path=None):
+    """Dessin du logo, analysé une fois par processus, ou None si le fichier est absent."""
+    path = Path(path or LOGO_PATH)
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    return _parse_svg(str(path), mtime_ns)
+
+
+class DrawingFlowable(Flowable):
+    """Dessin ramené à la largeur `width`, sans modifier le dessin partagé."""
+
+    def __init__(self, drawing, width):
+        super().__init__()
+        self.drawing = drawing
+        self.scale = width / float(drawing.width or 1)
+        self.width = width
+        self.height = drawing.height * self.scale
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.scale(self.scale, self.scale)
+        renderPDF.draw(self.drawing, self.canv, 0, 0)
+
+
+def logo_flowable(width=LOGO_WIDTH):
+    drawing = logo_drawing()
+    return DrawingFlowable(drawing, width) if drawing is not None else None
+
+
+# --- Styles -----------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def stylesheet():
+    """Feuille de styles de tous les exports (styles ReportLab + styles maison)."""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='Small', fontSize=9, leading=11))
+    styles.add(ParagraphStyle(
+        'VoyageTitle', parent=styles['Heading1'], fontSize=14, spaceAfter=6, textColor=colors.darkblue, alignment=1,
+    ))
+    styles.add(ParagraphStyle(
+        'VoyageSubtitle', parent=styles['Heading2'], fontSize=10, spaceAfter=3, textColor=colors.black, alignment=0,
+    ))
+    styles.add(ParagraphStyle('VoyageNormal', parent=styles['Normal'], fontSize=8, spaceAfter=1))
+    styles.add(ParagraphStyle('Note', parent=styles['Normal'], fontSize=7, textColor=colors.grey))
+    styles.add(ParagraphStyle('SmallNote', parent=styles['Normal'], fontSize=6, textColor=colors.grey))
+    styles.add(ParagraphStyle('NotesTitle', parent=styles['Normal'], fontSize=7, textColor=colors.black))
+    styles.add(ParagraphStyle('Footer', parent=styles['Normal'], fontSize=6, alignment=1, textColor=colors.grey))
+    styles.add(ParagraphStyle('TableCell', parent=styles['Normal'], fontSize=6, leading=7))
+    return styles
+
+
+# Tableaux des rapports (chronologie, consommables) : en-tête bleu clair, grille fine
+REPORT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f3f6')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#0a2342')),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#cfd8e3')),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+
+# Fiche d'informations (libellés en première colonne)
+INFO_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+])
+
+
+@lru_cache(maxsize=None)
+def report_table_style(alignments=()):
+    """REPORT_TABLE_STYLE complété d'alignements de colonnes ((colonne, 'RIGHT'), ...)."""
+    if not alignments:
+        return REPORT_TABLE_STYLE
+    return TableStyle(
+        [('ALIGN', (column, 1), (column, -1), align) for column, align in alignments], parent=REPORT_TABLE_STYLE,
+    )
+
+
+@lru_cache(maxsize=None)
+def grid_table_style(font_size, header_background):
+    """Tableau à grille grise du livre de bord, en-tête coloré."""
+    return TableStyle([
+        ('FONTSIZE', (0, 0), (-1, -1), font_size),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('BACKGROUND', (0, 0), (-1, 0), header_background),
+    ])
+
+
+def clear_caches():
+    """Vide les caches du module (benchmarks, logo remplacé sans changer de mtime)."""
+    _parse_svg.cache_clear()
+    stylesheet.cache_clear()
+    report_table_style.cache_clear()
+    grid_table_style.cache_clear()
+
+
+# --- Documents longs --------------------------------------------------------
+
+class FlowableStream(list):
+    """Story alimentée par un itérateur de flowables.
+
+    `doc.build` consomme sa story par le début (`len`, `[0]`, `del [0]`,
+    réinsertion des restes d'un flowable coupé) : la liste est complétée à
+    `buffer` éléments à chaque `len()`, le reste de l'itérateur n'est jamais
+    matérialisé.
+    """
+
+    def __init__(self, flowables, buffer=16):
+        super().__init__()
+        self._source = iter(flowables)
+        self._buffer = buffer
+
+    def __len__(self):
+        if self._source is not None:
+            while super().__len__() < self._buffer:
+                flowable = next(self._source, None)
+                if flowable is None:
+                    self._source = None
+                    break
+                self.append(flowable)
+        return super().__len__()
+
+
+class CompactCanvas(canvas.Canvas):
+    """Canvas qui compresse le contenu de chaque page dès qu'elle est
+    terminée : ReportLab garde toutes les pages en mémoire jusqu'à save()
+    et ne les compresse qu'à ce moment-là (~5 fois plus de mémoire)."""
+
+    def showPage(self):
+        super().showPage()
+        page = self._doc.Pages.pages[-1]
+        if page.stream and page.Contents is None:
+            contents = pdfdoc.PDFStream(content=pdfdoc.PDFZCompress.encode(page.stream))
+            # filtre déjà appliqué : format() ne le réapplique pas
+            contents.dictionary['Filter'] = pdfdoc.PDFArray([pdfdoc.PDFName(pdfdoc.PDFZCompress.pdfname)])
+            page.Contents = contents
+            page.stream = None
+
+
+def chunked_tables(header, rows, col_widths, style, rows_per_table):
+    """Tableaux successifs de `rows_per_table` lignes (en-tête répété),
+    construits à la demande à partir de l'itérateur `rows`."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == rows_per_table:
+            yield _chunk_table(header, chunk, col_widths, style)
+            chunk = []
+    if chunk:
+        yield _chunk_table(header, chunk, col_widths, style)
+
+
+def _chunk_table(header, chunk, col_widths, style):
+    table = Table([header, *chunk], colWidths=col_widths, repeatRows=1)
+    table.setStyle(style)
+    return table
+
+
+# --- Pagination -------------------------------------------------------------
+
+class NumberedCanvas(canvas.Canvas):
+    """Canvas qui écrit « Page n/total » en pied de page : les pages sont
+    mises de côté jusqu'à save(), quand le total est connu."""
+    page_number_margin = 15 * mm
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._saved_page_states = []
+
+    def showPage(self):
+        self._saved_page_states.append(dict(self.__dict__))
+        self._startPage()
+
+    def save(self):
+        total_pages = len(self._saved_page_states) or 1
+        for state in self._saved_page_states:
+            self.__dict__.update(state)
+            self._draw_page_number(total_pages)
+            super().showPage()
+        super().save()
+
+    def _draw_page_number(self, total):
+        self.setFont("Helvetica", 9)
+        width, _ = self._pagesize
+        self.drawRightString(width - self.page_number_margin, 10 * mm, f"Page {self._pageNumber}/{total}")
+
+
+# --- Rapports tabulaires ----------------------------------------------------
+
+# `value` : fonction objet -> texte de la cellule
+Column = namedtuple('Column', ['title', 'width', 'value', 'align'], defaults=['LEFT'])
+
+
+class TabularReport:
+    """Rapport PDF d'un tableau (une ligne par objet), titre daté, logo
+    optionnel et pagination « Page n/total ».
+
+    Les sous-classes déclarent `title`, `filename` et `columns` (Column)."""
+    title = ''
+    filename = 'export.pdf'
+    columns = ()
+    logo = False
+    pagesize = A4
+    margins = {'leftMargin': 15 * mm, 'rightMargin': 15 * mm, 'topMargin': 20 * mm, 'bottomMargin': 15 * mm}
+
+    def heading(self):
+        return f"<b>{self.title}</b> — {timezone.localdate().strftime('%d/%m/%Y')}"
+
+    def table_style(self):
+        return report_table_style(tuple(
+            (i, column.align) for i, column in enumerate(self.columns) if column.align != 'LEFT'
+        ))
+
+    def story(self, objects):
+        styles = stylesheet()
+        story = []
+        if self.logo:
+            logo = logo_flowable()
+            if logo is not None:
+                story += [logo, Spacer(1, 6)]
+        story += [Paragraph(self.heading(), styles['Heading2']), Spacer(1, 8)]
+        data = [[column.title for column in self.columns]]
+        data += [[column.value(obj) for column in self.columns] for obj in objects]
+        table = Table(data, colWidths=[column.width for column in self.columns], repeatRows=1)
+        table.setStyle(self.table_style())
+        story.append(table)
+        return story
+
+    def render(self, objects):
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=self.pagesize, **self.margins)
+        doc.build(self.story(objects), canvasmaker=NumberedCanvas)
+        return buffer.getvalue()
+
+    def response(self, objects):
+        response = HttpResponse(self.render(objects), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}"'
+        return response
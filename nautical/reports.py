@@ -0,0 +1,358 @@
+"""
+Rapports PDF des livres de bord, écrits dans un fichier.
+
+Ils sont construits hors requête par le worker des exports (voir
+nautical.exports et `manage.py run_worker`) : `output` est un chemin ou un
+fichier ouvert en écriture binaire.
+
+- `voyage_summary` : résumé sur une page (28 entrées, 8 bulletins au plus) ;
+- `voyage_complete` : toutes les entrées, sur autant de pages que
+  nécessaire. Les entrées sont lues par lots (`.iterator()`) et mises en
+  tableaux de ROWS_PER_TABLE lignes à mesure que ReportLab pagine
+  (pdf.FlowableStream), et chaque page est compressée dès qu'elle est
+  terminée (pdf.CompactCanvas) : seules les pages déjà compressées (~3 Ko)
+  s'accumulent jusqu'à l'écriture du fichier.
+"""
+from functools import partial
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+from . import pdf
+from .models_new import VoyageLogNew
+
+# Entrées lues par requête (itérateur de curseur)
+ENTRY_CHUNK_SIZE = 500
+# Lignes par tableau du livre complet : environ une page
+ROWS_PER_TABLE = 40
+
+LOG_HEADER = ['Date', 'Heure', 'Position', 'Log', 'Cap', 'Observations']
+LOG_COL_WIDTHS = [18*mm, 18*mm, 50*mm, 15*mm, 15*mm, 60*mm]
+WEATHER_HEADER = ['Date/Heure', 'Bulletin', 'Vent (jour)', 'Mer (jour)', 'Visibilité (jour)']
+WEATHER_COL_WIDTHS = [35*mm, 35*mm, 30*mm, 30*mm, 30*mm]
+
+
+def voyage_summary(voyage_id, output):
+    """Livre de bord d'un voyage sur une seule page : informations, équipage,
+    premières entrées de log, météo et incidents."""
+    voyage = (
+        VoyageLogNew.objects.select_related('stats')
+        .prefetch_related('conditions_meteo', 'equipage', 'incidents')
+        .get(pk=voyage_id)
+    )
+    
+    # Créer le document PDF en format A4
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        rightMargin=10*mm,
+        leftMargin=10*mm,
+        topMargin=10*mm,
+        bottomMargin=10*mm
+    )
+    
+    # Styles partagés (nautical.pdf)
+    styles = pdf.stylesheet()
+    subtitle_style = styles['VoyageSubtitle']
+    normal_style = styles['VoyageNormal']
+    
+    # Contenu du PDF : titre, fiche du voyage et équipage
+    stats = voyage.statistics
+    story = voyage_header(voyage, styles)
+    
+    # Entrées de log (résumé compact)
+    story.append(Paragraph("📋 ENTRÉES DE LOG", subtitle_style))
+    log_data = [LOG_HEADER]
+    entries_qs = voyage.entries.all().order_by('timestamp', 'id')
+    max_log_rows = 28
+    total_logs = stats.entries_count
+    # Gestion des notes détaillées pour événements longs
+    footnotes = []
+    footnote_index = 1
+    for entry in entries_qs[:max_log_rows]:
+        observations = []
+        truncated_ev = False
+        # Événements prioritaires dans la colonne Observations
+        if entry.evenements:
+            ev_full = (entry.evenements or '').strip().replace('\n', ' ')
+            ev_display = ev_full
+            if len(ev_full) > 90:
+                ev_display = ev_full[:87] + '...'
+                truncated_ev = True
+            # Ajouter marque de note si tronqué
+            if truncated_ev:
+                observations.append(f"{ev_display} [{footnote_index}]")
+                # Ajouter la note détaillée avec ancrage date/heure
+                footnotes.append(f"[{footnote_index}] {entry.date.strftime('%d/%m')} {entry.heure.strftime('%H:%M')} — {ev_full}")
+                footnote_index += 1
+            else:
+                observations.append(ev_display)
+        observations += entry_details(entry)
+
+        # Afficher plus de détails si pas de note (jusqu'à 3 éléments)
+        obs_limit = 2 if truncated_ev else 3
+        log_data.append([
+            entry.date.strftime('%d/%m'),
+            entry.heure.strftime('%H:%M'),
+            entry.position[:30] + '...' if entry.position and len(entry.position) > 30 else (entry.position or '-'),
+            f"{entry.log_nautique:.1f}" if entry.log_nautique else '-',
+            f"{entry.cap_compas}°" if entry.cap_compas else '-',
+            ' | '.join(observations[:obs_limit])  # Jusqu'à 3 sans note, 2 si note
+        ])
+    
+    if len(log_data) > 1:
+        log_table = Table(log_data, colWidths=LOG_COL_WIDTHS)
+        log_table.setStyle(pdf.grid_table_style(6, colors.lightgreen))
+        story.append(log_table)
+        if total_logs > (len(log_data) - 1):
+            extra_logs = total_logs - (len(log_data) - 1)
+            story.append(Paragraph(f"… (+{extra_logs} entrées supplémentaires)", styles['Note']))
+        # Ajouter section notes si nécessaire (limiter pour rester sur 1 page)
+        if footnotes:
+            story.append(Spacer(1, 2*mm))
+            story.append(Paragraph("Notes détaillées", styles['NotesTitle']))
+            max_notes = 5
+            for note in footnotes[:max_notes]:
+                story.append(Paragraph(note, styles['SmallNote']))
+            if len(footnotes) > max_notes:
+                story.append(Paragraph(f"… (+{len(footnotes) - max_notes} notes supplémentaires)", styles['SmallNote']))
+    else:
+        story.append(Paragraph("Aucune entrée de log enregistrée", normal_style))
+    story.append(Spacer(1, 3*mm))
+    
+    # Résumé météo (situation générale si disponible)
+    try:
+        first_summary = next((w.situation_generale for w in voyage.conditions_meteo.all() if w.situation_generale), None)
+        if first_summary:
+            story.append(Paragraph("🛈 Résumé météo", subtitle_style))
+            story.append(Paragraph(first_summary, normal_style))
+            story.append(Spacer(1, 2*mm))
+    except Exception:
+        pass
+
+    # Conditions météorologiques
+    story.append(Paragraph("🌤️ CONDITIONS MÉTÉO", subtitle_style))
+    weather_data = [WEATHER_HEADER]
+    wc_qs = voyage.conditions_meteo.all().order_by('datetime')
+    max_wc_rows = 8
+    total_wc = stats.weather_count
+    for weather in wc_qs[:max_wc_rows]:
+        weather_data.append([
+            weather.datetime.strftime('%d/%m %H:%M'),
+            weather.type_bulletin or '-',
+            weather.prev_jour_vent or '-',
+            weather.prev_jour_mer or '-',
+            weather.prev_jour_visibilite or '-',
+        ])
+    
+    if len(weather_data) > 1:
+        weather_table = Table(weather_data, colWidths=WEATHER_COL_WIDTHS)
+        weather_table.setStyle(pdf.grid_table_style(7, colors.lightyellow))
+        story.append(weather_table)
+        if total_wc > (len(weather_data) - 1):
+            extra_wc = total_wc - (len(weather_data) - 1)
+            story.append(Paragraph(f"… (+{extra_wc} bulletins supplémentaires)", styles['Note']))
+    else:
+        story.append(Paragraph("Aucune condition météo enregistrée", normal_style))
+    story.append(Spacer(1, 3*mm))
+    
+    # Incidents (si existants)
+    incidents = voyage.incidents.all()
+    if incidents:
+        story.append(Paragraph("⚠️ INCIDENTS", subtitle_style))
+        for incident in incidents:
+            incident_text = f"<b>{incident.datetime.strftime('%d/%m %H:%M')}</b> - {incident.get_gravite_display()}: {incident.description[:100]}"
+            story.append(Paragraph(incident_text, normal_style))
+    
+    # Pied de page
+    story.append(Spacer(1, 5*mm))
+    footer_text = f"Document généré le {timezone.now().strftime('%d/%m/%Y à %H:%M')} - Livre de bord électronique"
+    story.append(Paragraph(footer_text, styles['Footer']))
+    
+    # Construire le PDF
+    doc.build(story)
+
+
+def voyage_complete(voyage_id, output, footer=True):
+    """Livre de bord complet : toutes les entrées de log, tous les bulletins
+    météo et incidents, sur autant de pages que nécessaire.
+
+    `footer=False` : pas de pied de page (livre relié, qui numérote ses
+    propres pages). Retourne le nombre de pages."""
+    voyage = (
+        VoyageLogNew.objects.select_related('stats')
+        .prefetch_related('equipage', 'incidents')
+        .get(pk=voyage_id)
+    )
+    doc = SimpleDocTemplate(
+        output, pagesize=A4, leftMargin=10*mm, rightMargin=10*mm, topMargin=10*mm, bottomMargin=15*mm,
+        title=f"Livre de bord - {voyage.bateau}",
+    )
+    on_page = partial(_page_footer, f"{voyage.bateau} — {voyage.sujet_voyage}") if footer else _no_footer
+    doc.build(
+        pdf.FlowableStream(_complete_story(voyage)), onFirstPage=on_page, onLaterPages=on_page,
+        canvasmaker=pdf.CompactCanvas,
+    )
+    return doc.page
+
+
+def _no_footer(canvas, doc):
+    pass
+
+
+def _page_footer(label, canvas, doc):
+    canvas.saveState()
+    canvas.setFont("Helvetica", 7)
+    canvas.setFillColor(colors.grey)
+    canvas.drawString(doc.leftMargin, 8*mm, label)
+    canvas.drawRightString(doc.pagesize[0] - doc.rightMargin, 8*mm, f"Page {doc.page}")
+    canvas.restoreState()
+
+
+def _complete_story(voyage):
+    """Flowables du livre complet, produits à la demande."""
+    styles = pdf.stylesheet()
+    stats = voyage.statistics
+    yield from voyage_header(voyage, styles)
+
+    yield Paragraph(f"📋 ENTRÉES DE LOG ({stats.entries_count})", styles['VoyageSubtitle'])
+    if stats.entries_count:
+        entries = voyage.entries.order_by('timestamp', 'id').iterator(chunk_size=ENTRY_CHUNK_SIZE)
+        yield from pdf.chunked_tables(
+            LOG_HEADER, (_complete_entry_row(entry, styles['TableCell']) for entry in entries),
+            LOG_COL_WIDTHS, pdf.grid_table_style(6, colors.lightgreen), ROWS_PER_TABLE,
+        )
+    else:
+        yield Paragraph("Aucune entrée de log enregistrée", styles['VoyageNormal'])
+    yield Spacer(1, 3*mm)
+
+    yield Paragraph(f"🌤️ CONDITIONS MÉTÉO ({stats.weather_count})", styles['VoyageSubtitle'])
+    if stats.weather_count:
+        bulletins = voyage.conditions_meteo.order_by('datetime').iterator(chunk_size=ENTRY_CHUNK_SIZE)
+        yield from pdf.chunked_tables(
+            WEATHER_HEADER, (_weather_row(weather) for weather in bulletins),
+            WEATHER_COL_WIDTHS, pdf.grid_table_style(7, colors.lightyellow), ROWS_PER_TABLE,
+        )
+    else:
+        yield Paragraph("Aucune condition météo enregistrée", styles['VoyageNormal'])
+    yield Spacer(1, 3*mm)
+
+    incidents = voyage.incidents.all()
+    if incidents:
+        yield Paragraph("⚠️ INCIDENTS", styles['VoyageSubtitle'])
+        for incident in incidents:
+            yield Paragraph(
+                f"<b>{incident.datetime.strftime('%d/%m/%Y %H:%M')}</b> - {incident.get_gravite_display()}: "
+                f"{escape(incident.description)}",
+                styles['VoyageNormal'],
+            )
+
+    yield Spacer(1, 5*mm)
+    yield Paragraph(
+        f"Document généré le {timezone.now().strftime('%d/%m/%Y à %H:%M')} - Livre de bord électronique",
+        styles['Footer'],
+    )
+
+
+def _complete_entry_row(entry, cell_style):
+    observations = [(entry.evenements or '').strip()] + entry_details(entry)
+    return [
+        entry.date.strftime('%d/%m/%y'),
+        entry.heure.strftime('%H:%M'),
+        Paragraph(escape(entry.position or '-'), cell_style),
+        f"{entry.log_nautique:.1f}" if entry.log_nautique else '-',
+        f"{entry.cap_compas}°" if entry.cap_compas else '-',
+        Paragraph(escape(' | '.join(o for o in observations if o)), cell_style),
+    ]
+
+
+def _weather_row(weather):
+    return [
+        weather.datetime.strftime('%d/%m/%y %H:%M'),
+        weather.type_bulletin or '-',
+        weather.prev_jour_vent or '-',
+        weather.prev_jour_mer or '-',
+        weather.prev_jour_visibilite or '-',
+    ]
+
+
+def voyage_header(voyage, styles):
+    """Titre, fiche du voyage et équipage (flowables)."""
+    header = []
+    
+    # Titre principal
+    header.append(Paragraph(f"📚 LIVRE DE BORD - {voyage.bateau}", styles['VoyageTitle']))
+    header.append(Spacer(1, 3*mm))
+    
+    # Informations du voyage
+    stats = voyage.statistics
+    voyage_info = [
+        ['Sujet du voyage:', voyage.sujet_voyage or 'Non spécifié'],
+        ['Dates:', f"{voyage.date_debut.strftime('%d/%m/%Y')} → {voyage.date_fin.strftime('%d/%m/%Y') if voyage.date_fin else 'En cours'}"],
+        ['Trajet:', f"{voyage.port_depart} → {voyage.port_arrivee or 'En cours'}"],
+        ['Statut:', voyage.get_statut_display()],
+    ]
+    distances = []
+    if stats.distance_gps_nm:
+        distances.append(f"{stats.distance_gps_nm} NM (GPS)")
+    if stats.distance_log_nm is not None:
+        distances.append(f"{stats.distance_log_nm} NM (loch)")
+    if distances:
+        voyage_info.append(['Distance:', ' / '.join(distances)])
+    conditions = []
+    if stats.vent_force_max is not None:
+        conditions.append(f"vent max force {stats.vent_force_max}")
+    if stats.barometre_min is not None:
+        conditions.append(f"baromètre {stats.barometre_min} – {stats.barometre_max} hPa")
+    if conditions:
+        voyage_info.append(['Conditions:', ', '.join(conditions)])
+    
+    voyage_table = Table(voyage_info, colWidths=[40*mm, 80*mm])
+    voyage_table.setStyle(pdf.INFO_TABLE_STYLE)
+    header.append(voyage_table)
+    header.append(Spacer(1, 3*mm))
+    
+    # Équipage
+    header.append(Paragraph("👥 ÉQUIPAGE", styles['VoyageSubtitle']))
+    crew_data = [['Nom', 'Rôle', 'Embarquement', 'Débarquement']]
+    for member in voyage.equipage.all():
+        crew_data.append([
+            f"{member.nom} {member.prenom}",
+            member.get_role_display(),
+            member.date_embarquement.strftime('%d/%m') if member.date_embarquement else '-',
+            member.date_debarquement.strftime('%d/%m') if member.date_debarquement else 'À bord'
+        ])
+    
+    if len(crew_data) > 1:
+        crew_table = Table(crew_data, colWidths=[40*mm, 30*mm, 25*mm, 25*mm])
+        crew_table.setStyle(pdf.grid_table_style(7, colors.lightblue))
+        header.append(crew_table)
+    else:
+        header.append(Paragraph("Aucun membre d'équipage enregistré", styles['VoyageNormal']))
+    header.append(Spacer(1, 3*mm))
+    return header
+
+
+def entry_details(entry):
+    """Compléments d'une entrée de log pour la colonne Observations."""
+    details = []
+    if entry.allure:
+        details.append(f"Allure: {entry.allure}")
+    if entry.voilure:
+        details.append(f"Voilure: {entry.voilure}")
+    # Ajouts compacts basés sur les champs existants
+    if entry.vent_force or entry.vent_direction:
+        vent_txt = f"{(entry.vent_force or '').strip()} {(entry.vent_direction or '').strip()}".strip()
+        if vent_txt:
+            details.append(f"Vent: {vent_txt}")
+    if entry.etat_mer:
+        details.append(f"Mer: {entry.etat_mer}")
+    if entry.visibilite:
+        details.append(f"Visi: {entry.visibilite}")
+    if entry.barometre:
+        details.append(f"Pression: {entry.barometre} hPa")
+    return details
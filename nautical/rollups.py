@@ -0,0 +1,235 @@
+"""
+Agrégats du tableau de bord : par voyage et par jour (VoyageDayRollup), pour
+toute la flotte par mois (MonthRollup), incidents par mois, type et gravité
+(IncidentRollup).
+
+Une écriture d'entrée de log ne touche que quelques journées : celle de
+l'entrée, celle de l'entrée précédente (dont la durée jusqu'à la suivante
+change) et celle de l'entrée positionnée suivante (dont le segment GPS
+change). Ces journées sont recalculées à partir de leurs seules entrées,
+puis les mois concernés à partir de leurs agrégats journaliers. Le tableau
+de bord ne lit que les agrégats mensuels : son coût suit le nombre de mois,
+pas le nombre d'entrées.
+
+Temps au moteur / à la voile : la durée d'une entrée court jusqu'à l'entrée
+suivante du voyage (comptée le jour de l'entrée) ; `allure` = 'moteur'
+compte au moteur, toute autre allure renseignée à la voile. Un intervalle de
+plus de MAX_LEG (bateau au mouillage, saisie interrompue) n'est pas compté.
+
+Les écritures en masse appellent `refresh_span` ou `rebuild_voyage` ;
+`manage.py rebuild_rollups` recalcule tout.
+"""
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import geo
+from .models_new import (
+    IncidentNew, IncidentRollup, LogEntryNew, MonthRollup, VoyageDayRollup, beaufort_from_text,
+)
+
+MAX_LEG = timedelta(hours=6)
+MOTOR_ALLURES = {'moteur'}
+
+_Row = namedtuple('_Row', ['timestamp', 'latitude', 'longitude', 'allure', 'vent_force'])
+
+IncidentKey = namedtuple('IncidentKey', ['voyage_id', 'month', 'type_incident', 'gravite'])
+
+
+def local_day(ts):
+    return timezone.localtime(ts).date()
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _positioned(queryset):
+    return queryset.filter(latitude__isnull=False, longitude__isnull=False)
+
+
+def _rows(queryset):
+    return (_Row(*values) for values in queryset.order_by('timestamp', 'id').values_list(*_Row._fields))
+
+
+# --- Calcul d'une journée ---------------------------------------------------
+
+def summarize_day(rows, previous_position, following):
+    """Agrégats d'une journée.
+
+    `rows` : entrées du jour triées (timestamp, id) ; `previous_position` :
+    (lat, lng) de la dernière entrée positionnée avant le jour, ou None ;
+    `following` : horodatage de la première entrée après le jour, ou None.
+    """
+    positions = [previous_position] if previous_position else []
+    positions += [(row.latitude, row.longitude) for row in rows if row.latitude is not None and row.longitude is not None]
+    distance_cents = 0
+    if len(positions) > 1:
+        lats, lngs = zip(*positions)
+        distance_cents = int(geo.round_cents(geo.segment_distances_nm(lats, lngs)).sum())
+
+    motor_seconds = sail_seconds = 0
+    ends = [row.timestamp for row in rows[1:]] + [following]
+    for row, end in zip(rows, ends):
+        allure = (row.allure or '').strip().lower()
+        if end is None or not allure or end - row.timestamp > MAX_LEG:
+            continue
+        seconds = (end - row.timestamp).total_seconds()
+        if allure in MOTOR_ALLURES:
+            motor_seconds += seconds
+        else:
+            sail_seconds += seconds
+
+    forces = [f for f in (beaufort_from_text(row.vent_force) for row in rows) if f is not None]
+    return {
+        'entries_count': len(rows),
+        'distance_nm': geo.from_cents(distance_cents),
+        'motor_minutes': int(round(motor_seconds / 60)),
+        'sail_minutes': int(round(sail_seconds / 60)),
+        'vent_force_max': max(forces) if forces else None,
+    }
+
+
+def compute_day(voyage_id, day):
+    """Agrégats d'un voyage pour un jour, ou None s'il n'a aucune entrée ce jour-là."""
+    entries = LogEntryNew.objects.filter(voyage_id=voyage_id)
+    start, end = _day_start(day), _day_start(day + timedelta(days=1))
+    rows = list(_rows(entries.filter(timestamp__gte=start, timestamp__lt=end)))
+    if not rows:
+        return None
+    previous_position = (
+        _positioned(entries.filter(timestamp__lt=start))
+        .order_by('-timestamp', '-id').values_list('latitude', 'longitude').first()
+    )
+    following = entries.filter(timestamp__gte=end).order_by('timestamp', 'id').values_list('timestamp', flat=True).first()
+    return summarize_day(rows, previous_position, following)
+
+
+# --- Mise à jour incrémentale -----------------------------------------------
+
+def refresh_days(voyage_id, days):
+    """Recalcule les agrégats de `days` pour un voyage, puis les mois concernés."""
+    days = sorted(set(days))
+    with transaction.atomic():
+        for day in days:
+            values = compute_day(voyage_id, day)
+            if values is None:
+                VoyageDayRollup.objects.filter(voyage_id=voyage_id, day=day).delete()
+            else:
+                VoyageDayRollup.objects.update_or_create(voyage_id=voyage_id, day=day, defaults=values)
+        refresh_months({month_of(day) for day in days})
+
+
+def refresh_months(months):
+    """Recalcule les agrégats mensuels à partir des agrégats journaliers."""
+    for month in sorted(set(months)):
+        days = VoyageDayRollup.objects.filter(day__gte=month, day__lt=next_month(month))
+        values = days.aggregate(
+            voyages_count=models.Count('voyage', distinct=True),
+            days_at_sea=models.Count('day', distinct=True),
+            entries_count=models.Sum('entries_count'),
+            distance_nm=models.Sum('distance_nm'),
+            motor_minutes=models.Sum('motor_minutes'),
+            sail_minutes=models.Sum('sail_minutes'),
+            vent_force_max=models.Max('vent_force_max'),
+        )
+        if not values['entries_count']:
+            MonthRollup.objects.filter(month=month).delete()
+            continue
+        MonthRollup.objects.update_or_create(month=month, defaults=values)
+
+
+def entry_days(snapshot):
+    """Journées dont les agrégats dépendent de l'entrée `snapshot` (EntrySnapshot) :
+    la sienne, celle de l'entrée précédente et celle de la positionnée suivante."""
+    if snapshot is None or snapshot.timestamp is None:
+        return set()
+    entries = LogEntryNew.objects.filter(voyage_id=snapshot.voyage_id).exclude(pk=snapshot.pk)
+    ts, pk = snapshot.timestamp, snapshot.pk
+    before = models.Q(timestamp__lt=ts) | models.Q(timestamp=ts, pk__lt=pk)
+    after = models.Q(timestamp__gt=ts) | models.Q(timestamp=ts, pk__gt=pk)
+    neighbours = [
+        entries.filter(before).order_by('-timestamp', '-id').values_list('timestamp', flat=True).first(),
+        _positioned(entries.filter(after)).order_by('timestamp', 'id').values_list('timestamp', flat=True).first(),
+    ]
+    return {local_day(ts)} | {local_day(n) for n in neighbours if n is not None}
+
+
+def apply_entry_change(old, new):
+    """Répercute une écriture d'entrée de log (EntrySnapshot avant/après, None
+    pour une création/suppression) sur les agrégats des journées touchées."""
+    for voyage_id in {s.voyage_id for s in (old, new) if s is not None}:
+        days = set()
+        for snapshot in (old, new):
+            if snapshot is not None and snapshot.voyage_id == voyage_id:
+                days |= entry_days(snapshot)
+        if days:
+            refresh_days(voyage_id, days)
+
+
+def refresh_span(voyage_id, start, end):
+    """Agrégats d'un voyage après l'ajout en masse d'entrées entre `start` et `end`."""
+    entries = LogEntryNew.objects.filter(voyage_id=voyage_id)
+    days = set(entries.filter(timestamp__gte=start, timestamp__lte=end).values_list('date', flat=True).distinct())
+    previous = entries.filter(timestamp__lt=start).order_by('-timestamp', '-id').values_list('timestamp', flat=True).first()
+    following = _positioned(entries.filter(timestamp__gt=end)).order_by('timestamp', 'id').values_list('timestamp', flat=True).first()
+    days |= {local_day(ts) for ts in (start, end, previous, following) if ts is not None}
+    refresh_days(voyage_id, days)
+
+
+def incident_key(incident):
+    return IncidentKey(
+        incident.voyage_id, month_of(local_day(incident.datetime)), incident.type_incident, incident.gravite,
+    )
+
+
+def bump_incident(key, delta):
+    """Ajuste le nombre d'incidents d'une clé (IncidentKey) avec F()."""
+    with transaction.atomic():
+        rollup, _ = IncidentRollup.objects.get_or_create(**key._asdict())
+        IncidentRollup.objects.filter(pk=rollup.pk).update(count=models.F('count') + delta)
+        IncidentRollup.objects.filter(pk=rollup.pk, count__lte=0).delete()
+
+
+# --- Recalcul complet -------------------------------------------------------
+
+def rebuild_voyage(voyage_id):
+    """Recalcule tous les agrégats d'un voyage en un seul parcours de ses entrées."""
+    by_day = {}
+    for row in _rows(LogEntryNew.objects.filter(voyage_id=voyage_id)):
+        by_day.setdefault(local_day(row.timestamp), []).append(row)
+    days = sorted(by_day)
+    rollups = []
+    previous_position = None
+    for i, day in enumerate(days):
+        rows = by_day[day]
+        following = by_day[days[i + 1]][0].timestamp if i + 1 < len(days) else None
+        rollups.append(VoyageDayRollup(voyage_id=voyage_id, day=day, **summarize_day(rows, previous_position, following)))
+        positioned = [(row.latitude, row.longitude) for row in rows if row.latitude is not None and row.longitude is not None]
+        if positioned:
+            previous_position = positioned[-1]
+
+    incidents = {}
+    for incident in IncidentNew.objects.filter(voyage_id=voyage_id).only('voyage_id', 'datetime', 'type_incident', 'gravite'):
+        key = incident_key(incident)
+        incidents[key] = incidents.get(key, 0) + 1
+
+    with transaction.atomic():
+        previous_days = set(VoyageDayRollup.objects.filter(voyage_id=voyage_id).values_list('day', flat=True))
+        VoyageDayRollup.objects.filter(voyage_id=voyage_id).delete()
+        VoyageDayRollup.objects.bulk_create(rollups, batch_size=500)
+        IncidentRollup.objects.filter(voyage_id=voyage_id).delete()
+        IncidentRollup.objects.bulk_create([IncidentRollup(count=count, **key._asdict()) for key, count in incidents.items()])
+        refresh_months({month_of(day) for day in previous_days.union(days)})
+    return rollups
+
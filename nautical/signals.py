@@ -0,0 +1,260 @@
+"""
+Signaux du module nautical : maintien des données dérivées (caches de
+traces, statistiques de voyage, ...) à chaque écriture.
+
+Les écritures en masse (`bulk_create`, `bulk_update`) ne déclenchent pas
+ces signaux : les chemins d'écriture en masse des entrées de log appellent
+`after_bulk_entries`.
+"""
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import caching, counters, exports, rollups, tracks
+from .db_functions import register_sqlite_functions
+from .models import CrewMember, LogbookEntry, MaintenanceRecord
+from .models_new import (
+    CrewMemberNew, IncidentNew, LogEntryChange, LogEntryNew, VoyageLogNew, VoyagePhoto, VoyageStats,
+    WeatherConditionNew, entry_snapshot,
+)
+
+
+def _voyage_being_deleted(origin):
+    """True si la suppression en cascade part du livre de bord lui-même :
+    ses statistiques disparaissent avec lui, inutile de les ajuster."""
+    if isinstance(origin, QuerySet):
+        return origin.model is VoyageLogNew
+    return isinstance(origin, VoyageLogNew)
+
+
+@receiver(connection_created)
+def register_geo_functions(sender, connection, **kwargs):
+    register_sqlite_functions(connection)
+
+
+# VoyageEvent : la trace est invalidée par VoyageEvent.save()/delete()/bulk_add(),
+# qui savent quels voyages sont touchés (y compris l'ancien voyage d'un événement déplacé).
+
+
+@receiver(post_save, sender=VoyageLogNew)
+def create_voyage_stats(sender, instance, created, **kwargs):
+    if created:
+        VoyageStats.objects.get_or_create(voyage=instance)
+
+
+# --- Entrées de log : données dérivées -------------------------------------
+# Journal des modifications (flux live, synchronisation), statistiques du
+# voyage, agrégats du tableau de bord, compteur global, trace en cache et
+# versions de cache. Une entrée enregistrée passe par `entry_saved` /
+# `entry_deleted`, une écriture en masse par `after_bulk_entries` : une
+# nouvelle donnée dérivée des entrées s'ajoute à ces trois fonctions.
+
+@receiver(pre_save, sender=LogEntryNew)
+def remember_entry_before_save(sender, instance, **kwargs):
+    old = None
+    if instance.pk:
+        old = LogEntryNew.objects.filter(pk=instance.pk).first()
+    instance._snapshot_before_save = entry_snapshot(old) if old else None
+
+
+@receiver(post_save, sender=LogEntryNew)
+def entry_saved(sender, instance, created, **kwargs):
+    old = getattr(instance, '_snapshot_before_save', None)
+    new = entry_snapshot(instance)
+    if old is not None and old.voyage_id != new.voyage_id:
+        # entrée déplacée : elle disparaît de l'ancien voyage
+        LogEntryChange.record(old.voyage_id, [instance.pk], 'delete')
+    LogEntryChange.record(new.voyage_id, [instance.pk])
+    VoyageStats.apply_entry_change(old, new)
+    rollups.apply_entry_change(old, new)
+    if created:
+        counters.increment(counters.COUNTER_NAMES[LogEntryNew], 1)
+    _entries_written({snapshot.voyage_id for snapshot in (old, new) if snapshot is not None})
+
+
+@receiver(post_delete, sender=LogEntryNew)
+def entry_deleted(sender, instance, origin=None, **kwargs):
+    old = entry_snapshot(instance)
+    if not _voyage_being_deleted(origin):
+        LogEntryChange.record(old.voyage_id, [instance.pk], 'delete')
+        VoyageStats.apply_entry_change(old, None)
+        rollups.apply_entry_change(old, None)
+    counters.increment(counters.COUNTER_NAMES[LogEntryNew], -1)
+    _entries_written({old.voyage_id})
+
+
+# Taille des lots du journal des modifications (clause IN de la suppression)
+CHANGE_BATCH_SIZE = 500
+
+
+def after_bulk_entries(voyage_id, ids, span=None):
+    """Données dérivées d'un voyage après une écriture en masse de ses
+    entrées de log (`bulk_create`, `bulk_update` : pas de signaux).
+
+    `ids` : entrées écrites. `span` : (premier, dernier) horodatage des
+    entrées créées, mises à jour de façon incrémentale
+    (VoyageStats.apply_bulk_insert, rollups.refresh_span) ; None pour des
+    entrées modifiées : statistiques et agrégats du voyage recalculés.
+    """
+    ids = list(ids)
+    for i in range(0, len(ids), CHANGE_BATCH_SIZE):
+        LogEntryChange.record(voyage_id, ids[i:i + CHANGE_BATCH_SIZE])
+    if span is not None:
+        VoyageStats.apply_bulk_insert(voyage_id, ids, *span)
+        rollups.refresh_span(voyage_id, *span)
+        counters.increment(counters.COUNTER_NAMES[LogEntryNew], len(ids))
+    else:
+        VoyageStats.rebuild(voyage_id)
+        rollups.rebuild_voyage(voyage_id)
+    _entries_written({voyage_id})
+
+
+def _entries_written(voyage_ids):
+    for voyage_id in voyage_ids:
+        # effacée après validation : voir tracks.invalidate_track
+        tracks.invalidate_track('log', voyage_id)
+        caching.bump_voyage(voyage_id)
+
+
+# --- Compteurs d'objets rattachés (incidents, météo, équipage, photos) -----
+# Tenus à jour avec F() : ni COUNT() à l'affichage, ni perte de mise à jour
+# entre deux écritures concurrentes.
+
+COUNTERS = {
+    IncidentNew: 'incidents_count',
+    WeatherConditionNew: 'weather_count',
+    CrewMemberNew: 'crew_count',
+    VoyagePhoto: 'photos_count',
+}
+
+
+def _counted_voyage(instance):
+    """Voyage dont l'objet incrémente le compteur, ou None (photo d'en-tête)."""
+    if isinstance(instance, VoyagePhoto) and instance.type_photo != 'gallery':
+        return None
+    return instance.voyage_id
+
+
+@receiver(pre_save, sender=IncidentNew)
+@receiver(pre_save, sender=WeatherConditionNew)
+@receiver(pre_save, sender=CrewMemberNew)
+@receiver(pre_save, sender=VoyagePhoto)
+def remember_counted_voyage(sender, instance, **kwargs):
+    old = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._counted_voyage_before_save = _counted_voyage(old) if old else None
+    instance._voyage_before_save = old.voyage_id if old else None
+
+
+@receiver(post_save, sender=IncidentNew)
+@receiver(post_save, sender=WeatherConditionNew)
+@receiver(post_save, sender=CrewMemberNew)
+@receiver(post_save, sender=VoyagePhoto)
+def update_counter_on_save(sender, instance, **kwargs):
+    field = COUNTERS[sender]
+    old_voyage_id = getattr(instance, '_counted_voyage_before_save', None)
+    new_voyage_id = _counted_voyage(instance)
+    if old_voyage_id != new_voyage_id:
+        if old_voyage_id is not None:
+            VoyageStats.bump(old_voyage_id, field, -1)
+        if new_voyage_id is not None:
+            VoyageStats.bump(new_voyage_id, field, 1)
+
+
+@receiver(post_delete, sender=IncidentNew)
+@receiver(post_delete, sender=WeatherConditionNew)
+@receiver(post_delete, sender=CrewMemberNew)
+@receiver(post_delete, sender=VoyagePhoto)
+def update_counter_on_delete(sender, instance, origin=None, **kwargs):
+    voyage_id = _counted_voyage(instance)
+    if voyage_id is not None and not _voyage_being_deleted(origin):
+        VoyageStats.bump(voyage_id, COUNTERS[sender], -1)
+
+
+# --- Agrégats du tableau de bord (nautical.rollups) ------------------------
+
+@receiver(pre_delete, sender=VoyageLogNew)
+def remember_rollup_months(sender, instance, **kwargs):
+    # les agrégats journaliers disparaissent en cascade avec le voyage
+    instance._rollup_months = {
+        rollups.month_of(day) for day in instance.day_rollups.values_list('day', flat=True)
+    }
+
+
+@receiver(post_delete, sender=VoyageLogNew)
+def refresh_rollup_months(sender, instance, **kwargs):
+    rollups.refresh_months(getattr(instance, '_rollup_months', ()))
+
+
+@receiver(pre_save, sender=IncidentNew)
+def remember_incident_key(sender, instance, **kwargs):
+    old = IncidentNew.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._incident_key_before_save = rollups.incident_key(old) if old else None
+
+
+@receiver(post_save, sender=IncidentNew)
+def update_incident_rollup_on_save(sender, instance, **kwargs):
+    old_key = getattr(instance, '_incident_key_before_save', None)
+    new_key = rollups.incident_key(instance)
+    if old_key != new_key:
+        if old_key is not None:
+            rollups.bump_incident(old_key, -1)
+        rollups.bump_incident(new_key, 1)
+
+
+@receiver(post_delete, sender=IncidentNew)
+def update_incident_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    if not _voyage_being_deleted(origin):
+        rollups.bump_incident(rollups.incident_key(instance), -1)
+
+
+
+# --- Versions de cache (nautical.caching) ---------------------------------
+
+@receiver([post_save, post_delete], sender=VoyageLogNew)
+def bump_voyage_cache_version(sender, instance, **kwargs):
+    caching.bump_voyage(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=IncidentNew)
+@receiver([post_save, post_delete], sender=WeatherConditionNew)
+@receiver([post_save, post_delete], sender=CrewMemberNew)
+@receiver([post_save, post_delete], sender=VoyagePhoto)
+def bump_child_cache_version(sender, instance, **kwargs):
+    # entrées de log : voir _entries_written
+    old_voyage_id = getattr(instance, '_voyage_before_save', None)
+    if old_voyage_id is not None and old_voyage_id != instance.voyage_id:
+        caching.bump_voyage(old_voyage_id)
+    caching.bump_voyage(instance.voyage_id)
+
+
+# --- Exports PDF (nautical.exports) ----------------------------------------
+
+@receiver(post_delete, sender=VoyageLogNew)
+def delete_pdf_artifacts(sender, instance, **kwargs):
+    # après validation : une suppression annulée garde ses fichiers
+    voyage_id = instance.pk
+    transaction.on_commit(lambda: exports.delete_artifacts(voyage_id))
+
+
+# --- Compteurs globaux (nautical.counters) ---------------------------------
+# entrées de log : voir entry_saved / entry_deleted
+
+@receiver(post_save, sender=LogbookEntry)
+@receiver(post_save, sender=CrewMember)
+@receiver(post_save, sender=MaintenanceRecord)
+@receiver(post_save, sender=VoyageLogNew)
+@receiver(post_save, sender=IncidentNew)
+def increment_site_counter(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(counters.COUNTER_NAMES[sender], 1)
+
+
+@receiver(post_delete, sender=LogbookEntry)
+@receiver(post_delete, sender=CrewMember)
+@receiver(post_delete, sender=MaintenanceRecord)
+@receiver(post_delete, sender=VoyageLogNew)
+@receiver(post_delete, sender=IncidentNew)
+def decrement_site_counter(sender, instance, **kwargs):
+    counters.increment(counters.COUNTER_NAMES[sender], -1)
@@ -0,0 +1,154 @@
+"""
+Recherche spatiale des positions enregistrées (« quels voyages sont passés près de X »).
+
+VoyageEvent et LogEntryNew portent une colonne `geohash` indexée, calculée à
+partir de latitude/longitude à chaque save() (et par `backfill_geohash` pour
+l'existant). Une recherche :
+
+1. couvre l'emprise demandée par quelques préfixes geohash
+   (`geo.geohash_cells`), chacun traduit en parcours d'intervalle sur l'index
+   (geohash >= préfixe AND geohash < préfixe + '{', '{' suivant 'z' en ASCII) ;
+2. filtre exactement les candidats : emprise en SQL, rayon en haversine
+   vectorisé (`geo.distances_from_nm`).
+
+Sources : 'events' = VoyageEvent (ancien système), 'log' = LogEntryNew.
+"""
+from django.db.models import Q
+
+from . import geo
+
+SOURCES = ('events', 'log')
+
+
+def model_for(kind):
+    # Import local : les modèles importent nautical.geo, pas ce module
+    if kind == 'events':
+        from .models import VoyageEvent
+        return VoyageEvent
+    if kind == 'log':
+        from .models_new import LogEntryNew
+        return LogEntryNew
+    raise ValueError(f"Source inconnue : {kind}")
+
+
+def cell_filter(cells):
+    """Q() sélectionnant les lignes dont le geohash commence par l'un des préfixes."""
+    q = Q()
+    for cell in cells:
+        if cell:
+            q |= Q(geohash__gte=cell, geohash__lt=cell + '{')
+        else:
+            q |= ~Q(geohash='')
+    return q
+
+
+def _bbox_filter(min_lat, min_lng, max_lat, max_lng):
+    q = Q(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lng > max_lng:
+        # emprise à cheval sur l'antiméridien
+        return q & (Q(longitude__gte=min_lng) | Q(longitude__lte=max_lng))
+    return q & Q(longitude__gte=min_lng, longitude__lte=max_lng)
+
+
+def points_in_bbox(kind, min_lat, min_lng, max_lat, max_lng):
+    """QuerySet des positions de la source `kind` contenues dans l'emprise (degrés)."""
+    cells = geo.geohash_cells(min_lat, min_lng, max_lat, max_lng)
+    return (
+        model_for(kind).objects
+        .filter(cell_filter(cells))
+        .filter(_bbox_filter(min_lat, min_lng, max_lat, max_lng))
+    )
+
+
+def points_near(kind, lat, lng, radius_nm):
+    """Positions de la source `kind` à moins de `radius_nm` milles de (lat, lng).
+
+    Retourne une liste de dicts (id, voyage_id, latitude, longitude,
+    distance_nm) triée par distance croissante.
+    """
+    rows = list(
+        points_in_bbox(kind, *geo.bbox_around(lat, lng, radius_nm))
+        .values_list('id', 'voyage_id', 'latitude', 'longitude')
+    )
+    if not rows:
+        return []
+    ids, voyage_ids, lats, lngs = zip(*rows)
+    distances = geo.distances_from_nm(lat, lng, lats, lngs)
+    hits = [
+        {
+            'id': ids[i],
+            'voyage_id': voyage_ids[i],
+            'latitude': float(lats[i]),
+            'longitude': float(lngs[i]),
+            'distance_nm': round(float(distances[i]), 3),
+        }
+        for i in (distances <= radius_nm).nonzero()[0]
+    ]
+    hits.sort(key=lambda hit: hit['distance_nm'])
+    return hits
+
+
+def voyages_near(kind, lat, lng, radius_nm):
+    """Voyages dont au moins une position est à moins de `radius_nm` milles.
+
+    Retourne [{'voyage_id', 'closest_nm', 'points'}] trié par distance minimale.
+    """
+    voyages = {}
+    for hit in points_near(kind, lat, lng, radius_nm):
+        entry = voyages.get(hit['voyage_id'])
+        if entry is None:
+            # les points arrivent triés : le premier est le plus proche
+            voyages[hit['voyage_id']] = {'voyage_id': hit['voyage_id'], 'closest_nm': hit['distance_nm'], 'points': 1}
+        else:
+            entry['points'] += 1
+    return list(voyages.values())
+
+
+def voyages_in_bbox(kind, min_lat, min_lng, max_lat, max_lng):
+    """Identifiants des voyages ayant au moins une position dans l'emprise."""
+    return sorted(set(
+        points_in_bbox(kind, min_lat, min_lng, max_lat, max_lng)
+        .order_by()
+        .values_list('voyage_id', flat=True)
+        .distinct()
+    ))
+
+
+def parse_bbox(value):
+    """Lit 'min_lng,min_lat,max_lng,max_lat' (ordre GeoJSON) ; ValueError si invalide."""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError(value)
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+        raise ValueError(value)
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def parse_point(params):
+    """Lit lat, lng et radius (NM, défaut 1) dans des paramètres GET ; ValueError si invalides."""
+    lat = float(params.get('lat', ''))
+    lng = float(params.get('lng', ''))
+    radius = float(params.get('radius') or 1)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 < radius <= 600):
+        raise ValueError(params)
+    return lat, lng, radius
+
+
+def search_from_request(kind, params):
+    """Recherche de voyages pilotée par des paramètres GET :
+    `?bbox=min_lng,min_lat,max_lng,max_lat` ou `?lat=&lng=&radius=` (NM).
+    ValueError si les paramètres sont invalides.
+    """
+    if params.get('bbox'):
+        bbox = parse_bbox(params['bbox'])
+        return {
+            'bbox': [bbox[1], bbox[0], bbox[3], bbox[2]],
+            'voyages': [{'voyage_id': voyage_id} for voyage_id in voyages_in_bbox(kind, *bbox)],
+        }
+    lat, lng, radius = parse_point(params)
+    return {
+        'center': [lng, lat],
+        'radius_nm': radius,
+        'voyages': voyages_near(kind, lat, lng, radius),
+    }
@@ -0,0 +1,327 @@
+import os
+import random
+import tempfile
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import caching, exports, geo, spatial, tracks
+from .models import LogbookEntry, VoyageEvent
+from .models_new import (
+    CrewMemberNew, IncidentNew, LogEntryNew, PdfJob, VoyageLogNew, VoyagePhoto, VoyageStats,
+    WeatherConditionNew,
+)
+
+TOTAL_FIELDS = ('distance_nm', 'duration_hours', 'avg_speed_kn')
+
+# cache par défaut sur disque (settings.CACHES) : les tests ont le leur, en mémoire
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class RoundingTests(SimpleTestCase):
+    """Arrondi au centième de nautical.geo : ROUND_HALF_UP décimal, comme les
+    calculs d'origine des modèles, identique en scalaire et en NumPy."""
+
+    def test_quantize_2_rounds_decimal_representation_half_up(self):
+        for value, expected in [(1.005, '1.01'), (-1.005, '-1.01'), (2.675, '2.68'), (0.125, '0.13'),
+                                (-0.004, '0.00'), (Decimal('12.345'), '12.35'), (7, '7.00')]:
+            with self.subTest(value=value):
+                self.assertEqual(geo.quantize_2(value), Decimal(expected))
+        self.assertIsNone(geo.quantize_2(None))
+        self.assertIsNone(geo.quantize_2(float('nan')))
+
+    def test_round_cents_matches_to_cents(self):
+        rng = random.Random(0)
+        values = [i / 1000 for i in range(-3000, 3000)] + [rng.uniform(-5000, 5000) for _ in range(5000)]
+        self.assertEqual(list(geo.round_cents(values)), [geo.to_cents(value) for value in values])
+        self.assertEqual(list(geo.round_cents([float('nan'), 1.005])), [0, 101])
+
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class NearPoleSearchTests(TestCase):
+    """Recherche par rayon autour de 89.9°N : le cercle contient le pôle,
+    l'emprise couvre toutes les longitudes."""
+
+    def test_bbox_around_pole_covers_all_longitudes(self):
+        min_lat, min_lng, max_lat, max_lng = geo.bbox_around(89.9, 10, 20)
+        self.assertEqual((min_lng, max_lng, max_lat), (-180.0, 180.0, 90.0))
+        self.assertAlmostEqual(min_lat, 89.9 - 20 / 60, places=2)
+
+    def test_points_near_pole_across_meridians(self):
+        voyage = LogbookEntry.objects.create(start_datetime=timezone.now(), departure_port='Longyearbyen')
+        for lat, lng in (('89.850000', '-170.000000'), ('89.950000', '100.000000'), ('88.000000', '10.000000')):
+            VoyageEvent.objects.create(voyage=voyage, timestamp=timezone.now(), latitude=Decimal(lat),
+                                       longitude=Decimal(lng), description='Point')
+        hits = spatial.points_near('events', 89.9, 10, 20)
+        # de l'autre côté du pôle (15 NM) et à 90° de longitude (~6 NM) ; pas le point à 114 NM
+        self.assertEqual(sorted(hit['longitude'] for hit in hits), [-170.0, 100.0])
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class VoyageTotalsTests(TestCase):
+    """Totals maintained by VoyageEvent.save()/delete()/bulk_add() must equal
+    the full recompute of LogbookEntry.recalculate_from_events()."""
+
+    STEPS = 150
+
+    def setUp(self):
+        start = timezone.make_aware(datetime(2025, 3, 1, 6, 0))
+        self.start = start
+        self.voyages = [
+            LogbookEntry.objects.create(start_datetime=start, departure_port=port)
+            for port in ('Papeete', 'Uturoa')
+        ]
+
+    def random_fields(self, rng):
+        # few distinct timestamps: ties on (timestamp, id) are exercised too
+        fields = {'timestamp': self.start + timedelta(minutes=30 * rng.randrange(40))}
+        if rng.random() < 0.85:
+            fields['latitude'] = Decimal(f"{-17.5 + rng.uniform(-0.5, 0.5):.6f}")
+            fields['longitude'] = Decimal(f"{-149.5 + rng.uniform(-0.5, 0.5):.6f}")
+        else:
+            fields['latitude'] = fields['longitude'] = None
+        return fields
+
+    def assertTotalsMatchRecompute(self, step):
+        for voyage in self.voyages:
+            maintained = LogbookEntry.objects.values(*TOTAL_FIELDS).get(pk=voyage.pk)
+            recomputed = LogbookEntry.objects.get(pk=voyage.pk)
+            recomputed.recalculate_from_events()
+            recomputed = LogbookEntry.objects.values(*TOTAL_FIELDS).get(pk=voyage.pk)
+            self.assertEqual(maintained, recomputed, f"step {step}, voyage {voyage.pk}")
+
+    def test_concurrent_deltas_are_not_lost(self):
+        voyage = self.voyages[0]
+        for minutes, lng in ((0, '-149.500000'), (60, '-149.400000')):
+            VoyageEvent.objects.create(voyage=voyage, timestamp=self.start + timedelta(minutes=minutes),
+                                       latitude=Decimal('-17.500000'), longitude=Decimal(lng), description='Point')
+        before = LogbookEntry.objects.get(pk=voyage.pk).distance_nm
+        # two concurrent saves, each holding the voyage as read before the other wrote
+        first, second = LogbookEntry.objects.get(pk=voyage.pk), LogbookEntry.objects.get(pk=voyage.pk)
+        first.apply_event_delta(Decimal('1.50'))
+        second.apply_event_delta(Decimal('2.25'))
+        self.assertEqual(LogbookEntry.objects.get(pk=voyage.pk).distance_nm, before + Decimal('3.75'))
+
+    def test_random_insert_move_delete(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                VoyageEvent.objects.all().delete()
+                for voyage in self.voyages:
+                    voyage.recalculate_from_events()
+                for step in range(self.STEPS):
+                    events = list(VoyageEvent.objects.all())
+                    action = rng.choice(['insert', 'insert', 'bulk', 'move', 'delete'] if events else ['insert'])
+                    if action == 'insert':
+                        VoyageEvent.objects.create(
+                            voyage=rng.choice(self.voyages), description='Point', **self.random_fields(rng)
+                        )
+                    elif action == 'bulk':
+                        VoyageEvent.bulk_add(rng.choice(self.voyages), [
+                            dict(description='Trace', **self.random_fields(rng)) for _ in range(rng.randint(1, 6))
+                        ])
+                    elif action == 'move':
+                        event = rng.choice(events)
+                        for field, value in self.random_fields(rng).items():
+                            if rng.random() < 0.6:
+                                setattr(event, field, value)
+                        if rng.random() < 0.2:
+                            event.voyage = rng.choice(self.voyages)
+                        event.save()
+                    else:
+                        rng.choice(events).delete()
+                    self.assertTotalsMatchRecompute(step)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class VoyageStatisticsTests(TestCase):
+
+    def test_created_with_the_voyage(self):
+        voyage = VoyageLogNew.objects.create(date_debut=date(2025, 4, 1), port_depart='Papeete', skipper='Skipper')
+        self.assertTrue(VoyageStats.objects.filter(voyage=voyage).exists())
+
+    def test_missing_row_is_read_only(self):
+        voyage = VoyageLogNew.objects.create(date_debut=date(2025, 4, 1), port_depart='Papeete', skipper='Skipper')
+        VoyageStats.objects.filter(voyage=voyage).delete()
+        voyage = VoyageLogNew.objects.get(pk=voyage.pk)
+        # une seule requête (SELECT) : la lecture n'écrit rien
+        with self.assertNumQueries(1):
+            stats = voyage.statistics
+        self.assertEqual((stats.entries_count, stats.distance_gps_nm), (0, 0))
+        self.assertFalse(VoyageStats.objects.filter(voyage=voyage).exists())
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CacheVersionTests(TestCase):
+
+    def test_versions_change_on_commit(self):
+        voyage = VoyageLogNew.objects.create(date_debut=date(2025, 4, 1), port_depart='Papeete', skipper='Skipper')
+
+        def versions():
+            content = VoyageStats.objects.get(voyage=voyage).content_version
+            return caching.voyage_version(voyage.pk), caching.list_version(), content
+
+        before = versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            LogEntryNew.objects.create(voyage=voyage, date=date(2025, 4, 1), heure=time(8), evenements='Départ')
+            # pendant la transaction : une page rendue ici garde l'ancienne clé
+            self.assertEqual(versions(), before)
+        after = versions()
+        self.assertTrue(all(new > old for new, old in zip(after, before)))
+
+class BookJobTests(TestCase):
+    """Un livre relié (tâche sans voyage) n'est mis en file qu'une fois par version."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.voyage = VoyageLogNew.objects.create(date_debut=date(2025, 4, 1), port_depart='Papeete', skipper='Skipper')
+
+    def test_same_book_is_one_job(self):
+        _, first = exports.request_book([self.voyage.pk], 'Saison 2025')
+        _, second = exports.request_book([self.voyage.pk], 'Saison 2025')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(PdfJob.objects.filter(voyage__isnull=True).count(), 1)
+
+    def test_duplicate_book_is_rejected(self):
+        PdfJob.objects.create(kind=exports.BOOK_KIND, version=1)
+        with self.assertRaises(IntegrityError):
+            PdfJob.objects.create(kind=exports.BOOK_KIND, version=1)
+
+    def test_concurrent_request_reuses_job(self):
+        existing = PdfJob.objects.create(kind=exports.BOOK_KIND, version=exports.book_version([self.voyage.pk]))
+        # l'autre requête a créé la tâche après notre lecture : get_or_create insère quand même
+        racing = mock.patch.object(
+            PdfJob.objects, 'get_or_create',
+            side_effect=lambda defaults, **lookup: (PdfJob.objects.create(**lookup, **defaults), True),
+        )
+        with racing:
+            _, job = exports.request_book([self.voyage.pk], 'Saison 2025')
+        self.assertEqual(job.pk, existing.pk)
+        self.assertEqual(PdfJob.objects.count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class LiveStreamTests(TestCase):
+    """Flux SSE servi sous ASGI seulement ; sous WSGI, la page live
+    synchronise par curseur."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.voyage = VoyageLogNew.objects.create(date_debut=date(2025, 4, 1), port_depart='Papeete', skipper='Skipper')
+
+    def test_wsgi_stream_is_not_served(self):
+        response = self.client.get(reverse('voyage_log_stream', args=[self.voyage.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    def test_wsgi_live_page_polls_with_cursor(self):
+        response = self.client.get(reverse('voyage_log_live', args=[self.voyage.pk]))
+        self.assertContains(response, 'const LIVE_STREAM_URL = null;')
+        self.assertContains(response, reverse('voyage_log_api_entries', args=[self.voyage.pk]))
+
+    async def test_asgi_stream_is_served(self):
+        response = await AsyncClient().get(reverse('voyage_log_stream', args=[self.voyage.pk]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertTrue((await anext(content)).startswith(b'retry:'))
+        await content.aclose()
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.gettempdir())
+class PageQueryCountTests(TestCase):
+    """Nombre de requêtes des pages de voyage : chaque voyage a plusieurs
+    photos, entrées et membres d'équipage, une requête par ligne liée ferait
+    donc dépasser le compte attendu."""
+
+    ROWS = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.voyages = [
+            VoyageLogNew.objects.create(
+                date_debut=date(2025, 4, 1 + i), port_depart='Papeete', port_arrivee='Moorea',
+                skipper='Skipper', sujet_voyage=f"Voyage {i}", bateau='MANTA',
+            )
+            for i in range(cls.ROWS)
+        ]
+        noon = timezone.make_aware(datetime(2025, 4, 1, 12, 0))
+        for voyage in cls.voyages:
+            VoyagePhoto.objects.create(voyage=voyage, image='voyages/photos/entete.jpg', type_photo='header')
+            for i in range(cls.ROWS):
+                VoyagePhoto.objects.create(voyage=voyage, image=f"voyages/photos/{i}.jpg", titre=f"Photo {i}", ordre=i)
+                LogEntryNew.objects.create(
+                    voyage=voyage, date=voyage.date_debut, heure=time(8 + i), evenements=f"Entrée {i}",
+                    cap_compas=90, position=f"17°3{i}.00'S / 149°3{i}.00'W",
+                )
+                CrewMemberNew.objects.create(voyage=voyage, nom=f"Équipier {i}", prenom='Test')
+                WeatherConditionNew.objects.create(voyage=voyage, datetime=noon + timedelta(hours=i), type_bulletin='Météo-France')
+                IncidentNew.objects.create(voyage=voyage, datetime=noon + timedelta(hours=i), type_incident='materiel',
+                                           description=f"Incident {i}")
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def setUp(self):
+        # pages en cache (versions par voyage) : chaque test part d'un cache vide
+        cache.clear()
+
+    def assertPageQueries(self, num, url):
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_voyage_list(self):
+        self.assertPageQueries(2, reverse('voyage_log_list'))
+
+    def test_voyage_detail(self):
+        self.assertPageQueries(6, reverse('voyage_log_detail', args=[self.voyages[0].pk]))
+
+    def test_voyage_gallery(self):
+        self.assertPageQueries(2, reverse('voyage_gallery', args=[self.voyages[0].pk]))
+
+    def test_admin_voyage_list(self):
+        self.client.force_login(self.admin)
+        self.assertPageQueries(8, reverse('admin:nautical_voyagelognew_changelist'))
+
+
+# Trace GPX dont un point n'a ni Z ni décalage horaire
+NAIVE_TIME_GPX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="-17.535000" lon="-149.569000"><time>2025-05-01T23:30:00Z</time></trkpt>
+    <trkpt lat="-17.530000" lon="-149.560000"><time>2025-05-01T23:40:00</time></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ImportTrackTests(TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.gpx')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(NAIVE_TIME_GPX)
+        self.addCleanup(os.unlink, self.path)
+
+    def test_gpx_time_without_offset_is_utc(self):
+        with open(self.path, 'rb') as f:
+            stamps = [point.timestamp for point in tracks.iter_gpx(f)]
+        self.assertEqual(stamps, [
+            datetime(2025, 5, 1, 23, 30, tzinfo=dt_timezone.utc),
+            datetime(2025, 5, 1, 23, 40, tzinfo=dt_timezone.utc),
+        ])
+
+    def test_import_gpx_with_naive_time(self):
+        voyage = VoyageLogNew.objects.create(date_debut=date(2025, 5, 1), port_depart='Papeete', skipper='Skipper')
+        call_command('import_track', voyage.pk, self.path, '--system', 'new', stdout=StringIO())
+        entries = list(voyage.entries.order_by('timestamp'))
+        self.assertEqual(len(entries), 2)
+        # 23:40 UTC : 13:40 le même jour à Papeete (UTC-10)
+        self.assertEqual((entries[1].date, entries[1].heure), (date(2025, 5, 1), time(13, 40)))
+        self.assertEqual(entries[1].timestamp, datetime(2025, 5, 1, 23, 40, tzinfo=dt_timezone.utc))
@@ -0,0 +1,252 @@
+"""
+Traces des voyages.
+
+- Lecture en flux de fichiers de trace (GPX, journaux NMEA 0183) : les
+  lecteurs sont des générateurs, un fichier de plusieurs centaines de Mo est
+  parcouru en mémoire constante, point par point.
+- Traces GeoJSON multi-résolution : polylignes simplifiées (Douglas-Peucker)
+  précalculées par niveau, mises en cache et invalidées à chaque modification
+  d'un point.
+"""
+import math
+import os
+from collections import namedtuple
+from datetime import timezone as dt_timezone
+from itertools import islice
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import geo, nmea
+
+TrackPoint = namedtuple('TrackPoint', ['timestamp', 'latitude', 'longitude', 'sog_kn', 'cog_deg'])
+
+
+def detect_format(path):
+    """Retourne 'gpx' ou 'nmea' d'après l'extension (ou le début) du fichier."""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext == '.gpx':
+        return 'gpx'
+    if ext in ('.nmea', '.nma', '.log', '.txt'):
+        return 'nmea'
+    with open(path, 'rb') as f:
+        head = f.read(512).lstrip()
+    return 'gpx' if head.startswith(b'<') else 'nmea'
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_gpx(fileobj):
+    """Points horodatés (<trkpt>, <rtept>) d'un fichier GPX ouvert en binaire.
+
+    Les heures sont en UTC (aware), y compris celles écrites sans fuseau."""
+    segment = None
+    for event, elem in ElementTree.iterparse(fileobj, events=('start', 'end')):
+        name = _local_name(elem.tag)
+        if event == 'start':
+            if name in ('trkseg', 'rte'):
+                segment = elem
+            continue
+        if name not in ('trkpt', 'rtept'):
+            continue
+        timestamp = None
+        for child in elem:
+            if _local_name(child.tag) == 'time' and child.text:
+                timestamp = parse_datetime(child.text.strip())
+                # heure sans Z ni décalage : UTC (norme GPX)
+                if timestamp is not None and timezone.is_naive(timestamp):
+                    timestamp = timezone.make_aware(timestamp, dt_timezone.utc)
+                break
+        try:
+            latitude = float(elem.get('lat'))
+            longitude = float(elem.get('lon'))
+        except (TypeError, ValueError):
+            latitude = longitude = None
+        # Libérer les points déjà traités pour garder une mémoire constante
+        elem.clear()
+        if segment is not None:
+            segment.clear()
+        if timestamp is not None and latitude is not None:
+            yield TrackPoint(timestamp, latitude, longitude, None, None)
+
+
+def iter_nmea(fileobj):
+    """Fixes d'un journal NMEA 0183 ouvert en binaire (RMC, complétées par GGA).
+
+    Les GGA n'ont pas de date : elles sont datées d'après la dernière RMC vue
+    (jour suivant après le passage de minuit UTC, voir nmea.date_fix_time).
+    Les doublons (RMC + GGA de la même seconde) sont ignorés.
+    """
+    last_rmc = None
+    last_timestamp = None
+    for raw in fileobj:
+        parsed = nmea.split_sentence(raw.decode('ascii', 'ignore'))
+        if parsed is None:
+            continue
+        kind, fields = parsed
+        point = None
+        if kind == 'RMC':
+            fix = nmea.parse_rmc(fields)
+            if fix:
+                last_rmc = fix['timestamp']
+                point = TrackPoint(fix['timestamp'], fix['latitude'], fix['longitude'], fix['sog_kn'], fix['cog_deg'])
+        elif kind == 'GGA' and last_rmc is not None:
+            fix = nmea.parse_gga(fields)
+            if fix:
+                timestamp = nmea.date_fix_time(last_rmc, fix['time'])
+                point = TrackPoint(timestamp, fix['latitude'], fix['longitude'], None, None)
+        if point is None or (last_timestamp is not None and point.timestamp == last_timestamp):
+            continue
+        last_timestamp = point.timestamp
+        yield point
+
+
+def iter_track(fileobj, fmt):
+    """Dispatch vers le lecteur adapté au format ('gpx' ou 'nmea')."""
+    if fmt == 'gpx':
+        return iter_gpx(fileobj)
+    if fmt == 'nmea':
+        return iter_nmea(fileobj)
+    raise ValueError(f"Format de trace inconnu : {fmt}")
+
+
+def decimate(points, interval_seconds):
+    """Ne conserve qu'un point toutes les `interval_seconds` secondes au plus."""
+    if not interval_seconds:
+        yield from points
+        return
+    last_kept = None
+    for point in points:
+        if last_kept is None or (point.timestamp - last_kept).total_seconds() >= interval_seconds:
+            last_kept = point.timestamp
+            yield point
+
+
+def chunked(iterable, size):
+    """Découpe un itérable en listes de `size` éléments."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# =============================================================================
+# TRACES GEOJSON MULTI-RÉSOLUTION
+# =============================================================================
+
+# Tolérance Douglas-Peucker (NM) de chaque niveau ; le niveau 0 est la trace complète
+LEVEL_TOLERANCES_NM = [0.0, 0.005, 0.02, 0.1, 0.5, 2.0]
+
+# Taille d'un pixel (NM) à l'équateur au zoom 0 d'une carte web (tuiles 256 px)
+NM_PER_PIXEL_ZOOM_0 = 40075016.686 / 256 / geo.METERS_PER_NM
+
+# Sources de points : 'events' = LogbookEntry.events (ancien système), 'log' = VoyageLogNew.entries
+TRACK_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def level_for_tolerance(tolerance_nm):
+    """Niveau le plus simplifié dont la tolérance ne dépasse pas `tolerance_nm`."""
+    level = 0
+    for i, level_tolerance in enumerate(LEVEL_TOLERANCES_NM):
+        if level_tolerance <= tolerance_nm:
+            level = i
+    return level
+
+
+def level_for_zoom(zoom):
+    """Niveau adapté à un zoom de carte web : tolérance d'environ un pixel."""
+    return level_for_tolerance(NM_PER_PIXEL_ZOOM_0 / (2 ** max(0.0, float(zoom))))
+
+
+def _cache_key(kind, voyage_id, level):
+    return f"track:{kind}:{voyage_id}:{level}"
+
+
+def _load_points(kind, voyage_id):
+    # Import local : les modèles importent ce module via les signaux
+    if kind == 'events':
+        from .models import VoyageEvent
+        qs = VoyageEvent.objects.filter(voyage_id=voyage_id).order_by('timestamp', 'id')
+    else:
+        from .models_new import LogEntryNew
+        qs = LogEntryNew.objects.filter(voyage_id=voyage_id).order_by('timestamp', 'id')
+    rows = list(
+        qs.filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list('latitude', 'longitude')
+    )
+    if not rows:
+        return geo.as_float_array([]), geo.as_float_array([])
+    lats, lngs = zip(*rows)
+    return geo.as_float_array(lats), geo.as_float_array(lngs)
+
+
+def build_track_levels(kind, voyage_id):
+    """Calcule toutes les résolutions d'une trace et les met en cache.
+
+    Retourne {niveau: [[lng, lat], ...]}.
+    """
+    lats, lngs = _load_points(kind, voyage_id)
+    levels = {}
+    for level, tolerance in enumerate(LEVEL_TOLERANCES_NM):
+        keep = geo.simplify_indices(lats, lngs, tolerance)
+        levels[level] = [[round(float(lngs[i]), 6), round(float(lats[i]), 6)] for i in keep]
+    cache.set_many({_cache_key(kind, voyage_id, level): coords for level, coords in levels.items()}, TRACK_CACHE_TIMEOUT)
+    return levels
+
+
+def get_track_level(kind, voyage_id, level):
+    """Coordonnées [[lng, lat], ...] d'une trace au niveau demandé (depuis le cache)."""
+    coords = cache.get(_cache_key(kind, voyage_id, level))
+    if coords is None:
+        coords = build_track_levels(kind, voyage_id)[level]
+    return coords
+
+
+def invalidate_track(kind, voyage_id):
+    """Supprime toutes les résolutions en cache d'une trace (point ajouté, modifié ou supprimé).
+
+    Après validation de la transaction en cours : supprimées avant, elles
+    pourraient être recalculées par une lecture concurrente sur les points
+    d'avant l'écriture, et remises en cache pour TRACK_CACHE_TIMEOUT."""
+    keys = [_cache_key(kind, voyage_id, level) for level in range(len(LEVEL_TOLERANCES_NM))]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def track_feature(kind, voyage_id, zoom=None, tolerance_nm=None):
+    """Feature GeoJSON (LineString) d'une trace au zoom ou à la tolérance demandés."""
+    if tolerance_nm is not None:
+        level = level_for_tolerance(tolerance_nm)
+    elif zoom is not None:
+        level = level_for_zoom(zoom)
+    else:
+        level = 0
+    coords = get_track_level(kind, voyage_id, level)
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'LineString', 'coordinates': coords},
+        'properties': {
+            'voyage': voyage_id,
+            'level': level,
+            'tolerance_nm': LEVEL_TOLERANCES_NM[level],
+            'points': len(coords),
+        },
+    }
+
+
+def track_feature_from_request(kind, voyage_id, params):
+    """Lit `zoom` ou `tolerance` (NM) dans les paramètres GET ; ValueError si invalides."""
+    zoom = params.get('zoom')
+    tolerance = params.get('tolerance')
+    zoom = float(zoom) if zoom not in (None, '') else None
+    tolerance = float(tolerance) if tolerance not in (None, '') else None
+    for value in (zoom, tolerance):
+        if value is not None and (math.isnan(value) or value < 0):
+            raise ValueError(value)
+    return track_feature(kind, voyage_id, zoom=zoom, tolerance_nm=tolerance)
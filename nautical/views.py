@@ -3,6 +3,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView
 from django.views import View
+from . import counters
 from .models import LogbookEntry, CrewMember, MaintenanceRecord, Checklist
 from .forms import LogbookEntryForm, MediaAssetForm
 from django.views.generic.edit import UpdateView, DeleteView  # ✅ AJOUT
@@ -18,18 +19,10 @@ from django.http import HttpResponse, JsonResponse
 from django.db.models import Q
 from urllib.parse import urlencode
 import csv
-from io import BytesIO
-from django.conf import settings
-from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 
 # Les nouvelles vues sont maintenant importées directement dans urls.py pour éviter les conflits
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfgen import canvas
-from svglib.svglib import svg2rlg
-from reportlab.graphics import renderPDF
+from . import pdf
 
 
 MaintenanceFormSet = inlineformset_factory(
@@ -41,10 +34,12 @@ MaintenanceFormSet = inlineformset_factory(
 )
 
 def home(request):
+    # Compteurs tenus à jour par les signaux (nautical.counters) : pas de COUNT(*)
+    totals = counters.get_many('logbook_entries', 'crew_members', 'maintenance_records')
     return render(request, 'nautical/home.html', {
-        'voyages_count': LogbookEntry.objects.count(),
-        'crew_count': CrewMember.objects.count(),
-        'maintenance_count': MaintenanceRecord.objects.count(),
+        'voyages_count': totals['logbook_entries'],
+        'crew_count': totals['crew_members'],
+        'maintenance_count': totals['maintenance_records'],
     })
 
 
@@ -126,6 +121,18 @@ from .models import Consumable
 from .models import Chronology
 from .forms import ChecklistItemFormSet
 
+class ChronologyReport(pdf.TabularReport):
+    title = "Chronologie"
+    filename = "chronologie.pdf"
+    columns = [
+        pdf.Column('Date', 28*mm, lambda e: e.date.strftime('%d/%m/%Y')),
+        pdf.Column('Heure', 18*mm, lambda e: e.time.strftime('%H:%M') if e.time else ''),
+        pdf.Column('Description', 80*mm, lambda e: (e.description or '').replace('\n', ' ')),
+        pdf.Column('Action réalisée', 60*mm, lambda e: (e.action_realisee or '').replace('\n', ' ')),
+        pdf.Column('Réalisé par', 30*mm, lambda e: e.performer),
+    ]
+
+
 class ChronologyListView(ListView):
     model = Chronology
     template_name = 'nautical/chronology_list.html'
@@ -158,64 +165,7 @@ class ChronologyListView(ListView):
         return response
 
     def export_pdf(self, qs):
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=15*mm, rightMargin=15*mm, topMargin=20*mm, bottomMargin=15*mm)
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(name='Small', fontSize=9, leading=11))
-        story = []
-        from datetime import date
-        story.append(Paragraph(f"<b>Chronologie</b> — {date.today().strftime('%d/%m/%Y')}", styles['Heading2']))
-        story.append(Spacer(1, 8))
-
-        data = [['Date', 'Heure', 'Description', 'Action réalisée', 'Réalisé par']]
-        for e in qs:
-            data.append([
-                e.date.strftime('%d/%m/%Y'),
-                (e.time.strftime('%H:%M') if e.time else ''),
-                (e.description or '').replace('\n', ' '),
-                (e.action_realisee or '').replace('\n', ' '),
-                e.performer,
-            ])
-
-        # Configure column widths (approx)
-        table = Table(data, colWidths=[28*mm, 18*mm, 80*mm, 60*mm, 30*mm])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f0f3f6')),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.HexColor('#0a2342')),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 10),
-            ('GRID', (0,0), (-1,-1), 0.25, colors.HexColor('#cfd8e3')),
-            ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
-            ('FONTSIZE', (0,1), (-1,-1), 9),
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ]))
-        story.append(table)
-
-        class NumberedCanvas(canvas.Canvas):
-            def __init__(self, *args, **kwargs):
-                super().__init__(*args, **kwargs)
-                self._saved_page_states = []
-            def showPage(self):
-                self._saved_page_states.append(dict(self.__dict__))
-                super().showPage()
-            def save(self):
-                total_pages = len(self._saved_page_states) or 1
-                for state in self._saved_page_states:
-                    self.__dict__.update(state)
-                    self._draw_page_number(total_pages)
-                    super().showPage()
-                super().save()
-            def _draw_page_number(self, total):
-                self.setFont("Helvetica", 9)
-                w, h = A4
-                self.drawRightString(w - 15*mm, 10*mm, f"Page {self._pageNumber}/{total}")
-
-        doc.build(story, canvasmaker=NumberedCanvas)
-        pdf = buffer.getvalue()
-        buffer.close()
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="chronologie.pdf"'
-        return response
+        return ChronologyReport().response(qs)
 
 
 class ChronologyCreateView(CreateView):
@@ -329,6 +279,20 @@ class ConsumableDeleteView(DeleteView):
     template_name = "nautical/consumable_confirm_delete.html"
     success_url = reverse_lazy("consumable_list")
 
+class ConsumableReport(pdf.TabularReport):
+    title = "Inventaire des consommables"
+    filename = "consommables.pdf"
+    logo = True
+    columns = [
+        pdf.Column('Nom', 60*mm, lambda c: c.name),
+        pdf.Column('Origine', 22*mm, lambda c: c.get_origin_display()),
+        pdf.Column('Référence', 32*mm, lambda c: c.reference or ''),
+        pdf.Column('Qté', 13*mm, lambda c: str(c.quantity), 'RIGHT'),
+        pdf.Column('Prix (€)', 18*mm, lambda c: f"{c.price_eur:.2f}" if c.price_eur is not None else ''),
+        pdf.Column('Remarque', 55*mm, lambda c: (c.remark or '').replace('\n', ' ')),
+    ]
+
+
 class ConsumablePdfView(View):
     def get(self, request, *args, **kwargs):
         # 1) Reprend le même filtrage que la liste
@@ -340,89 +304,5 @@ class ConsumablePdfView(View):
         if origin:
             qs = qs.filter(origin=origin)
 
-        # 2) Prépare le doc A4
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(
-            buffer, pagesize=A4,
-            leftMargin=15*mm, rightMargin=15*mm, topMargin=20*mm, bottomMargin=15*mm
-        )
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(name='Small', fontSize=9, leading=11))
-
-        story = []
-
-        # 3) En-tête avec logo SVG (si présent)
-        logo_path = (settings.BASE_DIR / "static" / "img" / "logo_bateau_manta.svg")
-        if logo_path.exists():
-            drawing = svg2rlg(str(logo_path))
-            # cible ~42 mm de large
-            target_w = 120  # points
-            scale = target_w / float(drawing.width or 1)
-            drawing.width *= scale
-            drawing.height *= scale
-            class DrawingFlowable(Spacer):
-                def __init__(self, drawing):
-                    super().__init__(1, drawing.height)
-                    self.drawing = drawing
-                def draw(self):
-                    renderPDF.draw(self.drawing, self.canv, 0, 0)
-            story.append(DrawingFlowable(drawing))
-            story.append(Spacer(1, 6))
-
-        from datetime import date
-        story.append(Paragraph(f"<b>Inventaire des consommables</b> — {date.today().strftime('%d/%m/%Y')}", styles['Heading2']))
-        story.append(Spacer(1, 8))
-
-        # 4) Tableau
-        data = [['Nom', 'Origine', 'Référence', 'Qté', 'Prix (€)', 'Remarque']]
-        for c in qs:
-            data.append([
-                c.name,
-                c.get_origin_display(),
-                c.reference or '',
-                str(c.quantity),
-                (f"{c.price_eur:.2f}" if c.price_eur is not None else ''),
-                (c.remark or '').replace('\n', ' '),
-            ])
-
-        table = Table(data, colWidths=[60*mm, 22*mm, 32*mm, 13*mm, 18*mm, 55*mm])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f0f3f6')),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.HexColor('#0a2342')),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 10),
-            ('ALIGN', (3,1), (3,-1), 'RIGHT'),
-            ('GRID', (0,0), (-1,-1), 0.25, colors.HexColor('#cfd8e3')),
-            ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
-            ('FONTSIZE', (0,1), (-1,-1), 9),
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ]))
-        story.append(table)
-
-        # 5) Pied de page avec pagination
-        class NumberedCanvas(canvas.Canvas):
-            def __init__(self, *args, **kwargs):
-                super().__init__(*args, **kwargs)
-                self._saved_page_states = []
-            def showPage(self):
-                self._saved_page_states.append(dict(self.__dict__))
-                super().showPage()
-            def save(self):
-                total_pages = len(self._saved_page_states) or 1
-                for state in self._saved_page_states:
-                    self.__dict__.update(state)
-                    self._draw_page_number(total_pages)
-                    super().showPage()
-                super().save()
-            def _draw_page_number(self, total):
-                self.setFont("Helvetica", 9)
-                w, h = A4
-                self.drawRightString(w - 15*mm, 10*mm, f"Page {self._pageNumber}/{total}")
-
-        doc.build(story, canvasmaker=NumberedCanvas)
-
-        pdf = buffer.getvalue()
-        buffer.close()
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename=\"consommables.pdf\"'
-        return response
\ No newline at end of file
+        # 2) Rapport déclaratif (logo, styles et pagination de nautical.pdf)
+        return ConsumableReport().response(qs)
\ No newline at end of file
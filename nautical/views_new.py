@@ -2,26 +2,22 @@
 Vues pour le nouveau système de livre de bord
 Basées sur la structure du PDF Livre_de_Bord.pdf
 """
+import hashlib
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib import messages
 from django.urls import reverse_lazy, reverse
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import FileResponse, HttpResponse, JsonResponse, Http404, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Q, Count
-from django.views.decorators.cache import cache_page
-from django.utils.http import http_date
+from django.db.models import Sum
+from django.views.decorators.http import condition
 from django.utils.decorators import method_decorator
 
-# Import pour PDF
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import mm
-from io import BytesIO
-
-from .models_new import VoyageLogNew, LogEntryNew, WeatherConditionNew, CrewMemberNew, IncidentNew, VoyagePhoto
+from . import caching, counters, exports, live, spatial, tracks
+from .models_new import (
+    parse_timeline_cursor, IncidentRollup, MonthRollup, PdfJob, VoyageLogNew, LogEntryNew, LogEntryChange, WeatherConditionNew, CrewMemberNew, IncidentNew, VoyagePhoto,
+)
 from .forms_new import (
     VoyageLogForm, LogEntryNewForm, QuickLogEntryNewForm, 
     WeatherConditionNewForm, CrewMemberNewForm, IncidentNewForm,
@@ -30,7 +26,7 @@ from .forms_new import (
 )
 
 
-@method_decorator(cache_page(30), name='dispatch')
+@method_decorator(caching.cache_versioned_page(caching.LIST_CACHE_TIMEOUT, caching.list_scope), name='dispatch')
 class VoyageLogListView(ListView):
     """Liste de tous les livres de bord"""
     model = VoyageLogNew
@@ -39,16 +35,8 @@ class VoyageLogListView(ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = (
-            super()
-            .get_queryset()
-            .annotate(
-                total_entries=Count('entries'),
-                crew_count=Count('equipage'),
-                weather_count=Count('conditions_meteo'),
-                incidents_count=Count('incidents'),
-            )
-        )
+        # Compteurs et distances lus dans VoyageStats (une ligne par voyage)
+        queryset = super().get_queryset().select_related('stats')
         # Filtrage optionnel par statut
         statut = self.request.GET.get('statut')
         if statut:
@@ -59,6 +47,8 @@ class VoyageLogListView(ListView):
 class VoyageLogDetailView(DetailView):
     """Affichage détaillé d'un livre de bord avec timeline"""
     model = VoyageLogNew
+    # Photos préchargées : header_photo est lu une dizaine de fois par le template
+    queryset = VoyageLogNew.objects.select_related('stats').with_photos()
     template_name = 'nautical/voyage_log_detail.html'
     context_object_name = 'voyage'
 
@@ -74,32 +64,30 @@ class VoyageLogDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Optimiser les accès liés
-        voyage = (
-            VoyageLogNew.objects
-            .prefetch_related(
-                'entries',
-                'conditions_meteo',
-                'equipage',
-                'incidents'
-            )
-            .get(pk=self.object.pk)
-        )
-        
-        # Récupérer les entrées de log triées par date/heure (limiter par défaut)
-        all_entries_qs = voyage.entries.all().order_by('date', 'heure')
-        show_all = self.request.GET.get('all') == '1'
-        max_entries = 50
-        context['entries'] = list(all_entries_qs if show_all else all_entries_qs[:max_entries])
-        context['entries_total_count'] = all_entries_qs.count()
-        context['entries_shown_count'] = len(context['entries'])
-        context['entries_truncated'] = (not show_all) and (context['entries_total_count'] > max_entries)
-        context['show_all'] = show_all
-        # Pré-calcul utile pour le template (évite add:-x)
-        try:
-            context['entries_remaining'] = max(0, context['entries_total_count'] - context['entries_shown_count'])
-        except Exception:
-            context['entries_remaining'] = 0
+        voyage = self.object
+        stats = voyage.statistics
+        context['stats'] = stats
+
+        # Fragments du détail (timeline, météo, équipage, incidents) mis en
+        # cache par version du voyage : les requêtes ci-dessous restent
+        # paresseuses et ne sont exécutées que si un fragment est recalculé
+        context['cache_version'] = caching.voyage_version(voyage.pk)
+        context['fragment_timeout'] = caching.DETAIL_CACHE_TIMEOUT
+
+        # Chronologie paginée par clé (timestamp, id) : une requête LIMIT
+        # par page quelle que soit la longueur du voyage ; les pages
+        # suivantes sont chargées par voyage_log_timeline (« Charger plus »)
+        after_param = self.request.GET.get('after')
+        after = parse_timeline_cursor(after_param) if after_param else None
+        entries, next_cursor = voyage.entries.timeline_page(after, TIMELINE_PAGE_SIZE)
+        context['entries'] = entries
+        context['next_cursor'] = next_cursor
+        context['timeline_after'] = after_param if after else ''
+        context['entries_total_count'] = stats.entries_count
+        context['entries_shown_count'] = len(entries)
+        context['entries_truncated'] = next_cursor is not None
+        # Entrées restantes, connues seulement depuis le début de la chronologie
+        context['entries_remaining'] = max(0, stats.entries_count - len(entries)) if after is None else None
         
         # Conditions météo
         context['weather_conditions'] = voyage.conditions_meteo.all().order_by('datetime')
@@ -110,32 +98,16 @@ class VoyageLogDetailView(DetailView):
         # Incidents
         context['incidents'] = voyage.incidents.all().order_by('datetime')
         
-        # Statistiques du voyage (utilise les données préfetchées)
-        entries = list(context['entries'])
-        if entries:
-            context['total_entries'] = len(entries)
-            first_entry = entries[0]
-            last_entry = entries[-1]
-            context['first_entry'] = first_entry
-            context['last_entry'] = last_entry
-            
+        # Durée du voyage
+        if stats.entries_count:
             # Calculer la durée du voyage basée sur les dates de début/fin du voyage
             if voyage.date_fin and voyage.date_debut:
                 # Utiliser les dates de voyage, pas les entrées de log
                 duration = voyage.date_fin - voyage.date_debut
                 context['voyage_duration'] = duration
-            elif first_entry and last_entry:
-                # Fallback: si pas de date de fin, utiliser les entrées
-                from django.utils.timezone import make_aware, get_current_timezone
-                tz = get_current_timezone()
-                start_naive = timezone.datetime.combine(first_entry.date, first_entry.heure)
-                end_naive = timezone.datetime.combine(last_entry.date, last_entry.heure)
-                try:
-                    start_dt = make_aware(start_naive, timezone=tz)
-                    end_dt = make_aware(end_naive, timezone=tz)
-                except Exception:
-                    start_dt, end_dt = start_naive, end_naive
-                context['voyage_duration'] = end_dt - start_dt
+            elif stats.duree is not None:
+                # Fallback: si pas de date de fin, utiliser la période couverte par les entrées
+                context['voyage_duration'] = stats.duree
         
         return context
 
@@ -194,10 +166,15 @@ def voyage_log_live_view(request, pk):
     """
     Vue 'live' du livre de bord - pour saisir des événements en temps réel
     """
-    voyage = get_object_or_404(VoyageLogNew, pk=pk)
+    voyage = get_object_or_404(VoyageLogNew.objects.select_related('stats'), pk=pk)
+    stats = voyage.statistics
+    
+    # Curseur du flux live, lu avant les entrées : une modification concurrente
+    # sera renvoyée par le flux plutôt que perdue
+    live_cursor = LogEntryChange.latest_id(voyage.pk)
     
     # Récupérer les dernières entrées (10 plus récentes)
-    recent_entries = voyage.entries.all().order_by('-date', '-heure')[:10]
+    recent_entries = voyage.entries.all().order_by('-timestamp', '-id')[:10]
     
     # Formulaire de saisie rapide
     if request.method == 'POST':
@@ -205,7 +182,7 @@ def voyage_log_live_view(request, pk):
         if form.is_valid():
             entry = form.save(commit=False)
             entry.voyage = voyage
-            entry.date = timezone.now().date()  # Date automatique
+            entry.date = timezone.localdate()  # Date automatique (heure du bord)
             entry.save()
             
             messages.success(request, "Entrée ajoutée au livre de bord")
@@ -213,23 +190,21 @@ def voyage_log_live_view(request, pk):
     else:
         form = QuickLogEntryNewForm()
     
-    # Utiliser l'heure locale pour l'affichage (GMT-10)
-    from django.utils import timezone as django_timezone
-    import datetime
-    
-    # Obtenir l'heure UTC et la convertir en heure locale (GMT-10)
-    utc_now = timezone.now()
-    # GMT-10, donc on soustrait 10 heures
-    local_time = utc_now - datetime.timedelta(hours=10)
+    # Heure locale du bord (TIME_ZONE) pour pré-remplir la saisie
+    local_time = timezone.localtime()
     
     context = {
         'voyage': voyage,
         'form': form,
         'recent_entries': recent_entries,
         'current_time': local_time.strftime('%H:%M'),
-        'entries_count': voyage.entries.count(),
-        'crew_count': voyage.equipage.count(),
-        'weather_count': voyage.conditions_meteo.count(),
+        'live_cursor': live_cursor,
+        'live_stream': live.stream_available(request),
+        'live_poll_ms': live.LIVE_SYNC_POLL_SECONDS * 1000,
+        # Compteurs dénormalisés (VoyageStats), sans COUNT() à chaque rendu
+        'entries_count': stats.entries_count,
+        'crew_count': stats.crew_count,
+        'weather_count': stats.weather_count,
     }
     
     return render(request, 'nautical/voyage_log_live.html', context)
@@ -395,316 +370,327 @@ def add_incident(request, voyage_pk):
     return render(request, 'nautical/incident_form.html', context)
 
 
+API_ENTRIES_DEFAULT_LIMIT = 200
+API_ENTRIES_MAX_LIMIT = 1000
+
+
+def _api_entries_etag(request, pk):
+    """ETag de l'API des entrées : curseur courant du journal (une lecture
+    d'index) et paramètres de la requête. Inchangé tant qu'aucune entrée du
+    voyage n'a été créée, modifiée ou supprimée."""
+    query = request.GET.urlencode()
+    return f'"{pk}-{LogEntryChange.latest_id(pk)}-{hashlib.md5(query.encode()).hexdigest()[:8]}"'
+
+
+@condition(etag_func=_api_entries_etag)
 def voyage_log_api_entries(request, pk):
-    """API pour récupérer les entrées de log en JSON (pour rafraîchissement live)"""
+    """API pour récupérer les entrées de log en JSON (pour rafraîchissement live)
+
+    - `?cursor=N[&limit=200]` : synchronisation différentielle. Retourne les
+      entrées créées ou modifiées depuis le curseur N, les identifiants des
+      entrées supprimées (`deleted`), le nouveau curseur et `has_more` s'il
+      reste des modifications (page suivante avec le curseur retourné).
+      `cursor=0` retourne le livre de bord complet.
+    - sans curseur : les 20 dernières entrées (éventuellement après `since`)
+      et le curseur courant, point de départ de la synchronisation.
+
+    Les réponses portent un ETag : `If-None-Match` donne un 304 sans
+    sérialisation tant que rien n'a changé.
+    """
     voyage = get_object_or_404(VoyageLogNew, pk=pk)
     
+    cursor = request.GET.get('cursor')
+    if cursor is not None:
+        try:
+            cursor = max(0, int(cursor))
+            limit = min(max(1, int(request.GET.get('limit', API_ENTRIES_DEFAULT_LIMIT))), API_ENTRIES_MAX_LIMIT)
+        except ValueError:
+            return JsonResponse({'error': 'cursor et limit doivent être des entiers'}, status=400)
+        # une ligne de plus que la page pour savoir s'il en reste
+        changes = LogEntryChange.since(voyage.pk, cursor, limit=limit + 1)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        entries, deleted = [], []
+        for change, entry in changes:
+            if entry is None:
+                deleted.append(change.entry_id)
+            else:
+                entries.append(entry.to_live_json())
+        return JsonResponse({
+            'entries': entries,
+            'deleted': deleted,
+            'cursor': changes[-1][0].id if changes else cursor,
+            'has_more': has_more,
+        })
+    
+    # Curseur lu avant les entrées : une modification concurrente sera
+    # retournée par la synchronisation suivante plutôt que perdue
+    live_cursor = LogEntryChange.latest_id(voyage.pk)
+    
     # Récupérer les entrées depuis une certaine date/heure si spécifiée
+    # (heure locale du bord si `since` n'a pas de fuseau)
     since = request.GET.get('since')
-    entries = voyage.entries.all().order_by('-date', '-heure')
+    entries = voyage.entries.all().order_by('-timestamp', '-id')
     
     if since:
         try:
             since_datetime = timezone.datetime.fromisoformat(since)
-            entries = entries.filter(
-                Q(date__gt=since_datetime.date()) |
-                (Q(date=since_datetime.date()) & Q(heure__gt=since_datetime.time()))
-            )
+            if timezone.is_naive(since_datetime):
+                since_datetime = timezone.make_aware(since_datetime)
+            entries = entries.filter(timestamp__gt=since_datetime)
         except ValueError:
             pass
     
     # Limiter à 20 entrées max
     entries = entries[:20]
     
-    data = []
-    for entry in entries:
-        data.append({
-            'id': entry.id,
-            'date': entry.date.strftime('%d/%m/%Y'),
-            'heure': entry.heure.strftime('%H:%M'),
-            'evenements': entry.evenements,
-            'position': entry.position,
-            'vent_force': entry.vent_force,
-            'vent_direction': entry.vent_direction,
-            'allure': entry.allure,
-        })
+    data = [entry.to_live_json() for entry in entries]
     
-    return JsonResponse({'entries': data})
+    return JsonResponse({'entries': data, 'cursor': live_cursor})
+
+
+async def voyage_log_stream(request, pk):
+    """Flux SSE des entrées créées/modifiées/supprimées (mode live).
+    Reprise par Last-Event-ID ou `?cursor=` ; voir nautical.live.
+
+    Sous WSGI, le flux n'est pas servi (204) : la page live synchronise par
+    `?cursor=` sur l'API des entrées."""
+    if not await VoyageLogNew.objects.filter(pk=pk).aexists():
+        raise Http404("Livre de bord introuvable")
+    if not live.stream_available(request):
+        # 204 : EventSource s'arrête sans se reconnecter
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(live.stream_async(pk, live.parse_cursor(request)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # pas de mise en tampon par un proxy nginx
+    return response
+
+
+TIMELINE_PAGE_SIZE = 50
+TIMELINE_MAX_PAGE_SIZE = 500
+
+
+@caching.cache_versioned_page(caching.DETAIL_CACHE_TIMEOUT, caching.voyage_scope)
+def voyage_log_timeline(request, pk):
+    """Page suivante de la chronologie d'un voyage (bouton « Charger plus »).
+
+    `?after=<curseur>` : entrées postérieures au curseur (pagination par clé
+    sur (timestamp, id), sans OFFSET) ; `?limit=` (50 par défaut).
+    `?format=json` : {'entries': [...], 'next': curseur ou null} ; sinon
+    fragment HTML des éléments de la timeline, suivi d'un marqueur
+    `.timeline-next` portant l'URL de la page suivante.
+    """
+    voyage = get_object_or_404(VoyageLogNew, pk=pk)
+    after_param = request.GET.get('after')
+    after = parse_timeline_cursor(after_param) if after_param else None
+    if after_param and after is None:
+        return JsonResponse({'error': 'Curseur invalide'}, status=400)
+    try:
+        limit = min(max(1, int(request.GET.get('limit', TIMELINE_PAGE_SIZE))), TIMELINE_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'limit doit être un entier'}, status=400)
+    entries, next_cursor = voyage.entries.timeline_page(after, limit)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'entries': [entry.to_live_json() for entry in entries], 'next': next_cursor})
+    return render(request, 'nautical/_timeline_entries.html', {
+        'voyage': voyage,
+        'entries': entries,
+        'next_cursor': next_cursor,
+        'fragment': True,
+    })
+
+
+def voyage_log_api_track(request, pk):
+    """Trace GeoJSON du voyage (positions des entrées de log), simplifiée selon
+    `?zoom=` (carte web) ou `?tolerance=` (NM). Servie depuis le cache par niveau."""
+    voyage = get_object_or_404(VoyageLogNew.objects.only('pk'), pk=pk)
+    try:
+        feature = tracks.track_feature_from_request('log', voyage.pk, request.GET)
+    except ValueError:
+        return JsonResponse({'error': 'Paramètre zoom/tolerance invalide'}, status=400)
+    return JsonResponse(feature)
+
+
+def voyage_log_api_near(request):
+    """Livres de bord passés dans une zone : `?lat=&lng=&radius=` (NM) ou
+    `?bbox=min_lng,min_lat,max_lng,max_lat`. Recherche via l'index geohash."""
+    try:
+        result = spatial.search_from_request('log', request.GET)
+    except ValueError:
+        return JsonResponse({'error': 'Paramètres lat/lng/radius ou bbox invalides'}, status=400)
+    voyages = VoyageLogNew.objects.in_bulk([hit['voyage_id'] for hit in result['voyages']])
+    for hit in result['voyages']:
+        voyage = voyages.get(hit['voyage_id'])
+        hit['titre'] = str(voyage) if voyage else ''
+        hit['url'] = voyage.get_absolute_url() if voyage else ''
+    return JsonResponse(result)
+
+
+DASHBOARD_MONTHS = 24
+
+
+def _yearly_totals(months):
+    """Totaux par année (du plus récent au plus ancien) à partir des agrégats mensuels."""
+    years = {}
+    for month in months:
+        year = years.setdefault(month.month.year, {
+            'year': month.month.year, 'days_at_sea': 0, 'entries_count': 0, 'distance_nm': 0,
+            'motor_minutes': 0, 'sail_minutes': 0, 'vent_force_max': None,
+        })
+        for field in ('days_at_sea', 'entries_count', 'distance_nm', 'motor_minutes', 'sail_minutes'):
+            year[field] += getattr(month, field)
+        if month.vent_force_max is not None:
+            year['vent_force_max'] = max(year['vent_force_max'] or 0, month.vent_force_max)
+    for year in years.values():
+        year['motor_hours'] = round(year['motor_minutes'] / 60, 1)
+        year['sail_hours'] = round(year['sail_minutes'] / 60, 1)
+    return sorted(years.values(), key=lambda year: year['year'], reverse=True)
+
+
+def _incident_matrix():
+    """Incidents par type (lignes) et gravité (colonnes), depuis IncidentRollup."""
+    counts = {
+        (row['type_incident'], row['gravite']): row['total']
+        for row in IncidentRollup.objects.values('type_incident', 'gravite').annotate(total=Sum('count')).order_by()
+    }
+    return [
+        {
+            'label': label,
+            'counts': [counts.get((type_incident, gravite), 0) for gravite, _ in IncidentNew.GRAVITE_CHOICES],
+            'total': sum(counts.get((type_incident, gravite), 0) for gravite, _ in IncidentNew.GRAVITE_CHOICES),
+        }
+        for type_incident, label in IncidentNew.TYPE_CHOICES
+    ]
 
 
 def voyage_dashboard(request):
-    """Tableau de bord des voyages"""
+    """Tableau de bord des voyages
+
+    Les statistiques ne lisent que les compteurs globaux (nautical.counters)
+    et les agrégats (MonthRollup, IncidentRollup, voir nautical.rollups) : le
+    coût suit le nombre de mois, jamais le nombre d'entrées de log.
+    """
     # Voyages en cours
     voyages_en_cours = VoyageLogNew.objects.filter(statut='en_cours')
     
     # Voyages récents
     voyages_recents = VoyageLogNew.objects.all().order_by('-created_at')[:5]
     
-    # Statistiques
-    total_voyages = VoyageLogNew.objects.count()
-    total_entries = LogEntryNew.objects.count()
+    # Compteurs globaux (nautical.counters) et agrégats mensuels : une ligne
+    # par mois de navigation
+    totals = counters.get_many('voyages', 'log_entries', 'incidents')
+    months = list(MonthRollup.objects.all())
+    years = _yearly_totals(months)
+    forces = [year['vent_force_max'] for year in years if year['vent_force_max'] is not None]
     
     context = {
-        'voyages_en_cours': voyages_en_cours,
-        'voyages_recents': voyages_recents,
-        'total_voyages': total_voyages,
-        'total_entries': total_entries,
+        'voyages_en_cours': voyages_en_cours.select_related('stats'),
+        'voyages_recents': voyages_recents.select_related('stats'),
+        'total_voyages': totals['voyages'],
+        'total_entries': totals['log_entries'],
+        'total_distance_nm': sum(year['distance_nm'] for year in years),
+        'total_incidents': totals['incidents'],
+        'vent_force_max': max(forces) if forces else None,
+        'recent_months': months[-DASHBOARD_MONTHS:][::-1],
+        'years': years,
+        'total_days_at_sea': sum(year['days_at_sea'] for year in years),
+        'total_motor_hours': round(sum(year['motor_minutes'] for year in years) / 60, 1),
+        'total_sail_hours': round(sum(year['sail_minutes'] for year in years) / 60, 1),
+        'incident_gravites': [label for _, label in IncidentNew.GRAVITE_CHOICES],
+        'incident_matrix': _incident_matrix(),
     }
     
     return render(request, 'nautical/voyage_dashboard.html', context)
 
 
-@cache_page(120)
+# Délai suggéré au client avant de redemander un export en construction
+PDF_RETRY_AFTER = 3
+
+# ?mode= -> (type d'export de nautical.exports, suffixe du nom de fichier)
+PDF_EXPORT_MODES = {
+    'resume': ('voyage', ''),
+    'complet': ('complete', '_complet'),
+    'journalier': ('daily', '_journalier'),
+}
+PDF_EXPORT_KINDS = {kind: mode for mode, (kind, _) in PDF_EXPORT_MODES.items()}
+
+
+def _wants_html(request):
+    accept = request.headers.get('Accept', '')
+    return 'text/html' in accept and 'application/json' not in accept
+
+
+def _export_pdf_url(job):
+    if job.kind == exports.BOOK_KIND:
+        return reverse('pdf_job_download', args=[job.pk])
+    url = reverse('export_voyage_pdf', args=[job.voyage_id])
+    mode = PDF_EXPORT_KINDS[job.kind]
+    return url if mode == 'resume' else f"{url}?mode={mode}"
+
+
 def export_voyage_pdf(request, pk):
-    """Export d'un voyage complet en PDF sur une seule page"""
-    voyage = get_object_or_404(
-        VoyageLogNew.objects.prefetch_related(
-            'entries', 'conditions_meteo', 'equipage', 'incidents'
-        ),
-        pk=pk
-    )
-    
-    # Créer le buffer pour le PDF
-    buffer = BytesIO()
-    
-    # Créer le document PDF en format A4
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=10*mm,
-        leftMargin=10*mm,
-        topMargin=10*mm,
-        bottomMargin=10*mm
-    )
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=14,
-        spaceAfter=6,
-        textColor=colors.darkblue,
-        alignment=1  # Centre
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Heading2'],
-        fontSize=10,
-        spaceAfter=3,
-        textColor=colors.black,
-        alignment=0
-    )
-    
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=8,
-        spaceAfter=1
-    )
-    
-    # Contenu du PDF
-    story = []
-    
-    # Titre principal
-    story.append(Paragraph(f"📚 LIVRE DE BORD - {voyage.bateau}", title_style))
-    story.append(Spacer(1, 3*mm))
-    
-    # Informations du voyage
-    voyage_info = [
-        ['Sujet du voyage:', voyage.sujet_voyage or 'Non spécifié'],
-        ['Dates:', f"{voyage.date_debut.strftime('%d/%m/%Y')} → {voyage.date_fin.strftime('%d/%m/%Y') if voyage.date_fin else 'En cours'}"],
-        ['Trajet:', f"{voyage.port_depart} → {voyage.port_arrivee or 'En cours'}"],
-        ['Statut:', voyage.get_statut_display()],
-    ]
-    
-    voyage_table = Table(voyage_info, colWidths=[40*mm, 80*mm])
-    voyage_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-    ]))
-    story.append(voyage_table)
-    story.append(Spacer(1, 3*mm))
-    
-    # Équipage
-    story.append(Paragraph("👥 ÉQUIPAGE", subtitle_style))
-    crew_data = [['Nom', 'Rôle', 'Embarquement', 'Débarquement']]
-    for member in voyage.equipage.all():
-        crew_data.append([
-            f"{member.nom} {member.prenom}",
-            member.get_role_display(),
-            member.date_embarquement.strftime('%d/%m') if member.date_embarquement else '-',
-            member.date_debarquement.strftime('%d/%m') if member.date_debarquement else 'À bord'
-        ])
-    
-    if len(crew_data) > 1:
-        crew_table = Table(crew_data, colWidths=[40*mm, 30*mm, 25*mm, 25*mm])
-        crew_table.setStyle(TableStyle([
-            ('FONTSIZE', (0, 0), (-1, -1), 7),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-        ]))
-        story.append(crew_table)
-    else:
-        story.append(Paragraph("Aucun membre d'équipage enregistré", normal_style))
-    story.append(Spacer(1, 3*mm))
-    
-    # Entrées de log (résumé compact)
-    story.append(Paragraph("📋 ENTRÉES DE LOG", subtitle_style))
-    log_data = [['Date', 'Heure', 'Position', 'Log', 'Cap', 'Observations']]
-    entries_qs = voyage.entries.all().order_by('date', 'heure')
-    max_log_rows = 28
-    total_logs = entries_qs.count()
-    # Gestion des notes détaillées pour événements longs
-    footnotes = []
-    footnote_index = 1
-    for entry in entries_qs[:max_log_rows]:
-        observations = []
-        truncated_ev = False
-        # Événements prioritaires dans la colonne Observations
-        if entry.evenements:
-            ev_full = (entry.evenements or '').strip().replace('\n', ' ')
-            ev_display = ev_full
-            if len(ev_full) > 90:
-                ev_display = ev_full[:87] + '...'
-                truncated_ev = True
-            # Ajouter marque de note si tronqué
-            if truncated_ev:
-                observations.append(f"{ev_display} [{footnote_index}]")
-                # Ajouter la note détaillée avec ancrage date/heure
-                footnotes.append(f"[{footnote_index}] {entry.date.strftime('%d/%m')} {entry.heure.strftime('%H:%M')} — {ev_full}")
-                footnote_index += 1
-            else:
-                observations.append(ev_display)
-        if entry.allure:
-            observations.append(f"Allure: {entry.allure}")
-        if entry.voilure:
-            observations.append(f"Voilure: {entry.voilure}")
-        # Ajouts compacts basés sur les champs existants
-        if entry.vent_force or entry.vent_direction:
-            vent_txt = f"{(entry.vent_force or '').strip()} {(entry.vent_direction or '').strip()}".strip()
-            if vent_txt:
-                observations.append(f"Vent: {vent_txt}")
-        if entry.etat_mer:
-            observations.append(f"Mer: {entry.etat_mer}")
-        if entry.visibilite:
-            observations.append(f"Visi: {entry.visibilite}")
-        if entry.barometre:
-            observations.append(f"Pression: {entry.barometre} hPa")
-
-        # Afficher plus de détails si pas de note (jusqu'à 3 éléments)
-        obs_limit = 2 if truncated_ev else 3
-        log_data.append([
-            entry.date.strftime('%d/%m'),
-            entry.heure.strftime('%H:%M'),
-            entry.position[:30] + '...' if entry.position and len(entry.position) > 30 else (entry.position or '-'),
-            f"{entry.log_nautique:.1f}" if entry.log_nautique else '-',
-            f"{entry.cap_compas}°" if entry.cap_compas else '-',
-            ' | '.join(observations[:obs_limit])  # Jusqu'à 3 sans note, 2 si note
-        ])
-    
-    if len(log_data) > 1:
-        log_table = Table(log_data, colWidths=[18*mm, 18*mm, 50*mm, 15*mm, 15*mm, 60*mm])
-        log_table.setStyle(TableStyle([
-            ('FONTSIZE', (0, 0), (-1, -1), 6),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgreen),
-        ]))
-        story.append(log_table)
-        if total_logs > (len(log_data) - 1):
-            extra_logs = total_logs - (len(log_data) - 1)
-            story.append(Paragraph(f"… (+{extra_logs} entrées supplémentaires)", ParagraphStyle('Note', parent=styles['Normal'], fontSize=7, textColor=colors.grey)))
-        # Ajouter section notes si nécessaire (limiter pour rester sur 1 page)
-        if footnotes:
-            story.append(Spacer(1, 2*mm))
-            story.append(Paragraph("Notes détaillées", ParagraphStyle('FootTitle', parent=styles['Normal'], fontSize=7, textColor=colors.black)))
-            max_notes = 5
-            for note in footnotes[:max_notes]:
-                story.append(Paragraph(note, ParagraphStyle('Note', parent=styles['Normal'], fontSize=6, textColor=colors.grey)))
-            if len(footnotes) > max_notes:
-                story.append(Paragraph(f"… (+{len(footnotes) - max_notes} notes supplémentaires)", ParagraphStyle('Note', parent=styles['Normal'], fontSize=6, textColor=colors.grey)))
-    else:
-        story.append(Paragraph("Aucune entrée de log enregistrée", normal_style))
-    story.append(Spacer(1, 3*mm))
-    
-    # Résumé météo (situation générale si disponible)
-    try:
-        first_summary = next((w.situation_generale for w in voyage.conditions_meteo.all() if w.situation_generale), None)
-        if first_summary:
-            story.append(Paragraph("🛈 Résumé météo", subtitle_style))
-            story.append(Paragraph(first_summary, normal_style))
-            story.append(Spacer(1, 2*mm))
-    except Exception:
-        pass
-
-    # Conditions météorologiques
-    story.append(Paragraph("🌤️ CONDITIONS MÉTÉO", subtitle_style))
-    weather_data = [['Date/Heure', 'Bulletin', 'Vent (jour)', 'Mer (jour)', 'Visibilité (jour)']]
-    wc_qs = voyage.conditions_meteo.all().order_by('datetime')
-    max_wc_rows = 8
-    total_wc = wc_qs.count()
-    for weather in wc_qs[:max_wc_rows]:
-        weather_data.append([
-            weather.datetime.strftime('%d/%m %H:%M'),
-            weather.type_bulletin or '-',
-            weather.prev_jour_vent or '-',
-            weather.prev_jour_mer or '-',
-            weather.prev_jour_visibilite or '-',
-        ])
-    
-    if len(weather_data) > 1:
-        weather_table = Table(weather_data, colWidths=[35*mm, 35*mm, 30*mm, 30*mm, 30*mm])
-        weather_table.setStyle(TableStyle([
-            ('FONTSIZE', (0, 0), (-1, -1), 7),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightyellow),
-        ]))
-        story.append(weather_table)
-        if total_wc > (len(weather_data) - 1):
-            extra_wc = total_wc - (len(weather_data) - 1)
-            story.append(Paragraph(f"… (+{extra_wc} bulletins supplémentaires)", ParagraphStyle('Note', parent=styles['Normal'], fontSize=7, textColor=colors.grey)))
-    else:
-        story.append(Paragraph("Aucune condition météo enregistrée", normal_style))
-    story.append(Spacer(1, 3*mm))
-    
-    # Incidents (si existants)
-    incidents = voyage.incidents.all()
-    if incidents:
-        story.append(Paragraph("⚠️ INCIDENTS", subtitle_style))
-        for incident in incidents:
-            incident_text = f"<b>{incident.datetime.strftime('%d/%m %H:%M')}</b> - {incident.get_gravite_display()}: {incident.description[:100]}"
-            story.append(Paragraph(incident_text, normal_style))
-    
-    # Pied de page
-    story.append(Spacer(1, 5*mm))
-    footer_text = f"Document généré le {timezone.now().strftime('%d/%m/%Y à %H:%M')} - Livre de bord électronique"
-    story.append(Paragraph(footer_text, ParagraphStyle('Footer', parent=styles['Normal'], fontSize=6, alignment=1, textColor=colors.grey)))
-    
-    # Construire le PDF
-    doc.build(story)
-    
-    # Retourner la réponse PDF
-    buffer.seek(0)
-    response = HttpResponse(buffer.read(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="Livre_de_bord_{voyage.bateau}_{voyage.date_debut.strftime("%Y%m%d")}.pdf"'
-    # Caching headers
-    try:
-        ts = int(voyage.updated_at.timestamp())
-        response['ETag'] = f'W/"voyage-{voyage.pk}-{ts}"'
-        response['Last-Modified'] = http_date(ts)
+    """Export PDF d'un voyage : résumé sur une page, ou livre complet
+    (`?mode=complet`, toutes les entrées sur autant de pages que nécessaire).
+
+    Le PDF est construit par le worker (nautical.exports) : servi depuis le
+    disque s'il est à jour, sinon 202 avec l'URL de suivi de la construction.
+    """
+    voyage = get_object_or_404(VoyageLogNew, pk=pk)
+    mode = request.GET.get('mode', 'resume')
+    if mode not in PDF_EXPORT_MODES:
+        return JsonResponse({'error': f"Mode inconnu : {mode}"}, status=400)
+    kind, suffix = PDF_EXPORT_MODES[mode]
+    path, job = exports.request_pdf(kind, voyage.pk)
+    if path is not None:
+        response = FileResponse(
+            open(path, 'rb'), as_attachment=True, content_type='application/pdf',
+            filename=f"Livre_de_bord_{voyage.bateau}_{voyage.date_debut.strftime('%Y%m%d')}{suffix}.pdf",
+        )
+        response['ETag'] = f'"{path.stem}"'
         response['Cache-Control'] = 'max-age=120, private'
-    except Exception:
-        pass
-    
+        return response
+
+    return _pdf_pending(request, job, voyage.sujet_voyage, reverse('voyage_log_detail', args=[voyage.pk]))
+
+
+def _pdf_pending(request, job, title, back_url):
+    """202 : page d'attente (rechargée jusqu'à ce que le PDF soit prêt) ou JSON."""
+    status_url = reverse('pdf_job_status', args=[job.pk])
+    if _wants_html(request):
+        response = render(request, 'nautical/pdf_pending.html', {
+            'title': title, 'back_url': back_url, 'job': job, 'status_url': status_url, 'retry_after': PDF_RETRY_AFTER,
+        }, status=202)
+    else:
+        response = JsonResponse({'status': job.status, 'status_url': status_url}, status=202)
+    response['Retry-After'] = str(PDF_RETRY_AFTER)
     return response
 
 
+def pdf_job_download(request, pk):
+    """Livre relié construit par le worker (action de l'administration) :
+    le fichier s'il est prêt, sinon 202 comme `export_voyage_pdf`."""
+    job = get_object_or_404(PdfJob, pk=pk, kind=exports.BOOK_KIND)
+    title = job.params.get('title', "Livre de bord")
+    path, job = exports.job_file(job)
+    if path is not None:
+        response = FileResponse(
+            open(path, 'rb'), as_attachment=True, content_type='application/pdf', filename=f"{title.replace(' ', '_')}.pdf",
+        )
+        response['ETag'] = f'"{path.stem}"'
+        return response
+    return _pdf_pending(request, job, title, reverse('admin:nautical_voyagelognew_changelist'))
+
+
+def pdf_job_status(request, pk):
+    """État de la construction d'un export PDF (JSON)."""
+    job = get_object_or_404(PdfJob, pk=pk)
+    return JsonResponse({
+        'status': job.status,
+        'error': job.error.strip().splitlines()[-1] if job.status == 'failed' and job.error else None,
+        'download_url': _export_pdf_url(job) if job.status == 'done' else None,
+    })
+
+
 # =============================================================================
 # VUES POUR GESTION DES PHOTOS
 # =============================================================================
@@ -824,7 +810,7 @@ def set_header_photo(request, voyage_pk, photo_pk):
 
 def voyage_gallery_view(request, pk):
     """Vue pour afficher la galerie complète d'un voyage"""
-    voyage = get_object_or_404(VoyageLogNew, pk=pk)
+    voyage = get_object_or_404(VoyageLogNew.objects.with_photos(), pk=pk)
     
     context = {
         'voyage': voyage,
@@ -1,5 +1,6 @@
-
 import os
 from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sailing_logbook.settings')
+# Servi par un serveur ASGI (uvicorn, daphne), le flux live SSE
+# (nautical.live) est asynchrone et n'occupe pas de worker par connexion.
 application = get_asgi_application()
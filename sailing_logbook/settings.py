@@ -55,6 +55,23 @@ DATABASES = {'default': {
     'NAME': BASE_DIR / 'db.sqlite3',
 }}
 
+# Cache partagé par tous les processus (serveur web, worker PDF,
+# nmea_listener, commandes d'import) : versions des pages des livres de bord
+# (nautical.caching), traces simplifiées. Un cache par processus (LocMem)
+# laisserait chaque processus sur ses propres versions.
+# Redis si REDIS_URL est défini, sinon fichiers sur disque (un seul hôte).
+if os.environ.get('REDIS_URL'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }}
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }}
+
 LANGUAGE_CODE = 'fr-fr'
 TIME_ZONE = 'Pacific/Tahiti'
 USE_I18N = True
@@ -50,6 +50,8 @@ urlpatterns = [
     path('livres-de-bord/<int:pk>/delete/', views_new.voyage_log_delete_view, name='voyage_log_delete'),
     path('livres-de-bord/<int:pk>/live/', views_new.voyage_log_live_view, name='voyage_log_live'),
     path('livres-de-bord/<int:pk>/export/pdf/', views_new.export_voyage_pdf, name='export_voyage_pdf'),
+    path('exports/pdf/<int:pk>/', views_new.pdf_job_status, name='pdf_job_status'),
+    path('exports/pdf/<int:pk>/fichier/', views_new.pdf_job_download, name='pdf_job_download'),
     
     # Entrées de log
     path('livres-de-bord/<int:voyage_pk>/log/nouveau/', views_new.add_log_entry, name='add_log_entry'),
@@ -73,6 +75,10 @@ urlpatterns = [
     
     # API pour mode live
     path('livres-de-bord/<int:pk>/api/entries/', views_new.voyage_log_api_entries, name='voyage_log_api_entries'),
+    path('livres-de-bord/<int:pk>/api/stream/', views_new.voyage_log_stream, name='voyage_log_stream'),
+    path('livres-de-bord/<int:pk>/timeline/', views_new.voyage_log_timeline, name='voyage_log_timeline'),
+    path('livres-de-bord/<int:pk>/api/track/', views_new.voyage_log_api_track, name='voyage_log_api_track'),
+    path('livres-de-bord/api/near/', views_new.voyage_log_api_near, name='voyage_log_api_near'),
     
     # Dashboard
     path('dashboard/', views_new.voyage_dashboard, name='voyage_dashboard'),